@@ -0,0 +1,249 @@
+"""
+AI Job Queue for Squirtvana Pro Enhanced
+Bounded worker pool with per-provider concurrency for slow AI generation work
+"""
+
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict, deque
+
+from src.routes.providers import env
+
+logger = logging.getLogger(__name__)
+
+# Job Queue Configuration
+JOB_CONFIG = {
+    'max_workers': int(env('AI_JOB_WORKERS', '4')),
+    'max_queue': int(env('AI_JOB_QUEUE_SIZE', '32')),
+    'retention': 500,
+    'provider_limits': {
+        'openai': 2,
+        'elevenlabs': 2,
+        'image': int(env('IMAGE_PROCESS_WORKERS', '2')),  # one job per pool process
+        'media': 1,  # metadata scrubbing is disk-bound
+        'export': 1,  # analytics exports scan the event store day by day
+        'report': 1
+    }
+}
+
+TERMINAL_STATES = ('succeeded', 'failed', 'cancelled')
+TIMING_WINDOW = 200
+
+
+class QueueFullError(Exception):
+    """Raised when the queue is at capacity; endpoints map it to 429"""
+
+
+class Job:
+    """A unit of AI work and its lifecycle timestamps"""
+
+    def __init__(self, provider, kind, func, args, kwargs, on_cancel=None):
+        self.id = uuid.uuid4().hex
+        self.provider = provider
+        self.kind = kind
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.on_cancel = on_cancel
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        self.done = threading.Event()
+
+    def to_dict(self):
+        """Public view of the job for API responses"""
+        data = {
+            'job_id': self.id,
+            'provider': self.provider,
+            'kind': self.kind,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.started_at:
+            data['queue_seconds'] = round(self.started_at - self.created_at, 4)
+        if self.finished_at and self.started_at:
+            data['run_seconds'] = round(self.finished_at - self.started_at, 4)
+        if self.status == 'succeeded':
+            data['result'] = self.result
+        if self.error:
+            data['error'] = self.error
+        return data
+
+
+class JobQueue:
+    """Bounded FIFO queue served by a fixed pool of worker threads.
+
+    A worker takes the oldest queued job whose provider still has a free
+    concurrency slot, so one slow provider cannot starve the others.
+    Running jobs cannot be interrupted; cancelling one discards its result.
+    A job cancelled while still queued never runs, so its on_cancel hook
+    releases whatever the job body would have cleaned up (e.g. an upload).
+    """
+
+    def __init__(self, max_workers, max_queue, provider_limits=None, retention=500):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.provider_limits = dict(provider_limits or {})
+        self.retention = retention
+        self._pending = deque()
+        self._jobs = OrderedDict()
+        self._running = {}
+        self._cond = threading.Condition()
+        self._workers = []
+        self._counters = {'submitted': 0, 'rejected': 0, 'succeeded': 0, 'failed': 0, 'cancelled': 0}
+        self._timings = {}
+
+    def submit(self, provider, kind, func, *args, on_cancel=None, **kwargs):
+        """Queue func(*args, **kwargs) and return the Job without waiting"""
+        with self._cond:
+            if len(self._pending) >= self.max_queue:
+                self._counters['rejected'] += 1
+                raise QueueFullError(f"AI job queue is full ({self.max_queue} pending)")
+            job = Job(provider, kind, func, args, kwargs, on_cancel)
+            self._pending.append(job)
+            self._jobs[job.id] = job
+            self._counters['submitted'] += 1
+            self._evict_finished()
+            self._ensure_workers()
+            self._cond.notify()
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id, timeout):
+        """Block until the job reaches a terminal state or timeout expires"""
+        job = self.get(job_id)
+        if job is not None:
+            job.done.wait(timeout)
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a job; returns False if unknown or already finished"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in TERMINAL_STATES:
+                return False
+            job.cancel_requested = True
+            on_cancel = None
+            if job.status == 'queued':
+                self._pending.remove(job)
+                on_cancel = job.on_cancel
+                self._finish(job, 'cancelled')
+        if on_cancel is not None:
+            try:
+                on_cancel()
+            except Exception as e:
+                logger.error(f"AI job {job.kind} cancel cleanup failed: {e}")
+        return True
+
+    def metrics(self):
+        """Queue depth, per-provider load and job timing percentiles"""
+        with self._cond:
+            return {
+                'queue_depth': len(self._pending),
+                'max_queue': self.max_queue,
+                'workers': self.max_workers,
+                'running': dict(self._running),
+                'provider_limits': dict(self.provider_limits),
+                'counters': dict(self._counters),
+                'timings': {
+                    key: {
+                        'count': len(samples),
+                        'queue_p50': _percentile([s[0] for s in samples], 50),
+                        'queue_p95': _percentile([s[0] for s in samples], 95),
+                        'run_p50': _percentile([s[1] for s in samples], 50),
+                        'run_p95': _percentile([s[1] for s in samples], 95)
+                    }
+                    for key, samples in self._timings.items()
+                }
+            }
+
+    def _ensure_workers(self):
+        # Workers start on first submit so importing the module stays cheap
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker_loop, name=f"ai-job-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _next_runnable(self):
+        for job in self._pending:
+            limit = self.provider_limits.get(job.provider)
+            if limit is None or self._running.get(job.provider, 0) < limit:
+                return job
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = self._next_runnable()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_runnable()
+                self._pending.remove(job)
+                self._running[job.provider] = self._running.get(job.provider, 0) + 1
+                job.status = 'running'
+                job.started_at = time.time()
+
+            try:
+                result, error = job.func(*job.args, **job.kwargs), None
+            except Exception as e:
+                logger.error(f"AI job {job.kind} failed: {e}")
+                result, error = None, str(e)
+
+            with self._cond:
+                self._running[job.provider] -= 1
+                if job.cancel_requested:
+                    self._finish(job, 'cancelled')
+                elif error is not None:
+                    job.error = error
+                    self._finish(job, 'failed')
+                else:
+                    job.result = result
+                    self._finish(job, 'succeeded')
+                # A provider slot was freed; another worker may now be able to run
+                self._cond.notify_all()
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+        job.func = job.args = job.kwargs = job.on_cancel = None
+        self._counters[status] += 1
+        if job.started_at:
+            samples = self._timings.setdefault(f"{job.provider}:{job.kind}", deque(maxlen=TIMING_WINDOW))
+            samples.append((job.started_at - job.created_at, job.finished_at - job.started_at))
+        job.done.set()
+
+    def _evict_finished(self):
+        if len(self._jobs) <= self.retention:
+            return
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in TERMINAL_STATES]
+        for job_id in finished:
+            if len(self._jobs) <= self.retention:
+                break
+            del self._jobs[job_id]
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 4)
+
+
+job_queue = JobQueue(
+    max_workers=JOB_CONFIG['max_workers'],
+    max_queue=JOB_CONFIG['max_queue'],
+    provider_limits=JOB_CONFIG['provider_limits'],
+    retention=JOB_CONFIG['retention']
+)
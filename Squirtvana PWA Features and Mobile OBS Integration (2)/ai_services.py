@@ -4,16 +4,39 @@ Comprehensive AI integration for content generation, voice synthesis, and automa
 """
 
 import os
+import re
 import json
 import time
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, url_for, send_file
+from werkzeug.security import safe_join
 import requests
 
 logger = logging.getLogger(__name__)
 ai_bp = Blueprint('ai_services', __name__)
 
+from src.routes.ai_jobs import job_queue, QueueFullError, TERMINAL_STATES
+from src.routes.content_store import get_content_history
+from src.routes.providers import env, openrouter_base_url
+from src.routes.prompt_templates import compile_templates, TemplateError
+from src.routes.singleflight import SingleFlight
+from src.routes.llm_accounting import accounting, choose_model, record_llm_call
+from src.routes.model_router import router
+from src.routes.image_pipeline import (
+    IMAGE_CONFIG, ImagePipelineError, normalize_options, save_upload, output_key,
+    find_cached_output, is_pipeline_output, run_pipeline, image_flight
+)
+from src.routes.content_analysis import analyze_batch
+
+JOB_WAIT_MAX_SECONDS = 30
+IMAGE_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_TTL = 3600
+MAX_ANALYSIS_BATCH = 1000
+
 # AI Service Configuration
 AI_CONFIG = {
     'openai': {
@@ -25,58 +48,120 @@ AI_CONFIG = {
         'api_key': os.getenv('ELEVENLABS_API_KEY', 'your-elevenlabs-api-key'),
         'voice_id': os.getenv('ELEVENLABS_VOICE_ID', 'default-voice-id'),
         'model_id': 'eleven_multilingual_v2'
+    },
+    'openrouter': {
+        'model': 'anthropic/claude-3-haiku',
+        'max_tokens': 500,
+        'timeout': 30
     }
 }
 
+# Chat Suggestions
+CHAT_SUGGESTION_POOL = [
+    "Vielen Dank für deine Nachricht! 💕",
+    "Das ist so süß von dir! 😘",
+    "Du machst mich glücklich! ✨",
+    "Möchtest du eine private Show? 🔥",
+    "Schau dir mein Tip-Menü an! 💰"
+]
+BATCH_SUGGESTION_LIMIT = 100
+
+# Cheap local ranking features for suggestion candidates
+SUGGESTION_TOPICS = {
+    'greeting': {'hi', 'hey', 'hallo', 'hello', 'servus', 'moin', 'willkommen', 'welcome'},
+    'compliment': {'schön', 'hübsch', 'süß', 'sexy', 'beautiful', 'cute', 'hot', 'heiß', 'lieb', 'gorgeous'},
+    'tip': {'tip', 'tips', 'token', 'tokens', 'menü', 'menu', 'preis', 'price'},
+    'private': {'private', 'privat', 'pvt', 'show', 'exklusiv', 'exclusive'}
+}
+SALES_TOPICS = ('tip', 'private')
+POSITIVE_WORDS = {
+    'danke', 'liebe', 'lieb', 'toll', 'super', 'schön', 'süß', 'glücklich', 'geil', 'heiß', 'gut',
+    'thanks', 'thank', 'love', 'great', 'awesome', 'nice', 'beautiful', 'cute', 'happy', 'hot', 'good'
+}
+NEGATIVE_WORDS = {
+    'schlecht', 'langweilig', 'traurig', 'blöd', 'hass', 'nervig', 'teuer', 'schade', 'müde',
+    'bad', 'boring', 'sad', 'hate', 'annoying', 'expensive', 'tired', 'lame', 'worst'
+}
+WORD_PATTERN = re.compile(r"[\wäöüß]+", re.UNICODE)
+
 # Content Templates
 CONTENT_TEMPLATES = {
     'bio': {
         'system_prompt': "Du bist ein professioneller Content-Creator für Adult-Entertainment. Erstelle eine authentische, ansprechende Bio für ein Cam-Model.",
-        'user_prompt': "Erstelle eine professionelle Bio für ein Cam-Model mit folgenden Eigenschaften: authentisch, verspielt, interaktiv, spezialisiert auf intime Shows. Maximal 150 Zeichen."
+        'user_prompt': "Erstelle eine professionelle Bio für ein Cam-Model mit folgenden Eigenschaften: authentisch, verspielt, interaktiv, spezialisiert auf intime Shows. Maximal 150 Zeichen.",
+        'temperature': 0.8,
+        'max_tokens': 120
     },
     'social': {
         'system_prompt': "Du bist ein Social Media Manager für Adult-Entertainment. Erstelle ansprechende Posts für verschiedene Plattformen.",
-        'user_prompt': "Erstelle einen ansprechenden Social Media Post für ein Live-Streaming Event. Verwende Emojis und relevante Hashtags. Maximal 280 Zeichen."
+        'user_prompt': "Erstelle einen ansprechenden Social Media Post für ein Live-Streaming Event. Verwende Emojis und relevante Hashtags. Maximal 280 Zeichen.",
+        'temperature': 0.9,
+        'max_tokens': 200
     },
     'tip_menu': {
         'system_prompt': "Du bist ein Experte für Cam-Model Monetarisierung. Erstelle professionelle Tip-Menüs.",
-        'user_prompt': "Erstelle ein attraktives Tip-Menü mit 5-7 Aktionen und angemessenen Token-Preisen. Format: Aktion - Preis in Tokens"
+        'user_prompt': "Erstelle ein attraktives Tip-Menü mit 5-7 Aktionen und angemessenen Token-Preisen. Format: Aktion - Preis in Tokens",
+        'temperature': 0.6,
+        'max_tokens': 300
     },
     'chat_response': {
         'system_prompt': "Du bist ein freundliches, professionelles Cam-Model. Antworte höflich und ansprechend auf Viewer-Nachrichten.",
-        'user_prompt': "Erstelle eine freundliche, professionelle Antwort auf diese Viewer-Nachricht: {message}"
+        'user_prompt': "Erstelle eine freundliche, professionelle Antwort auf diese Viewer-Nachricht: {message}",
+        'temperature': 0.7,
+        'max_tokens': 150
+    },
+    'custom': {
+        'system_prompt': "Du bist ein professioneller Content-Creator. Erstelle hochwertigen, ansprechenden Content.",
+        'user_prompt': "{prompt}",
+        'defaults': {'prompt': "Erstelle professionellen Content für Adult-Entertainment."}
     }
 }
 
+# Compiled once at import; a broken template fails startup instead of a request
+COMPILED_TEMPLATES = compile_templates(
+    CONTENT_TEMPLATES,
+    default_model=AI_CONFIG['openrouter']['model'],
+    default_max_tokens=AI_CONFIG['openrouter']['max_tokens']
+)
+
+content_flight = SingleFlight('content')
+
+# cache_key -> (expires_at, content)
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
 @ai_bp.route('/generate-content', methods=['POST'])
 def generate_content():
-    """Generate AI content for various purposes"""
+    """Queue AI content generation for various purposes"""
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         content_type = data.get('type', 'custom')
-        custom_prompt = data.get('prompt', '')
         
         # Use template or custom prompt
-        if content_type in CONTENT_TEMPLATES:
-            template = CONTENT_TEMPLATES[content_type]
-            system_prompt = template['system_prompt']
-            user_prompt = template['user_prompt']
-        else:
-            system_prompt = "Du bist ein professioneller Content-Creator. Erstelle hochwertigen, ansprechenden Content."
-            user_prompt = custom_prompt or "Erstelle professionellen Content für Adult-Entertainment."
+        template = COMPILED_TEMPLATES.get(content_type, COMPILED_TEMPLATES['custom'])
+        variables = dict(data.get('variables') or {})
+        for name in template.variables:
+            if name not in variables and data.get(name):
+                variables[name] = data[name]
         
-        # Simulate AI generation (replace with actual OpenAI API call)
-        generated_content = simulate_ai_generation(content_type, user_prompt)
+        try:
+            rendered = template.render(**variables)
+        except TemplateError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        # Cache the generated content
-        cache_content(content_type, generated_content)
+        cached = get_cached_response(rendered.cache_key)
+        if cached is not None:
+            return jsonify({
+                'success': True,
+                'content': cached,
+                'type': content_type,
+                'cache_key': rendered.cache_key,
+                'cached': True,
+                'timestamp': datetime.utcnow().isoformat()
+            })
         
-        return jsonify({
-            'success': True,
-            'content': generated_content,
-            'type': content_type,
-            'timestamp': datetime.utcnow().isoformat()
-        })
+        app = current_app._get_current_object()
+        return queue_ai_job('openai', 'generate_content', run_content_generation, app, content_type, rendered)
         
     except Exception as e:
         logger.error(f"Content generation error: {e}")
@@ -84,7 +169,7 @@ def generate_content():
 
 @ai_bp.route('/generate-voice', methods=['POST'])
 def generate_voice():
-    """Generate voice audio using ElevenLabs"""
+    """Queue voice audio generation using ElevenLabs"""
     try:
         data = request.get_json()
         text = data.get('text', '')
@@ -93,16 +178,7 @@ def generate_voice():
         if not text:
             return jsonify({'success': False, 'error': 'Text is required'}), 400
         
-        # Simulate voice generation (replace with actual ElevenLabs API call)
-        audio_file = simulate_voice_generation(text, voice_type)
-        
-        return jsonify({
-            'success': True,
-            'audio_file': audio_file,
-            'text': text,
-            'voice_type': voice_type,
-            'timestamp': datetime.utcnow().isoformat()
-        })
+        return queue_ai_job('elevenlabs', 'generate_voice', run_voice_generation, text, voice_type)
         
     except Exception as e:
         logger.error(f"Voice generation error: {e}")
@@ -130,38 +206,119 @@ def chat_suggestions():
         logger.error(f"Chat suggestions error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@ai_bp.route('/chat-suggestions/batch', methods=['POST'])
+def chat_suggestions_batch():
+    """Generate suggestions for many chat messages with one LLM call.
+
+    Results stream back as NDJSON, one line per message, as soon as the
+    model has finished that message's entry.
+    """
+    try:
+        data = request.get_json() or {}
+        context = data.get('context', 'general')
+        try:
+            top_n = max(1, min(int(data.get('top_n', 3)), 10))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': "'top_n' must be an integer"}), 400
+        messages = normalize_batch_messages(data.get('messages', []))
+        
+        if not messages:
+            return jsonify({'success': False, 'error': 'Messages are required'}), 400
+        if len(messages) > BATCH_SUGGESTION_LIMIT:
+            return jsonify({'success': False, 'error': f'At most {BATCH_SUGGESTION_LIMIT} messages per batch'}), 400
+        
+        return Response(
+            stream_batch_suggestions(messages, context, top_n),
+            mimetype='application/x-ndjson',
+            headers={'Cache-Control': 'no-cache'}
+        )
+        
+    except Exception as e:
+        logger.error(f"Batch chat suggestions error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @ai_bp.route('/image-processing', methods=['POST'])
 def process_image():
-    """Process images with AI (background removal, upscaling, etc.)"""
+    """Queue local image processing (enhance, resize, thumbnail, convert, strip_exif)"""
     try:
+        if request.content_length and request.content_length > IMAGE_CONFIG['max_upload_bytes']:
+            return jsonify({'success': False, 'error': 'Image too large'}), 413
         if 'image' not in request.files:
             return jsonify({'success': False, 'error': 'No image provided'}), 400
         
         image_file = request.files['image']
         processing_type = request.form.get('type', 'enhance')
         
-        # Simulate image processing
-        processed_image = simulate_image_processing(image_file, processing_type)
+        try:
+            options = normalize_options(
+                processing_type,
+                {name: request.form.get(name) for name in ('width', 'height', 'format', 'quality')}
+            )
+            # The upload is gone once the request ends, so hand the worker a file on disk
+            upload_path, source_digest, _ = save_upload(image_file.stream)
+        except ImagePipelineError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        return jsonify({
-            'success': True,
-            'processed_image': processed_image,
-            'processing_type': processing_type,
-            'timestamp': datetime.utcnow().isoformat()
-        })
+        cached = find_cached_output(output_key(source_digest, processing_type, options))
+        if cached is not None:
+            os.remove(upload_path)
+            return jsonify({
+                'success': True,
+                'processed_image': cached,
+                'image_url': url_for('ai_services.get_processed_image', filename=cached),
+                'processing_type': processing_type,
+                'cached': True,
+                'timestamp': datetime.utcnow().isoformat()
+            })
+        
+        return queue_ai_job('image', 'image_processing', run_image_processing,
+                            upload_path, source_digest, processing_type, options,
+                            cleanup=lambda: os.remove(upload_path))
         
     except Exception as e:
         logger.error(f"Image processing error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@ai_bp.route('/images/<filename>', methods=['GET'])
+def get_processed_image(filename):
+    """Serve a processed image; outputs are content-addressed and cached forever"""
+    try:
+        image_path = safe_join(IMAGE_CONFIG['output_dir'], filename)
+        if not is_pipeline_output(filename) or not image_path or not os.path.isfile(image_path):
+            return jsonify({'success': False, 'error': 'Image not found'}), 404
+        
+        response = send_file(image_path, conditional=True, max_age=IMAGE_IMMUTABLE_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+        
+    except Exception as e:
+        logger.error(f"Processed image error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @ai_bp.route('/content-analysis', methods=['POST'])
 def analyze_content():
     """Analyze content performance and provide optimization suggestions"""
     try:
         data = request.get_json()
-        content = data.get('content', '')
         platform = data.get('platform', 'general')
         
+        # Batch mode: score many drafts in one vectorized pass
+        contents = data.get('contents')
+        if contents is not None:
+            if not isinstance(contents, list):
+                return jsonify({'success': False, 'error': "'contents' must be a list of strings"}), 400
+            if len(contents) > MAX_ANALYSIS_BATCH:
+                return jsonify({'success': False, 'error': f'At most {MAX_ANALYSIS_BATCH} drafts per request'}), 400
+            return jsonify({
+                'success': True,
+                'analyses': analyze_batch(contents, platform),
+                'platform': platform,
+                'timestamp': datetime.utcnow().isoformat()
+            })
+        
+        content = data.get('content', '')
+        
         # Analyze content and provide suggestions
         analysis = analyze_content_performance(content, platform)
         
@@ -186,12 +343,228 @@ def get_templates():
             'bio': 'Professional profile bio generation',
             'social': 'Social media post creation',
             'tip_menu': 'Tip menu generation',
-            'chat_response': 'Smart chat responses'
-        }
+            'chat_response': 'Smart chat responses',
+            'custom': 'Free-form content from your own prompt'
+        },
+        'details': {name: template.describe() for name, template in COMPILED_TEMPLATES.items()}
+    })
+
+@ai_bp.route('/content-history', methods=['GET'])
+def get_content_history_entries():
+    """Get recently generated content, newest first"""
+    try:
+        content_type = request.args.get('type')
+        since = request.args.get('since')
+        limit = min(int(request.args.get('limit', 20)), 200)
+        
+        history = get_content_history(current_app.config.get('AI_CONTENT_CACHE'))
+        
+        return jsonify({
+            'success': True,
+            'entries': history.recent(content_type, limit, since),
+            'totals': history.counts(),
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Content history error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@ai_bp.route('/usage', methods=['GET'])
+def get_llm_usage():
+    """Token, latency and budget accounting for LLM calls"""
+    try:
+        hours = min(int(request.args.get('hours', 24)), 24 * 90)
+        
+        return jsonify({
+            'success': True,
+            'usage': accounting.summary(hours),
+            'routing': router.stats(),
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"LLM usage error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@ai_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll an AI job; ?wait=N long-polls up to N seconds for completion"""
+    try:
+        wait = min(float(request.args.get('wait', 0)), JOB_WAIT_MAX_SECONDS)
+        job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+        
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        
+        return jsonify({'success': True, 'job': job.to_dict()})
+        
+    except Exception as e:
+        logger.error(f"Job status error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@ai_bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running AI job"""
+    try:
+        if job_queue.get(job_id) is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'cancelled': job_queue.cancel(job_id),
+            'job': job_queue.get(job_id).to_dict()
+        })
+        
+    except Exception as e:
+        logger.error(f"Job cancel error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@ai_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Subscribe to AI job state changes as Server-Sent Events"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    def event_stream():
+        last_status = None
+        while True:
+            status = job.status
+            if status != last_status:
+                yield f"data: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+                last_status = status
+            if status in TERMINAL_STATES:
+                return
+            job.done.wait(1)
+    
+    return Response(event_stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@ai_bp.route('/jobs/metrics', methods=['GET'])
+def get_job_metrics():
+    """Queue depth, provider concurrency and job timing metrics"""
+    return jsonify({
+        'success': True,
+        'metrics': job_queue.metrics(),
+        'image_dedup': image_flight.stats(),
+        'timestamp': datetime.utcnow().isoformat()
     })
 
 # Helper Functions
 
+def queue_ai_job(provider, kind, func, *args, cleanup=None):
+    """Submit work to the AI job queue and answer 202, or 429 when full.
+
+    cleanup runs when the job never will: the queue rejected it or it was
+    cancelled while still queued.
+    """
+    try:
+        job = job_queue.submit(provider, kind, func, *args, on_cancel=cleanup)
+    except QueueFullError as e:
+        if cleanup is not None:
+            cleanup()
+        return jsonify({'success': False, 'error': str(e)}), 429, {'Retry-After': '2'}
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('ai_services.get_job', job_id=job.id),
+        'timestamp': datetime.utcnow().isoformat()
+    }), 202
+
+def run_content_generation(app, content_type, rendered):
+    """Job body for /generate-content"""
+    cached = get_cached_response(rendered.cache_key)
+    if cached is not None:
+        # An earlier job for the same prompt finished while this one was queued
+        return {
+            'content': cached,
+            'type': content_type,
+            'cache_key': rendered.cache_key,
+            'cached': True,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    
+    # Identical rendered prompts in flight at once share one upstream call
+    generated_content, shared = content_flight.do(rendered.cache_key, generate_from_prompt, content_type, rendered)
+    
+    # Cache the generated content (once, by the call that produced it)
+    if not shared:
+        with app.app_context():
+            cache_content(content_type, generated_content)
+    
+    return {
+        'content': generated_content,
+        'type': content_type,
+        'cache_key': rendered.cache_key,
+        'deduplicated': shared,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+def generate_from_prompt(content_type, rendered):
+    """Generate content for a rendered template via OpenRouter"""
+    if not env('OPENROUTER_KEY'):
+        logger.warning("OPENROUTER_KEY not configured, returning sample content")
+        return simulate_ai_generation(content_type, rendered.user_prompt)
+    
+    content = call_openai_api(
+        rendered.system_prompt,
+        rendered.user_prompt,
+        model=rendered.model,
+        max_tokens=rendered.max_tokens,
+        temperature=rendered.temperature,
+        template=rendered.template
+    )
+    store_cached_response(rendered.cache_key, content)
+    return content
+
+def get_cached_response(cache_key):
+    """Cached completion for a rendered prompt, or None if absent/expired"""
+    with _response_cache_lock:
+        entry = _response_cache.get(cache_key)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del _response_cache[cache_key]
+            return None
+        _response_cache.move_to_end(cache_key)
+        return entry[1]
+
+def store_cached_response(cache_key, content):
+    """Remember a completion, evicting the least recently used entries"""
+    with _response_cache_lock:
+        _response_cache[cache_key] = (time.time() + RESPONSE_CACHE_TTL, content)
+        _response_cache.move_to_end(cache_key)
+        while len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+def run_voice_generation(text, voice_type):
+    """Job body for /generate-voice"""
+    return {
+        'audio_file': simulate_voice_generation(text, voice_type),
+        'text': text,
+        'voice_type': voice_type,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+def run_image_processing(upload_path, source_digest, processing_type, options):
+    """Job body for /image-processing; owns and removes the uploaded file"""
+    try:
+        result = run_pipeline(upload_path, source_digest, processing_type, options)
+        return {
+            'processed_image': result['filename'],
+            'processing_type': processing_type,
+            'format': result.get('format'),
+            'width': result.get('width'),
+            'height': result.get('height'),
+            'bytes': result.get('bytes'),
+            'cached': result['cached'],
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    finally:
+        os.remove(upload_path)
+
 def simulate_ai_generation(content_type, prompt):
     """Simulate AI content generation (replace with actual API calls)"""
     time.sleep(1)  # Simulate processing time
@@ -218,76 +591,223 @@ def simulate_voice_generation(text, voice_type):
 
 def generate_chat_suggestions(message, context):
     """Generate contextual chat response suggestions"""
-    suggestions = [
-        "Vielen Dank für deine Nachricht! 💕",
-        "Das ist so süß von dir! 😘",
-        "Du machst mich glücklich! ✨",
-        "Möchtest du eine private Show? 🔥",
-        "Schau dir mein Tip-Menü an! 💰"
-    ]
+    return rank_suggestions(CHAT_SUGGESTION_POOL, message, context)  # Return top 3 suggestions
+
+def tokenize(text):
+    """Lower-cased word set used by the local suggestion scorer"""
+    return set(WORD_PATTERN.findall(text.lower()))
+
+def sentiment_polarity(tokens):
+    """Lexicon polarity in [-1, 1] for a token set (German and English)"""
+    positive = len(tokens & POSITIVE_WORDS)
+    negative = len(tokens & NEGATIVE_WORDS)
+    return (positive - negative) / max(1, positive + negative)
+
+def score_suggestion(candidate, message, context='general'):
+    """Score how well a reply candidate fits a viewer message.
+
+    Combines keyword overlap, shared topics and sentiment alignment; sales
+    pitches are pushed down when the viewer sounds unhappy.
+    """
+    message_tokens = tokenize(message)
+    candidate_tokens = tokenize(candidate)
+    
+    overlap = len(message_tokens & candidate_tokens) / max(1, len(candidate_tokens))
+    
+    message_topics = {t for t, words in SUGGESTION_TOPICS.items() if message_tokens & words}
+    candidate_topics = {t for t, words in SUGGESTION_TOPICS.items() if candidate_tokens & words}
+    if context in SUGGESTION_TOPICS:
+        message_topics.add(context)
+    topic_match = len(message_topics & candidate_topics) / max(1, len(candidate_topics)) if candidate_topics else 0.5
+    
+    message_sentiment = sentiment_polarity(message_tokens)
+    sentiment_match = 1 - abs(message_sentiment - sentiment_polarity(candidate_tokens)) / 2
     
-    return suggestions[:3]  # Return top 3 suggestions
+    score = 0.3 * overlap + 0.4 * topic_match + 0.3 * sentiment_match
+    if message_sentiment < 0 and candidate_topics & set(SALES_TOPICS):
+        score -= 0.3
+    if len(candidate) > 200:
+        score -= 0.2
+    return round(score, 4)
 
-def simulate_image_processing(image_file, processing_type):
-    """Simulate image processing (replace with actual AI services)"""
-    time.sleep(3)  # Simulate processing time
+def rank_suggestions(candidates, message, context='general', top_n=3, with_scores=False):
+    """Order candidates by score_suggestion, dropping duplicates"""
+    unique = list(dict.fromkeys(c.strip() for c in candidates if c and c.strip()))
+    scored = sorted(
+        ((score_suggestion(c, message, context), c) for c in unique),
+        key=lambda item: item[0],
+        reverse=True
+    )[:top_n]
+    if with_scores:
+        return [{'text': c, 'score': score} for score, c in scored]
+    return [c for _, c in scored]
+
+def normalize_batch_messages(messages):
+    """Accept plain strings or {'id', 'text'|'message'} objects"""
+    normalized = []
+    for index, item in enumerate(messages):
+        if isinstance(item, dict):
+            text = item.get('text') or item.get('message') or ''
+            message_id = str(item.get('id', index))
+        else:
+            text, message_id = str(item), str(index)
+        if text:
+            normalized.append({'id': message_id, 'text': text})
+    return normalized
+
+def stream_batch_suggestions(messages, context, top_n):
+    """Yield one NDJSON line per message; LLM results first, local fallback last"""
+    pending = {m['id']: m for m in messages}
+    system_prompt = CONTENT_TEMPLATES['chat_response']['system_prompt'] + (
+        " Antworte ausschließlich im JSON-Lines-Format: genau eine Zeile pro Nachricht,"
+        ' jeweils {"id": "<id>", "suggestions": ["...", "...", "..."]}, ohne weiteren Text.'
+    )
+    user_prompt = (
+        f"Kontext: {context}. Erstelle für jede dieser Viewer-Nachrichten {top_n + 2} kurze,"
+        f" freundliche Antwortvorschläge:\n{json.dumps(messages, ensure_ascii=False)}"
+    )
     
-    timestamp = int(time.time())
-    filename = f"processed_{processing_type}_{timestamp}.jpg"
+    try:
+        for line in stream_openai_lines(system_prompt, user_prompt, max_tokens=min(4000, 120 * len(messages)), template='chat_suggestions_batch'):
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            # A line without a suggestions list leaves its message to the local fallback
+            if not isinstance(item, dict) or not isinstance(item.get('suggestions'), list):
+                continue
+            message = pending.pop(str(item.get('id')), None)
+            if message is None:
+                continue
+            candidates = [c for c in item['suggestions'] if isinstance(c, str)]
+            if len(candidates) < top_n:
+                candidates += CHAT_SUGGESTION_POOL
+            ranked = rank_suggestions(candidates, message['text'], context, top_n, with_scores=True)
+            yield batch_suggestion_line(message, ranked, 'llm')
+    except Exception as e:
+        logger.error(f"Batch suggestion LLM error: {e}")
     
-    return filename
+    # Anything the model skipped (or everything, if it failed) gets local suggestions
+    for message in pending.values():
+        ranked = rank_suggestions(CHAT_SUGGESTION_POOL, message['text'], context, top_n, with_scores=True)
+        yield batch_suggestion_line(message, ranked, 'local')
+
+def batch_suggestion_line(message, suggestions, source):
+    return json.dumps({
+        'id': message['id'],
+        'message': message['text'],
+        'suggestions': suggestions,
+        'source': source
+    }, ensure_ascii=False) + '\n'
 
 def analyze_content_performance(content, platform):
     """Analyze content and provide optimization suggestions"""
-    analysis = {
-        'score': 85,
-        'suggestions': [
-            'Add more emojis for better engagement',
-            'Include call-to-action phrases',
-            'Optimize for platform-specific hashtags'
-        ],
-        'keywords': ['interactive', 'live', 'show', 'VIP'],
-        'sentiment': 'positive',
-        'engagement_prediction': 'high'
-    }
-    
-    return analysis
+    return analyze_batch([content], platform)[0]
 
 def cache_content(content_type, content):
-    """Cache generated content for future reference"""
+    """Append generated content to the content history"""
     try:
-        cache_dir = current_app.config['AI_CONTENT_CACHE']
-        cache_file = os.path.join(cache_dir, f"{content_type}_cache.json")
-        
-        # Load existing cache
-        cache_data = []
-        if os.path.exists(cache_file):
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
-        
-        # Add new content
-        cache_data.append({
-            'content': content,
-            'timestamp': datetime.utcnow().isoformat(),
-            'type': content_type
-        })
-        
-        # Keep only last 100 entries
-        cache_data = cache_data[-100:]
-        
-        # Save cache
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, ensure_ascii=False, indent=2)
+        cache_dir = current_app.config.get('AI_CONTENT_CACHE')
+        get_content_history(cache_dir).append(content_type, content)
             
     except Exception as e:
         logger.error(f"Cache error: {e}")
 
 # Real API Integration Functions (to be implemented with actual API keys)
 
-def call_openai_api(system_prompt, user_prompt):
-    """Call OpenAI GPT API for content generation"""
-    # Implementation with actual OpenAI API
-    pass
+def openrouter_request(system_prompt, user_prompt, model=None, max_tokens=None, temperature=0.7, stream=False):
+    """POST a chat completion to OpenRouter and return the raw response"""
+    config = AI_CONFIG['openrouter']
+    api_key = env('OPENROUTER_KEY')
+    if not api_key:
+        raise RuntimeError('OpenRouter API key not configured')
+    
+    response = requests.post(
+        f"{openrouter_base_url()}/chat/completions",
+        headers={
+            'Authorization': f"Bearer {api_key}",
+            'Content-Type': 'application/json'
+        },
+        json={
+            'model': model or config['model'],
+            'messages': [
+                {'role': 'system', 'content': system_prompt},
+                {'role': 'user', 'content': user_prompt}
+            ],
+            'max_tokens': max_tokens or config['max_tokens'],
+            'temperature': temperature,
+            'stream': stream
+        },
+        timeout=config['timeout'],
+        stream=stream
+    )
+    response.raise_for_status()
+    return response
+
+def call_openai_api(system_prompt, user_prompt, model=None, max_tokens=None, temperature=0.7, template=None):
+    """Call the chat completion API (via OpenRouter) for content generation"""
+    preferred, _ = choose_model(model or AI_CONFIG['openrouter']['model'])
+    content, _ = router.call(
+        preferred, call_openai_model, system_prompt, user_prompt, max_tokens, temperature, template
+    )
+    return content
+
+def call_openai_model(model, system_prompt, user_prompt, max_tokens, temperature, template):
+    """One completion against a specific model, recorded for accounting"""
+    started = time.monotonic()
+    try:
+        response = openrouter_request(system_prompt, user_prompt, model, max_tokens, temperature)
+        result = response.json()
+    except Exception:
+        record_llm_call(model, template, None, (time.monotonic() - started) * 1000, ok=False)
+        raise
+    
+    content = result['choices'][0]['message']['content']
+    record_llm_call(
+        model, template, result.get('usage'), (time.monotonic() - started) * 1000,
+        prompt_text=system_prompt + user_prompt, completion_text=content
+    )
+    return content
+
+def stream_openai_lines(system_prompt, user_prompt, model=None, max_tokens=None, temperature=0.7, template=None):
+    """Stream a completion and yield each complete line of generated text"""
+    model, _ = choose_model(model or AI_CONFIG['openrouter']['model'])
+    started = time.monotonic()
+    usage, generated, ok = None, [], False
+    try:
+        response = openrouter_request(system_prompt, user_prompt, model, max_tokens, temperature, stream=True)
+    except Exception:
+        record_llm_call(model, template, None, (time.monotonic() - started) * 1000, ok=False)
+        raise
+    response.encoding = 'utf-8'
+    buffer = ''
+    try:
+        for raw in response.iter_lines(decode_unicode=True):
+            if not raw or not raw.startswith('data: '):
+                continue
+            payload = raw[len('data: '):]
+            if payload == '[DONE]':
+                break
+            chunk = json.loads(payload)
+            # OpenRouter reports usage on the final chunk
+            usage = chunk.get('usage') or usage
+            choices = chunk.get('choices') or [{}]
+            delta = choices[0].get('delta', {}).get('content') or ''
+            generated.append(delta)
+            buffer += delta
+            while '\n' in buffer:
+                line, buffer = buffer.split('\n', 1)
+                if line.strip():
+                    yield line.strip()
+        if buffer.strip():
+            yield buffer.strip()
+        ok = True
+    finally:
+        response.close()
+        record_llm_call(
+            model, template, usage, (time.monotonic() - started) * 1000, ok=ok,
+            prompt_text=system_prompt + user_prompt, completion_text=''.join(generated)
+        )
 
 def call_elevenlabs_api(text, voice_id):
     """Call ElevenLabs API for voice synthesis"""
@@ -3,33 +3,79 @@ Analytics Module for Squirtvana Pro Enhanced
 Comprehensive analytics and performance monitoring for professional streaming
 """
 
+import os
 import json
+import time
 import logging
-from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify
-import random
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context, url_for
+from werkzeug.security import safe_join
+import numpy as np
 
 logger = logging.getLogger(__name__)
 analytics_bp = Blueprint('analytics', __name__)
 
-# Sample analytics data (replace with real database queries)
-SAMPLE_DATA = {
-    'revenue': {
-        'daily': [1200, 1350, 1100, 1450, 1600, 1800, 1250],
-        'weekly': [8750, 9200, 8900, 9500, 10200, 9800, 9100],
-        'monthly': [35000, 38000, 36500, 39000, 41000, 38500, 37000]
-    },
-    'viewers': {
-        'hourly': [45, 67, 89, 123, 156, 234, 189, 145, 98, 76, 54, 43],
-        'daily': [189, 234, 198, 267, 298, 345, 234],
-        'peak_times': ['20:00', '21:00', '22:00', '23:00']
-    },
-    'platforms': {
-        'chaturbate': {'revenue': 15000, 'viewers': 450, 'engagement': 85},
-        'onlyfans': {'revenue': 12000, 'viewers': 320, 'engagement': 92},
-        'fansly': {'revenue': 8000, 'viewers': 180, 'engagement': 78}
-    }
+from src.routes.event_store import (
+    event_store, ingest_events, day_key, MAX_BATCH_EVENTS, EVENT_TYPES, EVENT_CODES,
+    REVENUE_TYPES, PLATFORMS, PLATFORM_CODES, DAY_SECONDS
+)
+from src.routes.rollups import rollups
+from src.routes.hyperloglog import viewer_sketches, HLL_STANDARD_ERROR
+from src.routes.ddsketch import quantile_sketches, METRICS, RELATIVE_ACCURACY
+from src.routes.cohorts import cohort_engine, week_of, ACTIVE, FIRST_SEEN
+from src.routes.forecasting import forecaster
+from src.routes.ai_jobs import job_queue, QueueFullError
+from src.routes.analytics_export import (
+    EXPORT_CONFIG, FORMAT_MIMETYPES, check_request, iter_csv, write_export, export_filename, is_export_filename
+)
+from src.routes.reports import reports, ReportError, period_end, section_signature
+from src.routes.goals import goal_tracker, GoalError
+from src.routes.dashboard_push import dashboard_channel
+from src.routes.concurrency import concurrency_tracker
+
+# Trailing window length per period name (report types use the same windows)
+PERIOD_DAYS = {
+    'day': 1, 'daily': 1,
+    'week': 7, 'weekly': 7,
+    'month': 30, 'monthly': 30
 }
+# Trailing window of the session length and tip benchmarks
+BENCHMARK_DAYS = 90
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+@analytics_bp.route('/events', methods=['POST'])
+def ingest_analytics_events():
+    """Ingest a batch of stream events (tip, viewer_join, viewer_leave, subscription, private_show, content_post)"""
+    try:
+        data = request.get_json(silent=True)
+        events = data.get('events', [data]) if isinstance(data, dict) else data
+        if not isinstance(events, list) or not events:
+            return jsonify({'success': False, 'error': "Send an event object or {'events': [...]}"}), 400
+        if len(events) > MAX_BATCH_EVENTS:
+            return jsonify({'success': False, 'error': f'At most {MAX_BATCH_EVENTS} events per request'}), 413
+        
+        accepted, rejected = ingest_events(events)
+        
+        return jsonify({
+            'success': accepted > 0,
+            'accepted': accepted,
+            'rejected': rejected,
+            'timestamp': datetime.utcnow().isoformat()
+        }), 202 if accepted else 400
+        
+    except Exception as e:
+        logger.error(f"Event ingestion error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@analytics_bp.route('/events/stats', methods=['GET'])
+def get_event_store_stats():
+    """Get ingestion and storage counters of the event store"""
+    return jsonify({
+        'success': True,
+        'stats': event_store.stats(),
+        'concurrency': concurrency_tracker.stats(),
+        'timestamp': datetime.utcnow().isoformat()
+    })
 
 @analytics_bp.route('/dashboard', methods=['GET'])
 def get_dashboard_data():
@@ -41,7 +87,7 @@ def get_dashboard_data():
             'revenue': calculate_revenue_metrics(period),
             'viewers': calculate_viewer_metrics(period),
             'engagement': calculate_engagement_metrics(period),
-            'platforms': get_platform_performance(),
+            'platforms': get_platform_performance(period),
             'trends': calculate_trends(period),
             'goals': get_goal_progress(),
             'timestamp': datetime.utcnow().isoformat()
@@ -94,8 +140,14 @@ def get_viewer_analytics():
         viewer_data = {
             'total_viewers': calculate_total_viewers(period),
             'unique_viewers': calculate_unique_viewers(period),
+            'unique_viewers_by_platform': get_unique_viewers_by_platform(period),
+            'unique_viewers_error': round(float(HLL_STANDARD_ERROR), 4),
             'viewer_retention': calculate_viewer_retention(period),
+            'session_retention': get_session_retention(period),
+            'cohorts': get_cohort_report(request.args.get('cohort_weeks', type=int)),
             'peak_hours': get_peak_viewing_hours(period),
+            'live_viewers': concurrency_tracker.current(),
+            'concurrency_heatmap': concurrency_tracker.heatmap(),
             'geographic_distribution': get_geographic_data(period),
             'device_breakdown': get_device_breakdown(period),
             'engagement_metrics': get_engagement_metrics(period),
@@ -117,12 +169,19 @@ def get_performance_metrics():
     """Get performance metrics and optimization suggestions"""
     try:
         metric_type = request.args.get('type', 'all')  # content, streaming, engagement
+        period = request.args.get('period', 'month')
+        platform = request.args.get('platform', 'all')
+        try:
+            start, end = resolve_range(period, request.args.get('start'), request.args.get('end'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
         performance_data = {
+            'distributions': get_distribution_metrics(start, end, platform),
             'content_performance': analyze_content_performance(),
             'streaming_quality': analyze_streaming_quality(),
-            'engagement_rates': analyze_engagement_rates(),
-            'conversion_metrics': analyze_conversion_metrics(),
+            'engagement_rates': analyze_engagement_rates(period),
+            'conversion_metrics': analyze_conversion_metrics(period),
             'optimization_suggestions': get_optimization_suggestions(),
             'benchmarks': get_industry_benchmarks(),
             'timestamp': datetime.utcnow().isoformat()
@@ -131,7 +190,11 @@ def get_performance_metrics():
         return jsonify({
             'success': True,
             'data': performance_data,
-            'metric_type': metric_type
+            'metric_type': metric_type,
+            'range': {
+                'start': datetime.utcfromtimestamp(start).isoformat(),
+                'end': datetime.utcfromtimestamp(end).isoformat()
+            }
         })
         
     except Exception as e:
@@ -140,80 +203,68 @@ def get_performance_metrics():
 
 @analytics_bp.route('/reports/generate', methods=['POST'])
 def generate_report():
-    """Generate comprehensive analytics report"""
+    """Request a report (daily, weekly, monthly); built in the background and polled via report_id.
+
+    Reports are cached per type and period end (the current hour) and only
+    rebuilt when their data changed or refresh is set; a rebuild reuses
+    every section whose inputs are unchanged.
+    """
     try:
-        data = request.get_json()
-        report_type = data.get('type', 'weekly')  # daily, weekly, monthly
-        include_sections = data.get('sections', ['revenue', 'viewers', 'engagement'])
-        
-        report_data = {
-            'report_id': f"report_{int(datetime.utcnow().timestamp())}",
-            'type': report_type,
-            'period': get_report_period(report_type),
-            'sections': {},
-            'summary': {},
-            'recommendations': [],
-            'generated_at': datetime.utcnow().isoformat()
-        }
+        data = request.get_json(silent=True) or {}
+        report_type = data.get('type', 'weekly')
+        include_sections = data.get('sections', ['revenue', 'viewers', 'engagement', 'forecast'])
         
-        # Generate sections based on request
-        if 'revenue' in include_sections:
-            report_data['sections']['revenue'] = generate_revenue_section(report_type)
+        try:
+            entry = reports.request(report_type, include_sections, _submit_report, refresh=bool(data.get('refresh')))
+        except ReportError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except QueueFullError as e:
+            return jsonify({'success': False, 'error': str(e)}), 429, {'Retry-After': '5'}
         
-        if 'viewers' in include_sections:
-            report_data['sections']['viewers'] = generate_viewer_section(report_type)
+        response = _report_response(entry)
+        return jsonify(response), 200 if entry['status'] == 'ready' else 202
         
-        if 'engagement' in include_sections:
-            report_data['sections']['engagement'] = generate_engagement_section(report_type)
+    except Exception as e:
+        logger.error(f"Report generation error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@analytics_bp.route('/reports/<report_id>', methods=['GET'])
+def get_report(report_id):
+    """Status of a report and its content once ready; ?wait=N long-polls"""
+    try:
+        entry = reports.get(report_id)
+        if entry is None:
+            return jsonify({'success': False, 'error': 'Report not found'}), 404
         
-        # Generate summary and recommendations
-        report_data['summary'] = generate_report_summary(report_data['sections'])
-        report_data['recommendations'] = generate_recommendations(report_data['sections'])
+        wait = min(float(request.args.get('wait', 0)), 30)
+        if wait > 0 and entry['job'] is not None:
+            job_queue.wait(entry['job'].id, wait)
+        return jsonify(_report_response(entry))
         
-        return jsonify({
-            'success': True,
-            'report': report_data
-        })
+    except Exception as e:
+        logger.error(f"Report status error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@analytics_bp.route('/reports/<report_id>/html', methods=['GET'])
+def get_report_html(report_id):
+    """Download the rendered HTML artefact of a finished report"""
+    try:
+        report_path = reports.path(report_id, 'html')
+        if not report_path or not os.path.isfile(report_path):
+            return jsonify({'success': False, 'error': 'Report not found'}), 404
+        return send_file(report_path, mimetype='text/html', conditional=True)
         
     except Exception as e:
-        logger.error(f"Report generation error: {e}")
+        logger.error(f"Report download error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @analytics_bp.route('/goals', methods=['GET'])
 def get_goals():
     """Get goal tracking and progress"""
     try:
-        goal_data = {
-            'monthly_revenue_goal': {
-                'target': 50000,
-                'current': 37000,
-                'progress': 74,
-                'days_remaining': 8,
-                'projected': 48500
-            },
-            'viewer_growth_goal': {
-                'target': 500,
-                'current': 345,
-                'progress': 69,
-                'weekly_growth': 12
-            },
-            'content_creation_goal': {
-                'target': 20,
-                'current': 15,
-                'progress': 75,
-                'type': 'posts_per_week'
-            },
-            'engagement_goal': {
-                'target': 90,
-                'current': 85,
-                'progress': 94,
-                'type': 'engagement_rate_percentage'
-            }
-        }
-        
         return jsonify({
             'success': True,
-            'goals': goal_data,
+            'goals': goal_tracker.snapshot(),
             'timestamp': datetime.utcnow().isoformat()
         })
         
@@ -221,104 +272,303 @@ def get_goals():
         logger.error(f"Goals tracking error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@analytics_bp.route('/goals', methods=['POST'])
+def create_goal():
+    """Create a goal (revenue, viewer_growth, posts, engagement) for the current calendar period"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            goal = goal_tracker.create(data.get('name'), data.get('kind'), data.get('target'), data.get('platform'))
+        except GoalError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        return jsonify({'success': True, 'goal': goal}), 201
+        
+    except Exception as e:
+        logger.error(f"Goal creation error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@analytics_bp.route('/goals/<int:goal_id>', methods=['PUT'])
+def update_goal(goal_id):
+    """Change a goal's target"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            goal = goal_tracker.update_target(goal_id, data.get('target'))
+        except GoalError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if goal is None:
+            return jsonify({'success': False, 'error': 'Goal not found'}), 404
+        
+        return jsonify({'success': True, 'goal': goal})
+        
+    except Exception as e:
+        logger.error(f"Goal update error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@analytics_bp.route('/goals/<int:goal_id>', methods=['DELETE'])
+def delete_goal(goal_id):
+    """Delete a goal"""
+    try:
+        if not goal_tracker.delete(goal_id):
+            return jsonify({'success': False, 'error': 'Goal not found'}), 404
+        return jsonify({'success': True, 'deleted': goal_id})
+        
+    except Exception as e:
+        logger.error(f"Goal deletion error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@analytics_bp.route('/stream', methods=['GET'])
+def dashboard_stream():
+    """Subscribe to live dashboard events (goal_progress, ...) as Server-Sent Events"""
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    return Response(
+        stream_with_context(dashboard_channel.stream(last_event_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @analytics_bp.route('/export', methods=['POST'])
 def export_analytics():
-    """Export analytics data in various formats"""
+    """Export analytics data as JSON, streamed CSV, or a background-built file (csv, parquet, npz).
+
+    data_type is events, hourly or daily; the range is period or start/end.
+    CSV streams in the response unless delivery is 'file'; files are built
+    by a job and downloaded (with Range resume) once it has succeeded.
+    """
     try:
-        data = request.get_json()
-        export_format = data.get('format', 'json')  # json, csv, pdf
+        data = request.get_json(silent=True) or {}
+        export_format = data.get('format', 'json')
         data_type = data.get('data_type', 'dashboard')
         period = data.get('period', 'month')
         
-        # Generate export data
-        export_data = generate_export_data(data_type, period)
+        if export_format == 'json':
+            return jsonify({
+                'success': True,
+                'format': export_format,
+                'data': generate_export_data(data_type, period),
+                'timestamp': datetime.utcnow().isoformat()
+            })
+        
+        try:
+            start, end = resolve_range(period, data.get('start'), data.get('end'))
+            dataset = check_request(data_type, export_format, start, end)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        if export_format == 'csv' and data.get('delivery', 'stream') == 'stream':
+            filename = export_filename(dataset, export_format, start, end)
+            return Response(
+                stream_with_context(iter_csv(dataset, start, end)),
+                mimetype=FORMAT_MIMETYPES['csv'],
+                headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+            )
         
-        # Format data according to requested format
-        formatted_data = format_export_data(export_data, export_format)
+        try:
+            job = job_queue.submit('export', 'analytics_export', write_export, dataset, export_format, start, end)
+        except QueueFullError as e:
+            return jsonify({'success': False, 'error': str(e)}), 429, {'Retry-After': '5'}
         
         return jsonify({
             'success': True,
-            'export_id': f"export_{int(datetime.utcnow().timestamp())}",
+            'export_id': job.id,
+            'status': job.status,
             'format': export_format,
-            'data': formatted_data,
-            'download_url': f"/api/analytics/download/{export_format}",
+            'data_type': dataset,
+            'status_url': url_for('analytics.get_export_job', job_id=job.id),
             'timestamp': datetime.utcnow().isoformat()
-        })
+        }), 202
         
     except Exception as e:
         logger.error(f"Export analytics error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@analytics_bp.route('/export/<job_id>', methods=['GET'])
+def get_export_job(job_id):
+    """Status of an export job; ?wait=N long-polls"""
+    try:
+        wait = min(float(request.args.get('wait', 0)), 30)
+        job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+        if job is None or job.kind != 'analytics_export':
+            return jsonify({'success': False, 'error': 'Export not found'}), 404
+        
+        data = job.to_dict()
+        if job.status == 'succeeded':
+            data['download_url'] = url_for('analytics.download_export', filename=job.result['filename'])
+        return jsonify({'success': True, 'job': data})
+        
+    except Exception as e:
+        logger.error(f"Export status error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@analytics_bp.route('/download/<filename>', methods=['GET'])
+def download_export(filename):
+    """Download a finished export (supports Range requests for resume)"""
+    try:
+        export_path = safe_join(EXPORT_CONFIG['export_dir'], filename) if is_export_filename(filename) else None
+        if not export_path or not os.path.isfile(export_path):
+            return jsonify({'success': False, 'error': 'Export not found'}), 404
+        extension = filename.rsplit('.', 1)[-1]
+        return send_file(export_path, mimetype=FORMAT_MIMETYPES.get(extension), conditional=True,
+                         as_attachment=True, download_name=filename)
+        
+    except Exception as e:
+        logger.error(f"Export download error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # Helper Functions
 
+def period_window(period, shift=0, now=None):
+    """(start, end) epoch seconds of the trailing window for period, shifted back by whole windows"""
+    seconds = PERIOD_DAYS.get(period, PERIOD_DAYS['month']) * DAY_SECONDS
+    end = (now or time.time()) - shift * seconds
+    return end - seconds, end
+
+def resolve_range(period, start=None, end=None):
+    """(start, end) epoch seconds from ISO start/end arguments, defaulting to the period window"""
+    def parse(value):
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return (parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp()
+
+    default_start, default_end = period_window(period)
+    try:
+        start = parse(start) if start else default_start
+        end = parse(end) if end else default_end
+    except ValueError:
+        raise ValueError("'start' and 'end' must be ISO dates or timestamps (UTC)")
+    if start >= end:
+        raise ValueError("'start' must be before 'end'")
+    return start, end
+
+def period_days(period, shift=0):
+    """(first, end) epoch days of the period's UTC calendar days, today included"""
+    days = PERIOD_DAYS.get(period, PERIOD_DAYS['month'])
+    end = int(time.time() // DAY_SECONDS) + 1 - shift * days
+    return end - days, end
+
+def _platform_code(platform):
+    if platform in (None, 'all'):
+        return None
+    return PLATFORM_CODES.get(platform, PLATFORM_CODES['other'])
+
+def load_totals(period, shift=0, platform='all'):
+    """Rollup sums for a period window as arrays indexed by event type code"""
+    totals = {name: np.zeros(len(EVENT_TYPES)) for name in ('events', 'amount', 'duration', 'timed')}
+    for row in rollups.query(*period_window(period, shift), by=('type',), platform=_platform_code(platform)):
+        for name in totals:
+            totals[name][row['type']] = row[name]
+    return totals
+
+def _revenue_by_type(totals):
+    return {event_type: round(float(totals['amount'][EVENT_CODES[event_type]]), 2) for event_type in REVENUE_TYPES}
+
+def _pct_change(current, previous):
+    if not previous:
+        return None
+    return round((current - previous) * 100.0 / previous, 1)
+
+def _trend(change, up='up', down='down', flat='flat'):
+    if change is None or abs(change) < 2:
+        return flat
+    return up if change > 0 else down
+
+def count_unique(period, shift=0, platform='all', types=None):
+    """Estimated distinct viewers in a period window (HyperLogLog, see HLL_STANDARD_ERROR)"""
+    codes = None if types is None else [EVENT_CODES[t] for t in types]
+    return viewer_sketches.count(*period_window(period, shift), platform=_platform_code(platform), types=codes)
+
+def _share(part, whole):
+    # Independent estimates can put a subset slightly above its superset
+    return round(min(100.0, part * 100.0 / whole), 1) if whole else 0.0
+
+def _engagement_rate(period, shift=0, platform='all'):
+    """Tipping viewers as a percentage of all viewers"""
+    return _share(count_unique(period, shift, platform, ['tip']), count_unique(period, shift, platform))
+
 def calculate_revenue_metrics(period):
     """Calculate revenue metrics for specified period"""
-    if period == 'day':
-        return {
-            'total': 1250,
-            'change': 12.5,
-            'trend': 'up',
-            'breakdown': {'tips': 800, 'private_shows': 350, 'subscriptions': 100}
-        }
-    elif period == 'week':
-        return {
-            'total': 8750,
-            'change': 8.2,
-            'trend': 'up',
-            'breakdown': {'tips': 5600, 'private_shows': 2450, 'subscriptions': 700}
-        }
-    else:  # month
-        return {
-            'total': 37000,
-            'change': 15.3,
-            'trend': 'up',
-            'breakdown': {'tips': 23700, 'private_shows': 10400, 'subscriptions': 2900}
+    current = load_totals(period)
+    total = float(current['amount'].sum())
+    change = _pct_change(total, float(load_totals(period, shift=1)['amount'].sum()))
+    by_type = _revenue_by_type(current)
+    return {
+        'total': round(total, 2),
+        'change': change,
+        'trend': _trend(change),
+        'breakdown': {
+            'tips': by_type['tip'],
+            'private_shows': by_type['private_show'],
+            'subscriptions': by_type['subscription']
         }
+    }
 
 def calculate_viewer_metrics(period):
     """Calculate viewer metrics for specified period"""
+    totals = load_totals(period)
+    leave = EVENT_CODES['viewer_leave']
+    days = period_days(period)
+    active = len(cohort_engine.viewers(ACTIVE, *days))
+    new = min(active, len(cohort_engine.viewers(FIRST_SEEN, *days)))
     return {
-        'total': 2340,
-        'unique': 1890,
-        'average_session': 23.5,
-        'peak': 567,
-        'retention_rate': 78.5,
-        'new_vs_returning': {'new': 35, 'returning': 65}
+        'total': int(totals['events'][EVENT_CODES['viewer_join']]),
+        'unique': count_unique(period),
+        'average_session': round(totals['duration'][leave] / totals['timed'][leave] / 60, 1) if totals['timed'][leave] else 0.0,
+        'peak': concurrency_tracker.peak(*period_window(period)),
+        'retention_rate': calculate_viewer_retention(period),
+        'new_vs_returning': {
+            'new': round(new * 100.0 / active) if active else 0,
+            'returning': round((active - new) * 100.0 / active) if active else 0
+        }
     }
 
 def calculate_engagement_metrics(period):
     """Calculate engagement metrics"""
+    totals = load_totals(period)
     return {
-        'likes': 1234,
-        'comments': 567,
-        'shares': 89,
-        'tips_received': 156,
-        'private_requests': 23,
-        'engagement_rate': 85.2
+        'tips_received': int(totals['events'][EVENT_CODES['tip']]),
+        'subscriptions': int(totals['events'][EVENT_CODES['subscription']]),
+        'private_requests': int(totals['events'][EVENT_CODES['private_show']]),
+        'engagement_rate': _engagement_rate(period)
     }
 
-def get_platform_performance():
+def get_platform_performance(period='month'):
     """Get performance data for all platforms"""
-    return SAMPLE_DATA['platforms']
+    revenue = {row['platform']: row['amount'] for row in rollups.query(*period_window(period), by=('platform',))}
+    performance = {}
+    for code, platform in enumerate(PLATFORMS):
+        if code not in revenue:
+            continue
+        performance[platform] = {
+            'revenue': round(float(revenue[code]), 2),
+            'viewers': count_unique(period, platform=platform),
+            'engagement': _engagement_rate(period, platform=platform)
+        }
+    return performance
 
 def calculate_trends(period):
     """Calculate trend data"""
+    revenue_change = _pct_change(float(load_totals(period)['amount'].sum()),
+                                 float(load_totals(period, shift=1)['amount'].sum()))
+    viewer_change = _pct_change(count_unique(period), count_unique(period, shift=1))
+    engagement_change = _pct_change(_engagement_rate(period), _engagement_rate(period, shift=1))
+
+    revenue_types = [EVENT_CODES[t] for t in REVENUE_TYPES]
+    by_weekday = rollups.query(*period_window(period), by=('weekday',), types=revenue_types)
+    by_hour = rollups.query(*period_window(period), by=('hour_of_day',), types=revenue_types)
+    best_day = max(by_weekday, key=lambda row: row['amount'], default=None)
+    best_hour = max(by_hour, key=lambda row: row['amount'], default=None)
+
     return {
-        'revenue_trend': 'increasing',
-        'viewer_trend': 'stable',
-        'engagement_trend': 'increasing',
-        'best_performing_day': 'Saturday',
-        'best_performing_hour': '22:00'
+        'revenue_trend': _trend(revenue_change, 'increasing', 'decreasing', 'stable'),
+        'viewer_trend': _trend(viewer_change, 'increasing', 'decreasing', 'stable'),
+        'engagement_trend': _trend(engagement_change, 'increasing', 'decreasing', 'stable'),
+        'best_performing_day': WEEKDAYS[best_day['weekday']] if best_day and best_day['amount'] else None,
+        'best_performing_hour': f"{best_hour['hour_of_day']:02d}:00" if best_hour and best_hour['amount'] else None
     }
 
 def get_goal_progress():
     """Get goal progress data"""
-    return {
-        'monthly_revenue': 74,
-        'viewer_growth': 69,
-        'content_creation': 75,
-        'engagement_rate': 94
-    }
+    return {name.removesuffix('_goal'): goal['progress'] for name, goal in goal_tracker.snapshot().items()}
 
 def analyze_content_performance():
     """Analyze content performance"""
@@ -342,24 +592,39 @@ def analyze_streaming_quality():
         'audio_quality_score': 95
     }
 
-def analyze_engagement_rates():
+def analyze_engagement_rates(period='month'):
     """Analyze engagement rates"""
+    totals = load_totals(period)
+    tip = EVENT_CODES['tip']
     return {
-        'chat_engagement': 85,
-        'tip_engagement': 78,
-        'private_show_conversion': 12,
-        'repeat_viewer_rate': 65,
-        'average_tip_amount': 25.50
+        'tip_engagement': _engagement_rate(period),
+        'private_show_conversion': _share(count_unique(period, types=['private_show']), count_unique(period)),
+        'repeat_viewer_rate': calculate_viewer_retention(period),
+        'average_tip_amount': round(totals['amount'][tip] / totals['events'][tip], 2) if totals['events'][tip] else 0.0
     }
 
-def analyze_conversion_metrics():
+def analyze_conversion_metrics(period='month'):
     """Analyze conversion metrics"""
+    viewers = count_unique(period)
+    tippers = count_unique(period, types=['tip'])
+    private = count_unique(period, types=['private_show'])
+    # |tippers and private| = |tippers| + |private| - |tippers or private|;
+    # the absolute error of the union estimate carries over, so small overlaps are rough
+    tipper_to_private = max(0, tippers + private - count_unique(period, types=['tip', 'private_show']))
     return {
-        'visitor_to_follower': 15.2,
-        'follower_to_tipper': 23.8,
-        'tipper_to_private': 8.5,
-        'free_to_premium': 12.3
+        'viewer_to_tipper': _share(tippers, viewers),
+        'tipper_to_private': _share(tipper_to_private, tippers),
+        'viewer_to_subscriber': _share(count_unique(period, types=['subscription']), viewers)
+    }
+
+def get_distribution_metrics(start, end, platform='all'):
+    """p50/p90/p99 of tip amounts and session minutes from the quantile sketches"""
+    distributions = {
+        metric: quantile_sketches.summary(metric, start, end, _platform_code(platform))
+        for metric in METRICS
     }
+    distributions['relative_accuracy'] = RELATIVE_ACCURACY
+    return distributions
 
 def get_optimization_suggestions():
     """Get optimization suggestions"""
@@ -385,65 +650,138 @@ def get_optimization_suggestions():
     ]
 
 def get_industry_benchmarks():
-    """Get industry benchmark data"""
+    """Benchmark rates, plus the median session length and tip over the last BENCHMARK_DAYS (None without data)"""
+    end = time.time()
+    start = end - BENCHMARK_DAYS * DAY_SECONDS
     return {
         'average_engagement_rate': 75,
         'average_conversion_rate': 10,
-        'average_session_duration': 18.5,
-        'average_tip_amount': 22.00
+        'median_session_minutes': quantile_sketches.summary('session_minutes', start, end, qs=(0.5,))['p50'],
+        'median_tip_amount': quantile_sketches.summary('tip_amount', start, end, qs=(0.5,))['p50']
     }
 
 def generate_export_data(data_type, period):
     """Generate data for export"""
     return {
-        'revenue': SAMPLE_DATA['revenue'],
-        'viewers': SAMPLE_DATA['viewers'],
-        'platforms': SAMPLE_DATA['platforms']
+        'revenue': get_revenue_by_day(period, 'all'),
+        'viewers': calculate_viewer_metrics(period),
+        'platforms': get_platform_performance(period)
     }
 
-def format_export_data(data, format_type):
-    """Format data for export"""
-    if format_type == 'json':
-        return data
-    elif format_type == 'csv':
-        return "CSV formatted data would be generated here"
-    elif format_type == 'pdf':
-        return "PDF report would be generated here"
-    else:
-        return data
-
 def generate_revenue_section(report_type):
     """Generate revenue section for report"""
     return calculate_revenue_metrics(report_type)
 
 def generate_viewer_section(report_type):
     """Generate viewer section for report"""
-    return calculate_viewer_metrics(report_type)
+    section = calculate_viewer_metrics(report_type)
+    first_day, end_day = period_days(report_type)
+    section['cohorts'] = get_cohort_report(week_of(end_day - 1) - week_of(first_day) + 1)
+    section['session_retention'] = get_session_retention(report_type)
+    return section
 
 def generate_engagement_section(report_type):
     """Generate engagement section for report"""
     return calculate_engagement_metrics(report_type)
 
+def generate_forecast_section(report_type):
+    """Generate forecast section for report"""
+    return calculate_revenue_projections(report_type)
+
+def _rollup_signature(event_types):
+    """Section signature: per-type rollup sums from the previous period's start up to now"""
+    codes = [EVENT_CODES[event_type] for event_type in event_types]
+    def signature(report_type):
+        start = period_window(report_type, shift=1, now=period_end())[0]
+        rows = rollups.query(start, time.time(), by=('type',), types=codes)
+        return section_signature(sorted((row['type'], row['events'], round(row['amount'], 2)) for row in rows))
+    return signature
+
+def finish_report(report):
+    """Add period, summary and recommendations to a report built from its sections"""
+    report['period'] = get_report_period(report['type'])
+    report['summary'] = generate_report_summary(report['sections'])
+    report['recommendations'] = generate_recommendations(report['type'], report['sections'])
+
+def _submit_report(func, *args):
+    return job_queue.submit('report', 'analytics_report', func, *args)
+
+def _report_response(entry):
+    response = {
+        'success': entry['status'] != 'failed',
+        'report_id': entry['report_id'],
+        'status': entry['status'],
+        'status_url': url_for('analytics.get_report', report_id=entry['report_id'])
+    }
+    if entry['status'] == 'ready':
+        response['report'] = entry['report']
+        response['reused_sections'] = entry['reused_sections']
+        response['html_url'] = url_for('analytics.get_report_html', report_id=entry['report_id'])
+    if entry['error']:
+        response['error'] = entry['error']
+    return response
+
+reports.register_section('revenue', generate_revenue_section, _rollup_signature(REVENUE_TYPES))
+reports.register_section('viewers', generate_viewer_section, _rollup_signature(EVENT_TYPES))
+reports.register_section('engagement', generate_engagement_section, _rollup_signature(EVENT_TYPES))
+reports.register_section('forecast', generate_forecast_section,
+                         lambda report_type: (forecaster.latest() or {}).get('generated_at'))
+reports.set_finisher(finish_report)
+
 def generate_report_summary(sections):
     """Generate report summary"""
+    highlights = []
+    revenue = sections.get('revenue')
+    if revenue:
+        if revenue['change'] is None:
+            highlights.append(f"Revenue totalled {revenue['total']:.2f}")
+        else:
+            direction = 'increased' if revenue['change'] >= 0 else 'decreased'
+            highlights.append(f"Revenue {direction} by {abs(revenue['change'])}% to {revenue['total']:.2f}")
+    if sections.get('viewers'):
+        highlights.append(f"Peak viewer count reached {sections['viewers']['peak']}")
+    if sections.get('engagement'):
+        highlights.append(f"Engagement rate was {sections['engagement']['engagement_rate']}%")
     return {
-        'key_highlights': [
-            'Revenue increased by 15.3% this month',
-            'Peak viewer count reached 567',
-            'Engagement rate improved to 85.2%'
-        ],
-        'performance_score': 87,
-        'trend': 'positive'
+        'key_highlights': highlights,
+        'trend': 'positive' if revenue and (revenue['change'] or 0) >= 0 else 'negative' if revenue else 'neutral'
     }
 
-def generate_recommendations(sections):
+def generate_recommendations(report_type, sections):
     """Generate recommendations based on data"""
-    return [
-        'Focus on interactive content during peak hours',
-        'Implement VIP membership program',
-        'Optimize mobile streaming setup',
-        'Increase social media promotion'
-    ]
+    recommendations = []
+    revenue = sections.get('revenue')
+    if revenue and revenue['total']:
+        source, amount = max(revenue['breakdown'].items(), key=lambda item: item[1])
+        recommendations.append(
+            f"{source.replace('_', ' ').capitalize()} brought {round(amount * 100 / revenue['total'])}% of revenue; "
+            f"build streams around them"
+        )
+        if revenue['change'] is not None and revenue['change'] <= -5:
+            recommendations.append(f"Revenue fell {abs(revenue['change'])}% against the previous period; "
+                                   f"review the stream schedule and promotion")
+    peak_hours = get_peak_viewing_hours(report_type)
+    if peak_hours:
+        recommendations.append(f"Focus on interactive content during peak hours ({', '.join(peak_hours)} UTC)")
+    viewers = sections.get('viewers')
+    if viewers and viewers['unique']:
+        if viewers['retention_rate'] < 30:
+            recommendations.append(f"Only {viewers['retention_rate']}% of last period's viewers returned; "
+                                   f"announce the next stream before ending")
+        if viewers['new_vs_returning']['new'] >= 60:
+            recommendations.append('Most viewers are new; consider a VIP membership program to keep them')
+    engagement = sections.get('engagement')
+    benchmark = get_industry_benchmarks()['average_engagement_rate']
+    if engagement and engagement['engagement_rate'] < benchmark:
+        recommendations.append(f"Engagement rate {engagement['engagement_rate']}% is below the {benchmark}% "
+                               f"benchmark; add tip goals and interactive toys")
+    forecast = sections.get('forecast')
+    if forecast and forecast.get('intervals') and revenue:
+        weekly = revenue['total'] * 7 / PERIOD_DAYS.get(report_type, 30)
+        if forecast['next_week'] < weekly * 0.95:
+            recommendations.append(f"Next week is forecast at {forecast['next_week']:.2f}, below the current pace; "
+                                   f"increase social media promotion")
+    return recommendations or ['Increase social media promotion']
 
 def get_report_period(report_type):
     """Get period for report type"""
@@ -456,57 +794,96 @@ def get_report_period(report_type):
 
 def calculate_total_revenue(period, platform):
     """Calculate total revenue"""
-    return 37000
+    return round(float(load_totals(period, platform=platform)['amount'].sum()), 2)
 
 def get_revenue_by_day(period, platform):
-    """Get revenue breakdown by day"""
-    return SAMPLE_DATA['revenue']['daily']
+    """Get revenue breakdown by UTC calendar day, oldest first, today included"""
+    days = PERIOD_DAYS.get(period, PERIOD_DAYS['month'])
+    today = int(time.time() // DAY_SECONDS)
+    first = today - days + 1
+    sums = np.zeros(days)
+    for row in rollups.query(first * DAY_SECONDS, (today + 1) * DAY_SECONDS, by=('day',),
+                             platform=_platform_code(platform)):
+        sums[row['day'] - first] = row['amount']
+    return [{'date': day_key((first + i) * DAY_SECONDS), 'revenue': round(float(sums[i]), 2)} for i in range(days)]
 
 def get_revenue_by_platform(period):
     """Get revenue breakdown by platform"""
-    return SAMPLE_DATA['platforms']
+    return {
+        PLATFORMS[row['platform']]: round(row['amount'], 2)
+        for row in rollups.query(*period_window(period), by=('platform',)) if row['amount']
+    }
 
 def get_revenue_sources(period):
-    """Get revenue sources breakdown"""
+    """Get revenue sources breakdown in percent"""
+    by_type = _revenue_by_type(load_totals(period))
+    total = sum(by_type.values())
     return {
-        'tips': 60,
-        'private_shows': 28,
-        'subscriptions': 8,
-        'merchandise': 4
+        'tips': round(by_type['tip'] * 100.0 / total, 1) if total else 0,
+        'private_shows': round(by_type['private_show'] * 100.0 / total, 1) if total else 0,
+        'subscriptions': round(by_type['subscription'] * 100.0 / total, 1) if total else 0
     }
 
 def calculate_revenue_projections(period):
-    """Calculate revenue projections"""
+    """Get the cached Holt-Winters revenue forecast (refit in the background, never here)"""
+    forecast = forecaster.latest()
+    if forecast is not None:
+        return forecast
+    # First fit still running: fall back to the last 30 days' daily run rate
+    daily = np.array([day['revenue'] for day in get_revenue_by_day('month', 'all')])
+    mean = float(daily.mean())
+    # Steadier days give a more confident run-rate projection
+    confidence = max(0, round(100 - float(daily.std()) * 100 / mean)) if mean else 0
     return {
-        'next_week': 9200,
-        'next_month': 42000,
-        'confidence': 85
+        'next_week': round(mean * 7, 2),
+        'next_month': round(mean * 30, 2),
+        'intervals': None,
+        'interval_level': None,
+        'confidence': confidence,
+        'model': {'type': 'run_rate', 'reason': 'forecast_pending'}
     }
 
 def get_revenue_comparison(period):
     """Get revenue comparison with previous period"""
+    current = float(load_totals(period)['amount'].sum())
+    previous = float(load_totals(period, shift=1)['amount'].sum())
+    change = _pct_change(current, previous)
     return {
-        'previous_period': 32000,
-        'current_period': 37000,
-        'change_percentage': 15.6,
-        'trend': 'increasing'
+        'previous_period': round(previous, 2),
+        'current_period': round(current, 2),
+        'change_percentage': change,
+        'trend': _trend(change, 'increasing', 'decreasing', 'stable')
     }
 
 def calculate_total_viewers(period):
-    """Calculate total viewers"""
-    return 2340
+    """Calculate total viewers (joins)"""
+    return int(load_totals(period)['events'][EVENT_CODES['viewer_join']])
 
 def calculate_unique_viewers(period):
     """Calculate unique viewers"""
-    return 1890
+    return count_unique(period)
+
+def get_unique_viewers_by_platform(period):
+    """Get unique viewers per platform"""
+    counts = {platform: count_unique(period, platform=platform) for platform in PLATFORMS}
+    return {platform: count for platform, count in counts.items() if count}
 
 def calculate_viewer_retention(period):
-    """Calculate viewer retention"""
-    return 78.5
+    """Share of the previous period's viewers who came back this period, in percent (UTC calendar days)"""
+    return cohort_engine.return_rate(period_days(period, shift=1), period_days(period))
+
+def get_session_retention(period):
+    """Session retention curve over the cohort weeks touching the period"""
+    first_day, end_day = period_days(period)
+    return cohort_engine.session_curve(range(week_of(first_day), week_of(end_day - 1) + 1))
+
+def get_cohort_report(weeks=None):
+    """Cohort weeks, newest first, with size, day-N return rates and session retention"""
+    return cohort_engine.report(weeks)
 
 def get_peak_viewing_hours(period):
-    """Get peak viewing hours"""
-    return ['20:00', '21:00', '22:00', '23:00']
+    """Get peak viewing hours (UTC hours of day with the highest concurrency)"""
+    return [f"{hour:02d}:00" for hour in sorted(concurrency_tracker.busiest_hours(*period_window(period)))]
 
 def get_geographic_data(period):
     """Get geographic distribution"""
@@ -529,4 +906,3 @@ def get_device_breakdown(period):
 def get_engagement_metrics(period):
     """Get engagement metrics"""
     return calculate_engagement_metrics(period)
-
@@ -0,0 +1,278 @@
+"""
+Analytics Export for Squirtvana Pro Enhanced
+Streaming CSV and columnar (Parquet / NumPy .npz) exports of events and rollups, one day at a time
+"""
+
+import io
+import os
+import re
+import csv
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+from src.routes.event_store import event_store, EVENT_TYPES, PLATFORMS, DAY_SECONDS
+from src.routes.rollups import rollups
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet is optional; .npz needs nothing beyond NumPy
+    pa = pq = None
+
+# Export Configuration
+EXPORT_CONFIG = {
+    'export_dir': os.path.join(os.path.dirname(os.path.dirname(__file__)), 'exports'),
+    'window_days': 7,              # rollup rows are queried a week at a time
+    'csv_chunk_bytes': 256 * 1024,
+    'retention_hours': 24,
+    'max_days': 400
+}
+
+# Dataset -> column name -> dtype. Every batch carries exactly these arrays,
+# so columnar writers can append batch by batch without holding the export.
+DATASETS = {
+    'events': OrderedDict([
+        ('timestamp', 'datetime64[ms]'),
+        ('type', 'U12'),
+        ('platform', 'U10'),
+        ('amount', np.float64),
+        ('viewer', np.uint64),      # hashed viewer id, 0 when anonymous
+        ('duration', np.float32)
+    ]),
+    'hourly': OrderedDict([
+        ('hour', 'datetime64[s]'),
+        ('platform', 'U10'),
+        ('type', 'U12'),
+        ('events', np.int64),
+        ('amount', np.float64),
+        ('duration', np.float64)
+    ]),
+    'daily': OrderedDict([
+        ('date', 'datetime64[D]'),
+        ('platform', 'U10'),
+        ('type', 'U12'),
+        ('events', np.int64),
+        ('amount', np.float64),
+        ('duration', np.float64)
+    ])
+}
+# Legacy /export data_type names
+DATASET_ALIASES = {'dashboard': 'daily', 'revenue': 'daily', 'viewers': 'daily'}
+
+FORMAT_EXTENSIONS = {'csv': 'csv', 'parquet': 'parquet', 'npz': 'npz'}
+FORMAT_MIMETYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'npz': 'application/zip'
+}
+
+_TYPE_NAMES = np.array(EVENT_TYPES)
+_PLATFORM_NAMES = np.array(PLATFORMS)
+
+
+class ExportError(ValueError):
+    """Unknown dataset or format, or an unusable range"""
+
+
+def available_formats():
+    return [fmt for fmt in FORMAT_EXTENSIONS if fmt != 'parquet' or pq is not None]
+
+
+def resolve_dataset(data_type):
+    dataset = DATASET_ALIASES.get(data_type, data_type)
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown data_type '{data_type}'; use one of {', '.join(DATASETS)}")
+    return dataset
+
+
+def check_request(data_type, fmt, start, end):
+    """Validated dataset name for an export request"""
+    dataset = resolve_dataset(data_type)
+    if fmt not in available_formats():
+        raise ExportError(f"Unsupported format '{fmt}'; available: {', '.join(available_formats())}")
+    if end - start > EXPORT_CONFIG['max_days'] * DAY_SECONDS:
+        raise ExportError(f"Export ranges are limited to {EXPORT_CONFIG['max_days']} days")
+    return dataset
+
+
+def _day_windows(start, end, days):
+    """[start, end) split at UTC day boundaries into windows of at most `days` days"""
+    edge = start
+    while edge < end:
+        boundary = (int(edge // DAY_SECONDS) + days) * DAY_SECONDS
+        yield edge, min(boundary, end)
+        edge = boundary
+
+
+def _event_batch(columns):
+    return OrderedDict([
+        ('timestamp', (columns['ts'] * 1000).astype('datetime64[ms]')),
+        ('type', _TYPE_NAMES[columns['type']]),
+        ('platform', _PLATFORM_NAMES[columns['platform']]),
+        ('amount', columns['amount']),
+        ('viewer', columns['viewer']),
+        ('duration', columns['duration'])
+    ])
+
+
+def _rollup_batch(dataset, rows):
+    key, width = ('hour', 3600) if dataset == 'hourly' else ('date', DAY_SECONDS)
+    source = 'hour' if dataset == 'hourly' else 'day'
+    batch = OrderedDict()
+    for name, dtype in DATASETS[dataset].items():
+        if name == key:
+            values = np.array([row[source] * width for row in rows], dtype=np.int64).astype('datetime64[s]')
+        elif name == 'platform':
+            values = _PLATFORM_NAMES[[row['platform'] for row in rows]]
+        elif name == 'type':
+            values = _TYPE_NAMES[[row['type'] for row in rows]]
+        else:
+            values = np.array([row[name] for row in rows])
+        batch[name] = values.astype(dtype)
+    return batch
+
+
+def iter_batches(dataset, start, end):
+    """Column batches of a dataset over [start, end): one event segment, or a window of rollup rows"""
+    if dataset == 'events':
+        for columns in event_store.iter_segments(start, end):
+            yield _event_batch(columns)
+        return
+
+    source = 'hour' if dataset == 'hourly' else 'day'
+    for window_start, window_end in _day_windows(start, end, EXPORT_CONFIG['window_days']):
+        rows = rollups.query(window_start, window_end, by=(source, 'platform', 'type'))
+        rows.sort(key=lambda row: (row[source], row['platform'], row['type']))
+        if rows:
+            yield _rollup_batch(dataset, rows)
+
+
+def _csv_values(values):
+    if np.issubdtype(values.dtype, np.datetime64):
+        return np.datetime_as_string(values).tolist()
+    return values.tolist()
+
+
+def iter_csv(dataset, start, end):
+    """CSV text of a dataset in chunks of about csv_chunk_bytes; memory is bounded by one batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(DATASETS[dataset])
+    for batch in iter_batches(dataset, start, end):
+        columns = [_csv_values(values) for values in batch.values()]
+        for offset in range(0, len(columns[0]), 10000):
+            writer.writerows(zip(*(column[offset:offset + 10000] for column in columns)))
+            if buffer.tell() >= EXPORT_CONFIG['csv_chunk_bytes']:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _write_csv(path, dataset, start, end):
+    rows = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for chunk in iter_csv(dataset, start, end):
+            f.write(chunk)
+            rows += chunk.count('\n')
+    return rows - 1
+
+
+def _write_parquet(path, dataset, start, end):
+    """One row group per batch"""
+    schema = pa.schema([
+        (name, pa.from_numpy_dtype(np.dtype(dtype)) if not str(dtype).startswith('U') else pa.string())
+        for name, dtype in DATASETS[dataset].items()
+    ])
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for batch in iter_batches(dataset, start, end):
+            writer.write_table(pa.table([pa.array(v) for v in batch.values()], schema=schema))
+            rows += len(batch[next(iter(batch))])
+    return rows
+
+
+def _write_npz(path, dataset, start, end):
+    """np.load()-compatible archive with one array per column.
+
+    Batches are appended to one raw spill file per column, then each is
+    copied into the archive behind a .npy header once the row count is
+    known, so only one batch is ever in memory.
+    """
+    spill = {name: open(f"{path}.{name}.raw", 'w+b') for name in DATASETS[dataset]}
+    rows = 0
+    try:
+        for batch in iter_batches(dataset, start, end):
+            for name, values in batch.items():
+                spill[name].write(np.ascontiguousarray(values).tobytes())
+            rows += len(batch[next(iter(batch))])
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for name, dtype in DATASETS[dataset].items():
+                header = {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                          'fortran_order': False, 'shape': (rows,)}
+                with archive.open(f"{name}.npy", 'w', force_zip64=True) as member:
+                    np.lib.format.write_array_header_2_0(member, header)
+                    spill[name].seek(0)
+                    for block in iter(lambda: spill[name].read(1024 * 1024), b''):
+                        member.write(block)
+    finally:
+        for name, f in spill.items():
+            f.close()
+            os.remove(f"{path}.{name}.raw")
+    return rows
+
+
+WRITERS = {'csv': _write_csv, 'parquet': _write_parquet, 'npz': _write_npz}
+
+
+def export_filename(dataset, fmt, start, end):
+    return f"analytics_{dataset}_{int(start)}_{int(end)}_{uuid.uuid4().hex[:8]}.{FORMAT_EXTENSIONS[fmt]}"
+
+
+# Names export_filename() gives finished files; never the .partial or .raw files of a running job
+EXPORT_NAME = re.compile(
+    rf"analytics_({'|'.join(DATASETS)})_\d+_\d+_[0-9a-f]{{8}}\.({'|'.join(FORMAT_EXTENSIONS.values())})"
+)
+
+
+def is_export_filename(filename):
+    return EXPORT_NAME.fullmatch(filename) is not None
+
+
+def write_export(dataset, fmt, start, end):
+    """Job body for /export: write the file under export_dir and return its summary"""
+    export_dir = EXPORT_CONFIG['export_dir']
+    os.makedirs(export_dir, exist_ok=True)
+    prune_exports()
+    filename = export_filename(dataset, fmt, start, end)
+    path = os.path.join(export_dir, filename)
+    partial = f"{path}.partial"
+    try:
+        rows = WRITERS[fmt](partial, dataset, start, end)
+        # Finished files never change, so resumed downloads stay consistent
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return {
+        'filename': filename,
+        'dataset': dataset,
+        'format': fmt,
+        'rows': rows,
+        'bytes': os.path.getsize(path)
+    }
+
+
+def prune_exports():
+    """Delete finished exports older than retention_hours"""
+    cutoff = time.time() - EXPORT_CONFIG['retention_hours'] * 3600
+    export_dir = EXPORT_CONFIG['export_dir']
+    for name in os.listdir(export_dir):
+        path = os.path.join(export_dir, name)
+        if name.startswith('analytics_') and os.path.getmtime(path) < cutoff:
+            os.remove(path)
@@ -6,10 +6,14 @@ Einfache Flask-App mit OBS-Integration
 
 import os
 import json
+import time
 import subprocess
 import requests
 from flask import Flask, render_template, request, jsonify, send_from_directory
 from flask_cors import CORS
+from src.routes.llm_accounting import record_llm_call
+from src.routes.providers import openrouter_base_url, elevenlabs_base_url
+from src.routes.model_router import router, ModelUnavailableError
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 CORS(app)
@@ -39,44 +43,59 @@ def generate_text():
         if not prompt:
             return jsonify({'error': 'Kein Prompt angegeben'}), 400
         
-        # OpenRouter API Call
-        headers = {
-            'Authorization': f'Bearer {OPENROUTER_KEY}',
-            'Content-Type': 'application/json'
-        }
-        
-        payload = {
-            'model': 'anthropic/claude-3-haiku',
-            'messages': [
-                {'role': 'user', 'content': f'Generate a flirty response: {prompt}'}
-            ],
-            'max_tokens': 150
-        }
+        # OpenRouter API Call (hedged/failed over across models by the router).
+        # Haiku is already the budget fallback model, so choose_model() has nothing to downgrade to
+        try:
+            generated_text, _ = router.call('anthropic/claude-3-haiku', request_flirty_response, prompt)
+        except ModelUnavailableError:
+            return jsonify({'error': 'GPT API Fehler'}), 500
         
-        response = requests.post(
-            'https://openrouter.ai/api/v1/chat/completions',
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
+        # OBS Text aktualisieren
+        update_obs_text(generated_text)
         
-        if response.status_code == 200:
-            result = response.json()
-            generated_text = result['choices'][0]['message']['content']
-            
-            # OBS Text aktualisieren
-            update_obs_text(generated_text)
-            
-            return jsonify({
-                'success': True,
-                'text': generated_text
-            })
-        else:
-            return jsonify({'error': 'GPT API Fehler'}), 500
+        return jsonify({
+            'success': True,
+            'text': generated_text
+        })
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def request_flirty_response(model, prompt):
+    """OpenRouter completion for one model; raises on API errors"""
+    headers = {
+        'Authorization': f'Bearer {OPENROUTER_KEY}',
+        'Content-Type': 'application/json'
+    }
+    
+    payload = {
+        'model': model,
+        'messages': [
+            {'role': 'user', 'content': f'Generate a flirty response: {prompt}'}
+        ],
+        'max_tokens': 150
+    }
+    
+    started = time.monotonic()
+    response = requests.post(
+        f'{openrouter_base_url()}/chat/completions',
+        headers=headers,
+        json=payload,
+        timeout=30
+    )
+    latency_ms = (time.monotonic() - started) * 1000
+    
+    if response.status_code != 200:
+        record_llm_call(model, 'flirty_response', None, latency_ms, ok=False)
+        response.raise_for_status()
+        raise RuntimeError(f'GPT API Fehler ({response.status_code})')
+    
+    result = response.json()
+    generated_text = result['choices'][0]['message']['content']
+    record_llm_call(model, 'flirty_response', result.get('usage'), latency_ms,
+                    prompt_text=prompt, completion_text=generated_text)
+    return generated_text
+
 @app.route('/api/audio', methods=['POST'])
 def generate_audio():
     """ElevenLabs Audio Generator"""
@@ -88,7 +107,7 @@ def generate_audio():
             return jsonify({'error': 'Kein Text angegeben'}), 400
         
         # ElevenLabs API Call
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{ELEVENLABS_VOICE}"
+        url = f"{elevenlabs_base_url()}/text-to-speech/{ELEVENLABS_VOICE}"
         headers = {
             'xi-api-key': ELEVENLABS_KEY,
             'Content-Type': 'application/json'
@@ -1,20 +1,219 @@
 import os
+import uuid
+import logging
+import hashlib
+import threading
 import requests
-from flask import Blueprint, request, jsonify, send_file
-from dotenv import load_dotenv
-
-load_dotenv()
+from flask import Blueprint, Response, request, jsonify, send_file
+from werkzeug.security import safe_join
 
 audio_bp = Blueprint('audio', __name__)
+logger = logging.getLogger(__name__)
+
+from src.routes.providers import env, elevenlabs_base_url, cached_status
+from src.routes.singleflight import SingleFlight
+
+audio_flight = SingleFlight('tts')
 
-ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
-ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID")
-ELEVENLABS_URL = f"https://api.elevenlabs.io/v1/text-to-speech/{ELEVENLABS_VOICE_ID}"
+ELEVENLABS_MODEL_ID = "eleven_monolingual_v1"
+ELEVENLABS_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.5
+}
+STREAM_CHUNK_SIZE = 4096
+AUDIO_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+ETAG_READ_SIZE = 1024 * 1024
+PREFETCH_WAIT_TIMEOUT = 30
 
 # Create audio directory if it doesn't exist
 AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'audio')
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
+def elevenlabs_voice_id():
+    return env("ELEVENLABS_VOICE_ID")
+
+def elevenlabs_tts_url(stream=False):
+    """Text-to-speech URL for the configured voice (read lazily from env)"""
+    url = f"{elevenlabs_base_url()}/text-to-speech/{elevenlabs_voice_id()}"
+    return f"{url}/stream" if stream else url
+
+def audio_cache_filename(text):
+    """Content-addressed cache filename for a TTS request"""
+    key = f"{elevenlabs_voice_id()}|{ELEVENLABS_MODEL_ID}|{sorted(ELEVENLABS_VOICE_SETTINGS.items())}|{text}"
+    return f"tts_{hashlib.sha256(key.encode('utf-8')).hexdigest()}.mp3"
+
+def is_content_addressed(filename):
+    """Cache files are named after their request hash and never change"""
+    return filename.startswith('tts_') and filename.endswith('.mp3')
+
+# path -> (mtime_ns, size, etag); avoids re-hashing a clip on every replay
+_etag_cache = {}
+_etag_lock = threading.Lock()
+
+def audio_content_etag(audio_path):
+    """Strong ETag derived from the SHA-256 of the file contents"""
+    stat = os.stat(audio_path)
+    with _etag_lock:
+        cached = _etag_cache.get(audio_path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    
+    digest = hashlib.sha256()
+    with open(audio_path, 'rb') as f:
+        for block in iter(lambda: f.read(ETAG_READ_SIZE), b''):
+            digest.update(block)
+    etag = digest.hexdigest()
+    
+    with _etag_lock:
+        _etag_cache[audio_path] = (stat.st_mtime_ns, stat.st_size, etag)
+    return etag
+
+def send_audio_file(audio_path, filename):
+    """Send an audio file with Range, conditional GET and cache headers.
+
+    ``conditional=True`` lets Werkzeug answer ``Range``/``If-Range`` with 206
+    and ``If-None-Match`` with 304. The body is handed to the server's
+    ``wsgi.file_wrapper`` (sendfile(2) under gunicorn), or to the front proxy
+    when ``USE_X_SENDFILE`` is enabled, so the bytes never pass through Python.
+    """
+    immutable = is_content_addressed(filename)
+    response = send_file(
+        audio_path,
+        mimetype='audio/mpeg',
+        conditional=True,
+        etag=audio_content_etag(audio_path),
+        max_age=AUDIO_IMMUTABLE_MAX_AGE if immutable else None
+    )
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        # Fixed names like test_voice.mp3 are overwritten; revalidate via ETag
+        response.cache_control.no_cache = True
+    return response
+
+def elevenlabs_headers():
+    """Request headers for ElevenLabs TTS calls"""
+    return {
+        "Accept": "audio/mpeg",
+        "Content-Type": "application/json",
+        "xi-api-key": env("ELEVENLABS_API_KEY")
+    }
+
+def elevenlabs_payload(text):
+    """Request body for ElevenLabs TTS calls"""
+    return {
+        "text": text,
+        "model_id": ELEVENLABS_MODEL_ID,
+        "voice_settings": ELEVENLABS_VOICE_SETTINGS
+    }
+
+def tee_audio_stream(response, audio_path):
+    """Yield upstream audio chunks while writing them into the audio cache.
+
+    The cache file only appears under its final name once the upstream
+    stream completed, so a dropped connection never leaves a truncated clip.
+    """
+    part_path = f"{audio_path}.{uuid.uuid4().hex}.part"
+    completed = False
+    try:
+        with open(part_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                if not chunk:
+                    continue
+                f.write(chunk)
+                yield chunk
+        os.replace(part_path, audio_path)
+        completed = True
+    finally:
+        response.close()
+        if not completed and os.path.exists(part_path):
+            os.remove(part_path)
+
+def synthesize_to_cache(text, cancel_event=None):
+    """Synthesize text into the audio cache via the streaming route.
+
+    Returns the cache filename, or None if cancelled or the upstream call failed.
+    """
+    audio_filename = audio_cache_filename(text)
+    audio_path = os.path.join(AUDIO_DIR, audio_filename)
+    if os.path.exists(audio_path):
+        return audio_filename
+    
+    response = requests.post(
+        elevenlabs_tts_url(stream=True),
+        json=elevenlabs_payload(text),
+        headers=elevenlabs_headers(),
+        stream=True,
+        timeout=30
+    )
+    if response.status_code != 200:
+        response.close()
+        return None
+    
+    chunks = tee_audio_stream(response, audio_path)
+    for _ in chunks:
+        if cancel_event is not None and cancel_event.is_set():
+            # Closing the generator drops the partial file and the upstream connection
+            chunks.close()
+            return None
+    return audio_filename
+
+# prefetch_id -> {'text', 'filename', 'cancel': Event, 'done': Event}
+_prefetches = {}
+_prefetch_lock = threading.Lock()
+
+def _run_prefetch(prefetch_id, prefetch):
+    """Background worker for start_audio_prefetch"""
+    try:
+        synthesize_to_cache(prefetch['text'], prefetch['cancel'])
+    except Exception as e:
+        logger.warning(f"Audio prefetch failed: {e}")
+    finally:
+        prefetch['done'].set()
+        with _prefetch_lock:
+            _prefetches.pop(prefetch_id, None)
+
+def start_audio_prefetch(text):
+    """Start synthesizing text in the background and return a prefetch id"""
+    prefetch_id = uuid.uuid4().hex
+    prefetch = {
+        'text': text,
+        'filename': audio_cache_filename(text),
+        'cancel': threading.Event(),
+        'done': threading.Event()
+    }
+    with _prefetch_lock:
+        _prefetches[prefetch_id] = prefetch
+    
+    threading.Thread(target=_run_prefetch, args=(prefetch_id, prefetch), daemon=True).start()
+    return prefetch_id
+
+def cancel_audio_prefetch(prefetch_id):
+    """Cancel a pending prefetch; returns False if it already finished"""
+    with _prefetch_lock:
+        prefetch = _prefetches.pop(prefetch_id, None)
+    if prefetch is None:
+        return False
+    prefetch['cancel'].set()
+    return True
+
+def claim_audio_prefetch(text, prefetch_id=None):
+    """Wait for an in-flight prefetch of text so its result is a cache hit.
+
+    If prefetch_id belongs to a different text (the operator edited it),
+    that prefetch is cancelled instead of being waited for.
+    """
+    audio_filename = audio_cache_filename(text)
+    with _prefetch_lock:
+        own = _prefetches.get(prefetch_id) if prefetch_id else None
+        pending = next((p for p in _prefetches.values() if p['filename'] == audio_filename), None)
+    
+    if own is not None and own['filename'] != audio_filename:
+        cancel_audio_prefetch(prefetch_id)
+    if pending is not None:
+        pending['done'].wait(PREFETCH_WAIT_TIMEOUT)
+
 @audio_bp.route('/audio/generate', methods=['POST'])
 def generate_audio():
     """Generate audio from text using ElevenLabs"""
@@ -25,35 +224,29 @@ def generate_audio():
         if not text:
             return jsonify({'error': 'Text is required'}), 400
         
-        headers = {
-            "Accept": "audio/mpeg",
-            "Content-Type": "application/json",
-            "xi-api-key": ELEVENLABS_API_KEY
-        }
-        
-        payload = {
-            "text": text,
-            "model_id": "eleven_monolingual_v1",
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.5
-            }
-        }
+        claim_audio_prefetch(text, data.get('prefetch_id'))
         
-        response = requests.post(ELEVENLABS_URL, json=payload, headers=headers)
+        audio_filename = audio_cache_filename(text)
+        audio_path = os.path.join(AUDIO_DIR, audio_filename)
         
-        if response.status_code == 200:
-            # Save audio file
-            audio_filename = "output.mp3"
-            audio_path = os.path.join(AUDIO_DIR, audio_filename)
-            
-            with open(audio_path, 'wb') as f:
-                f.write(response.content)
-            
+        if os.path.exists(audio_path):
+            return jsonify({
+                'success': True,
+                'audio_url': f'/api/audio/file/{audio_filename}',
+                'text': text,
+                'cached': True
+            })
+        
+        # Concurrent requests for the same clip share one ElevenLabs call
+        synthesized, shared = audio_flight.do(audio_filename, synthesize_to_cache, text)
+        
+        if synthesized:
             return jsonify({
                 'success': True,
                 'audio_url': f'/api/audio/file/{audio_filename}',
-                'text': text
+                'text': text,
+                'cached': False,
+                'deduplicated': shared
             })
         else:
             return jsonify({'error': 'Failed to generate audio'}), 500
@@ -61,13 +254,75 @@ def generate_audio():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@audio_bp.route('/audio/stream', methods=['GET', 'POST'])
+def stream_audio():
+    """Stream ElevenLabs audio to the client while it is being synthesized"""
+    try:
+        if request.method == 'POST':
+            data = request.get_json() or {}
+            text = data.get('text', '')
+        else:
+            text = request.args.get('text', '')
+        
+        if not text:
+            return jsonify({'error': 'Text is required'}), 400
+        
+        audio_filename = audio_cache_filename(text)
+        audio_path = os.path.join(AUDIO_DIR, audio_filename)
+        
+        if os.path.exists(audio_path):
+            return send_audio_file(audio_path, audio_filename)
+        
+        response = requests.post(
+            elevenlabs_tts_url(stream=True),
+            json=elevenlabs_payload(text),
+            headers=elevenlabs_headers(),
+            stream=True,
+            timeout=30
+        )
+        
+        if response.status_code != 200:
+            response.close()
+            return jsonify({'error': 'Failed to stream audio'}), 500
+        
+        # No Content-Length: the WSGI server falls back to chunked transfer
+        return Response(
+            tee_audio_stream(response, audio_path),
+            mimetype='audio/mpeg',
+            headers={
+                'Cache-Control': 'no-store',
+                'X-Audio-Url': f'/api/audio/file/{audio_filename}'
+            }
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@audio_bp.route('/audio/prefetch/cancel', methods=['POST'])
+def cancel_prefetch():
+    """Cancel a speculative TTS prefetch, e.g. after the text was edited"""
+    try:
+        data = request.get_json() or {}
+        prefetch_id = data.get('prefetch_id', '')
+        
+        if not prefetch_id:
+            return jsonify({'error': 'prefetch_id is required'}), 400
+        
+        return jsonify({
+            'success': True,
+            'cancelled': cancel_audio_prefetch(prefetch_id)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @audio_bp.route('/audio/file/<filename>', methods=['GET'])
 def serve_audio(filename):
     """Serve audio files"""
     try:
-        audio_path = os.path.join(AUDIO_DIR, filename)
-        if os.path.exists(audio_path):
-            return send_file(audio_path, mimetype='audio/mpeg')
+        audio_path = safe_join(AUDIO_DIR, filename)
+        if audio_path and os.path.isfile(audio_path):
+            return send_audio_file(audio_path, filename)
         else:
             return jsonify({'error': 'Audio file not found'}), 404
     except Exception as e:
@@ -79,22 +334,7 @@ def test_voice():
     try:
         test_text = "Hello, this is a voice test for the Squirtvana PWA. Audio generation is working perfectly."
         
-        headers = {
-            "Accept": "audio/mpeg",
-            "Content-Type": "application/json",
-            "xi-api-key": ELEVENLABS_API_KEY
-        }
-        
-        payload = {
-            "text": test_text,
-            "model_id": "eleven_monolingual_v1",
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.5
-            }
-        }
-        
-        response = requests.post(ELEVENLABS_URL, json=payload, headers=headers)
+        response = requests.post(elevenlabs_tts_url(), json=elevenlabs_payload(test_text), headers=elevenlabs_headers())
         
         if response.status_code == 200:
             # Save test audio file
@@ -115,35 +355,39 @@ def test_voice():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def check_elevenlabs():
+    """Health probe via the voice lookup, which consumes no characters"""
+    headers = {
+        "xi-api-key": env("ELEVENLABS_API_KEY")
+    }
+    
+    voice_url = f"{elevenlabs_base_url()}/voices/{elevenlabs_voice_id()}"
+    response = requests.get(voice_url, headers=headers, timeout=10)
+    
+    if response.status_code == 200:
+        voice_data = response.json()
+        return {
+            'status': 'active',
+            'voice_name': voice_data.get('name', 'Unknown'),
+            'voice_id': elevenlabs_voice_id(),
+            'connection': 'ok'
+        }, 200
+    else:
+        return {
+            'status': 'error',
+            'error': 'Failed to connect to ElevenLabs API'
+        }, 500
+
 @audio_bp.route('/audio/status', methods=['GET'])
 def audio_status():
-    """Check ElevenLabs service status"""
-    try:
-        headers = {
-            "xi-api-key": ELEVENLABS_API_KEY
-        }
-        
-        # Test API connection by getting voice info
-        voice_url = f"https://api.elevenlabs.io/v1/voices/{ELEVENLABS_VOICE_ID}"
-        response = requests.get(voice_url, headers=headers)
-        
-        if response.status_code == 200:
-            voice_data = response.json()
-            return jsonify({
-                'status': 'active',
-                'voice_name': voice_data.get('name', 'Unknown'),
-                'voice_id': ELEVENLABS_VOICE_ID,
-                'connection': 'ok'
-            })
-        else:
-            return jsonify({
-                'status': 'error',
-                'error': 'Failed to connect to ElevenLabs API'
-            }), 500
-            
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    """Check ElevenLabs service status (cached, see providers.cached_status)"""
+    payload, http_status = cached_status('elevenlabs', check_elevenlabs)
+    return jsonify(payload), http_status
 
+@audio_bp.route('/audio/metrics', methods=['GET'])
+def audio_metrics():
+    """Request deduplication counters for TTS calls"""
+    return jsonify({
+        'success': True,
+        'dedup': audio_flight.stats()
+    })
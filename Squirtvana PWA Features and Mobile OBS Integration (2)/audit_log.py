@@ -0,0 +1,124 @@
+"""
+Compliance Audit Trail for Squirtvana Pro Enhanced
+Append-only SQLite log of compliance-relevant actions with time-based retention
+"""
+
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+
+from src.routes.content_store import SQLiteLog
+
+DEFAULT_DB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
+DB_FILENAME = 'audit_log.db'
+DEFAULT_RETENTION_DAYS = 365
+MAX_QUERY_LIMIT = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    action TEXT NOT NULL,
+    user TEXT NOT NULL,
+    details TEXT NOT NULL,
+    ip_address TEXT,
+    compliance_check TEXT NOT NULL,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_audit_log_time
+    ON audit_log (timestamp);
+CREATE INDEX IF NOT EXISTS idx_audit_log_action_time
+    ON audit_log (action, timestamp);
+"""
+
+
+class AuditLog(SQLiteLog):
+    """Compliance actions, one row each, never updated.
+
+    Entries carry a pass/fail compliance check and optional JSON metadata.
+    Every write also deletes entries older than retention_days, so queries
+    and counts only ever cover the retention window.
+    """
+
+    def __init__(self, db_path, retention_days=DEFAULT_RETENTION_DAYS):
+        super().__init__(db_path, SCHEMA)
+        self.retention_days = retention_days
+
+    def record(self, action, details, user='system', ip_address=None, compliance_check='passed', metadata=None):
+        """Append one entry and return its id"""
+        now = datetime.utcnow()
+        cutoff = (now - timedelta(days=self.retention_days)).isoformat()
+        conn = self._connection()
+        with self._write_lock, conn:
+            cursor = conn.execute(
+                '''INSERT INTO audit_log
+                       (timestamp, action, user, details, ip_address, compliance_check, metadata)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                (now.isoformat(), action, user, details, ip_address, compliance_check,
+                 json.dumps(metadata) if metadata is not None else None)
+            )
+            conn.execute('DELETE FROM audit_log WHERE timestamp < ?', (cutoff,))
+        return cursor.lastrowid
+
+    def entries(self, start_date=None, end_date=None, action_type=None, compliance_check=None,
+                limit=MAX_QUERY_LIMIT):
+        """Newest entries first; dates are ISO strings, end_date is inclusive of that day"""
+        clauses, params = [], []
+        if start_date:
+            clauses.append('timestamp >= ?')
+            params.append(start_date)
+        if end_date:
+            clauses.append('timestamp < ?')
+            # A bare date means the whole day
+            params.append(end_date + 'T99' if len(end_date) == 10 else end_date)
+        if action_type:
+            clauses.append('action = ?')
+            params.append(action_type)
+        if compliance_check:
+            clauses.append('compliance_check = ?')
+            params.append(compliance_check)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._connection().execute(
+            f'''SELECT id, timestamp, action, user, details, ip_address, compliance_check, metadata
+                FROM audit_log {where} ORDER BY timestamp DESC, id DESC LIMIT ?''',
+            (*params, min(limit, MAX_QUERY_LIMIT))
+        ).fetchall()
+        entries = []
+        for row in rows:
+            entry = dict(row)
+            entry['metadata'] = json.loads(entry['metadata']) if entry['metadata'] else None
+            entries.append(entry)
+        return entries
+
+    def count(self, action_type=None, compliance_check=None, listed=None):
+        """Number of retained entries matching the filters.
+
+        listed=(key, value) only counts entries whose metadata[key] is a
+        list containing value.
+        """
+        clauses, params = [], []
+        if action_type:
+            clauses.append('action = ?')
+            params.append(action_type)
+        if compliance_check:
+            clauses.append('compliance_check = ?')
+            params.append(compliance_check)
+        if listed:
+            clauses.append('EXISTS (SELECT 1 FROM json_each(metadata, ?) WHERE value = ?)')
+            params.extend([f"$.{listed[0]}", listed[1]])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self._connection().execute(f'SELECT COUNT(*) FROM audit_log {where}', params).fetchone()[0]
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+def get_audit_trail(db_dir=None):
+    """Shared AuditLog for db_dir (defaults to the database folder)"""
+    db_path = os.path.join(db_dir or DEFAULT_DB_DIR, DB_FILENAME)
+    with _logs_lock:
+        log = _logs.get(db_path)
+        if log is None:
+            log = _logs[db_path] = AuditLog(db_path)
+        return log
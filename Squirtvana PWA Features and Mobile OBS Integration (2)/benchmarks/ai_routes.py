@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for the AI routes against local provider stubs
+Serves the gpt/audio/ai_services blueprints (and the standalone app.py) over real HTTP,
+points them at benchmarks/stub_servers.py and measures latency and throughput under
+concurrency. No paid API is called; caches and data files go to a temporary directory.
+
+Usage: python benchmarks/ai_routes.py [--concurrency 1,8,32] [--requests 64] [--routes gpt_generate,audio_stream]
+                                      [--chat '{"*": {"latency": {"dist": "lognormal", "median": 0.4}}}']
+                                      [--tts '{"error_rate": 0.05}']
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# benchmarks/ lives next to the route modules (src/routes); imports are rooted above src/
+ROUTES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(ROUTES_DIR))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+from werkzeug.serving import make_server
+
+from stub_servers import start_stub_server
+
+DEFAULT_CHAT = {'*': {'latency': {'dist': 'lognormal', 'median': 0.4, 'sigma': 0.4}, 'completion_chars': 600}}
+DEFAULT_TTS = {'latency': {'dist': 'lognormal', 'median': 0.25, 'sigma': 0.3}, 'audio_bytes': 64000}
+SUGGESTION_BATCH_SIZE = 10
+
+
+def unique(label):
+    # Every request carries a fresh prompt so caches and single-flight never short-circuit it
+    return f"{label} {uuid.uuid4().hex[:12]}"
+
+
+def build_servers(stub, data_dir):
+    """Configure the route modules for the stub and serve them on local ports"""
+    os.environ.update({
+        'OPENROUTER_BASE_URL': stub.base_url,
+        'ELEVENLABS_BASE_URL': stub.base_url,
+        'OPENROUTER_KEY': 'stub',
+        'ELEVENLABS_API_KEY': 'stub',
+        'ELEVENLABS_VOICE_ID': 'stub-voice'
+    })
+
+    from flask import Flask
+    from src.routes import audio, content_store, llm_accounting
+    from src.routes.gpt import gpt_bp
+    from src.routes.ai_services import ai_bp
+    import src.routes.app as legacy
+
+    audio.AUDIO_DIR = os.path.join(data_dir, 'audio')
+    os.makedirs(audio.AUDIO_DIR, exist_ok=True)
+    content_store.DEFAULT_DB_DIR = data_dir
+    llm_accounting.accounting.db_path = os.path.join(data_dir, llm_accounting.DB_FILENAME)
+    legacy.app.static_folder = data_dir
+    legacy.update_obs_text = lambda text: None
+
+    app = Flask(__name__)
+    app.register_blueprint(gpt_bp, url_prefix='/api')
+    app.register_blueprint(audio.audio_bp, url_prefix='/api')
+    app.register_blueprint(ai_bp, url_prefix='/api/ai')
+
+    servers = {}
+    for name, wsgi_app in (('routes', app), ('legacy', legacy.app)):
+        server = make_server('127.0.0.1', 0, wsgi_app, threaded=True)
+        threading.Thread(target=server.serve_forever, name=f'bench-{name}', daemon=True).start()
+        servers[name] = server
+    return servers
+
+
+class Client:
+    """One requests.Session per worker thread"""
+
+    def __init__(self, base_urls):
+        self.base_urls = base_urls
+        self._local = threading.local()
+
+    def session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def url(self, server, path):
+        return self.base_urls[server] + path
+
+
+def run_gpt_generate(client):
+    r = client.session().post(client.url('routes', '/api/gpt/generate'), json={'prompt': unique('tease me')}, timeout=60)
+    return r.status_code == 200 and r.json().get('success'), None
+
+
+def run_legacy_gpt(client):
+    r = client.session().post(client.url('legacy', '/api/gpt'), json={'prompt': unique('hello')}, timeout=60)
+    return r.status_code == 200, None
+
+
+def run_audio_generate(client):
+    r = client.session().post(client.url('routes', '/api/audio/generate'), json={'text': unique('welcome')}, timeout=60)
+    return r.status_code == 200 and r.json().get('success'), None
+
+
+def run_legacy_audio(client):
+    r = client.session().post(client.url('legacy', '/api/audio'), json={'text': unique('welcome')}, timeout=60)
+    return r.status_code == 200, None
+
+
+def run_audio_stream(client):
+    started = time.perf_counter()
+    ttfb = None
+    with client.session().get(client.url('routes', '/api/audio/stream'), params={'text': unique('speak')},
+                              stream=True, timeout=60) as r:
+        for chunk in r.iter_content(chunk_size=8192):
+            if ttfb is None and chunk:
+                ttfb = time.perf_counter() - started
+        return r.status_code == 200, ttfb
+
+
+def run_content_job(client):
+    session = client.session()
+    r = session.post(client.url('routes', '/api/ai/generate-content'),
+                     json={'type': 'custom', 'prompt': unique('write a post')}, timeout=60)
+    if r.status_code == 429:
+        return 'rejected', None
+    if r.status_code != 202:
+        return False, None
+    job = session.get(client.url('routes', r.json()['status_url']), params={'wait': 30}, timeout=60).json()['job']
+    return job['status'] == 'succeeded', None
+
+
+def run_suggestions_batch(client):
+    messages = [{'id': str(i), 'message': unique('you look amazing')} for i in range(SUGGESTION_BATCH_SIZE)]
+    started = time.perf_counter()
+    ttfb, lines = None, 0
+    with client.session().post(client.url('routes', '/api/ai/chat-suggestions/batch'),
+                               json={'messages': messages}, stream=True, timeout=60) as r:
+        for line in r.iter_lines():
+            if line:
+                lines += 1
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+        return r.status_code == 200 and lines == SUGGESTION_BATCH_SIZE, ttfb
+
+
+ROUTES = {
+    'gpt_generate': run_gpt_generate,
+    'legacy_gpt': run_legacy_gpt,
+    'audio_generate': run_audio_generate,
+    'legacy_audio': run_legacy_audio,
+    'audio_stream': run_audio_stream,
+    'content_job': run_content_job,
+    'suggestions_batch': run_suggestions_batch,
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] if ordered else None
+
+
+def measure(client, func, concurrency, total):
+    """Fire `total` calls with `concurrency` workers; returns a result row"""
+    latencies, ttfbs, outcomes = [], [], {'ok': 0, 'error': 0, 'rejected': 0}
+    lock = threading.Lock()
+
+    def one(_):
+        started = time.perf_counter()
+        try:
+            ok, ttfb = func(client)
+        except Exception:
+            ok, ttfb = False, None
+        elapsed = time.perf_counter() - started
+        with lock:
+            outcome = 'rejected' if ok == 'rejected' else ('ok' if ok else 'error')
+            outcomes[outcome] += 1
+            if outcome == 'ok':
+                latencies.append(elapsed * 1000)
+                if ttfb is not None:
+                    ttfbs.append(ttfb * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        **outcomes,
+        'throughput_rps': round(outcomes['ok'] / wall, 2),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'ttfb_p50_ms': percentile(ttfbs, 50)
+    }
+
+
+def fmt(value):
+    return '-' if value is None else f'{value:.0f}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--requests', type=int, default=64, help='requests per route and concurrency level')
+    parser.add_argument('--routes', default=','.join(ROUTES))
+    parser.add_argument('--chat', default=json.dumps(DEFAULT_CHAT), help='stub chat profiles (JSON)')
+    parser.add_argument('--tts', default=json.dumps(DEFAULT_TTS), help='stub TTS profile (JSON)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    stub = start_stub_server(json.loads(args.chat), json.loads(args.tts))
+    data_dir = tempfile.mkdtemp(prefix='squirtvana-bench-')
+    servers = build_servers(stub, data_dir)
+    client = Client({name: f'http://127.0.0.1:{server.server_port}' for name, server in servers.items()})
+
+    results = {}
+    if not args.json:
+        print(f"{'route':<18} {'conc':>4} {'ok':>5} {'err':>4} {'429':>4} {'rps':>7} "
+              f"{'p50':>6} {'p95':>6} {'p99':>6} {'ttfb':>6}  (ms)")
+    for name in args.routes.split(','):
+        for concurrency in (int(c) for c in args.concurrency.split(',')):
+            row = measure(client, ROUTES[name], concurrency, args.requests)
+            results.setdefault(name, []).append(row)
+            if not args.json:
+                print(f"{name:<18} {concurrency:>4} {row['ok']:>5} {row['error']:>4} {row['rejected']:>4} "
+                      f"{row['throughput_rps']:>7.1f} {fmt(row['p50_ms']):>6} {fmt(row['p95_ms']):>6} "
+                      f"{fmt(row['p99_ms']):>6} {fmt(row['ttfb_p50_ms']):>6}")
+
+    if args.json:
+        print(json.dumps({'results': results, 'upstream_requests': stub.requests}, indent=2))
+    else:
+        print(f"\nupstream requests: {stub.requests}")
+
+    for server in servers.values():
+        server.shutdown()
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
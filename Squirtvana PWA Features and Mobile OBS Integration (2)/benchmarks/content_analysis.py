@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the content analysis engine
+Scores synthetic German/English drafts in batches of increasing size and reports drafts/s.
+
+Usage: python benchmarks/content_analysis.py [--drafts 5000] [--platform instagram]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+ROUTES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(ROUTES_DIR))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.routes.content_analysis import analyze_batch, PLATFORM_RULES
+
+PHRASES = [
+    'Heute Abend bin ich live', 'Danke für eure Liebe', 'komm vorbei und sag hallo',
+    'tonight is going to be amazing', 'link in bio', 'so excited for this show',
+    'nicht langweilig, versprochen', 'not bad at all', 'tip to unlock the special menu',
+    'leider etwas müde heute', 'private show ab 22 Uhr', 'thank you all, love you'
+]
+HASHTAGS = ['#live', '#cam', '#fun', '#exklusiv', '#tonight', '#vip', '#show']
+EMOJIS = ['🔥', '💋', '😘', '✨', '❤️', '🎉']
+
+
+def make_drafts(count, seed=7):
+    rng = random.Random(seed)
+    drafts = []
+    for _ in range(count):
+        words = rng.sample(PHRASES, rng.randint(1, 4))
+        words += rng.sample(EMOJIS, rng.randint(0, 3))
+        words += rng.sample(HASHTAGS, rng.randint(0, 5))
+        drafts.append(' '.join(words))
+    return drafts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--drafts', type=int, default=5000, help='drafts per batch size')
+    parser.add_argument('--platform', default='instagram', choices=sorted(PLATFORM_RULES))
+    args = parser.parse_args()
+
+    drafts = make_drafts(args.drafts)
+    analyze_batch(drafts[:10], args.platform)  # warm regex and NumPy code paths
+
+    print(f"{args.drafts} drafts, platform {args.platform}")
+    print(f"{'batch':>6} {'drafts/s':>10} {'ms/batch':>9}")
+    for batch_size in (1, 10, 100, 1000):
+        started = time.perf_counter()
+        batches = 0
+        for start in range(0, len(drafts), batch_size):
+            analyze_batch(drafts[start:start + batch_size], args.platform)
+            batches += 1
+        elapsed = time.perf_counter() - started
+        print(f"{batch_size:>6} {len(drafts) / elapsed:>10.0f} {elapsed * 1000 / batches:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the Squirtvana route modules
+Measures cold imports in fresh interpreters, i.e. what a restart during a show costs.
+
+Usage: python benchmarks/import_time.py [--runs 5] [--budget-ms 300]
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+# benchmarks/ lives next to the route modules (src/routes); imports are rooted above src/
+ROUTES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(ROUTES_DIR))
+
+MODULES = [
+    'src.routes.providers',
+    'src.routes.audio',
+    'src.routes.gpt',
+    'src.routes.system',
+    'src.routes.ai_services'
+]
+
+PROBE = (
+    "import sys, time; sys.path.insert(0, {root!r}); "
+    "t = time.perf_counter(); import {module}; "
+    "print((time.perf_counter() - t) * 1000)"
+)
+
+
+def time_import(module, runs):
+    """Median cold import time in milliseconds over fresh interpreters"""
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE.format(root=PROJECT_ROOT, module=module)],
+            capture_output=True, text=True, timeout=60
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr.strip()}")
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='exit non-zero if any module exceeds this median import time')
+    args = parser.parse_args()
+
+    print(f"{'module':<28} {'median ms':>10} {'max ms':>10}")
+    over_budget = []
+    for module in MODULES:
+        median, worst = time_import(module, args.runs)
+        print(f"{module:<28} {median:>10.1f} {worst:>10.1f}")
+        if args.budget_ms is not None and median > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"Over budget ({args.budget_ms} ms): {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
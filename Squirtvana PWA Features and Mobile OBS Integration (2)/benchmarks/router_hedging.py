@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Model router scenarios against the local OpenRouter stub
+Runs call_openai_api with a slow primary (hedging), a failing primary (failover and
+circuit breaker) and a healthy primary, and prints latency and router counters.
+
+Usage: python benchmarks/router_hedging.py [--calls 30]
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+ROUTES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(ROUTES_DIR))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import start_stub_server
+
+PRIMARY = 'stub/primary'
+BACKUPS = ['stub/backup-a', 'stub/backup-b']
+
+SCENARIOS = {
+    'healthy': {PRIMARY: {'latency': 0.05}},
+    'slow_primary': {PRIMARY: {'latency': 1.5}},
+    'failing_primary': {PRIMARY: {'latency': 0.02, 'error_rate': 1.0}},
+}
+
+
+def run_scenario(name, profiles, calls):
+    server = start_stub_server(dict(profiles, **{m: {'latency': 0.08} for m in BACKUPS}))
+    os.environ['OPENROUTER_BASE_URL'] = server.base_url
+    os.environ.setdefault('OPENROUTER_KEY', 'stub')
+
+    from src.routes import ai_services
+    from src.routes.model_router import ModelRouter
+    # Fresh router per scenario with a short hedge delay so the run stays quick
+    ai_services.router = ModelRouter({'backup_models': BACKUPS, 'hedge_default_delay': 0.3,
+                                      'open_seconds': 60})
+
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        ai_services.call_openai_api('system', 'user', model=PRIMARY, max_tokens=20)
+        latencies.append((time.perf_counter() - started) * 1000)
+    server.shutdown()
+
+    stats = ai_services.router.stats()
+    print(f"\n{name}: p50 {statistics.median(latencies):.0f} ms, "
+          f"max {max(latencies):.0f} ms, counters {stats['counters']}")
+    print(f"  upstream requests {server.requests}")
+    for model, model_stats in stats['models'].items():
+        print(f"  {model:<16} circuit={model_stats['circuit']:<9} error_rate={model_stats['error_rate']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=30)
+    args = parser.parse_args()
+
+    for name, profiles in SCENARIOS.items():
+        run_scenario(name, profiles, args.calls)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Local provider stubs for Squirtvana benchmarks
+One threaded HTTP server that emulates the OpenRouter chat completions API (plain and
+SSE streaming) and ElevenLabs text-to-speech (plain and chunked streaming), with
+configurable latency distributions, error rates and payload sizes.
+
+Usage: python benchmarks/stub_servers.py [--port 8765] [--chat '{"slow/model": {"latency": 3}}']
+                                         [--tts '{"latency": {"dist": "lognormal", "median": 0.3}}']
+Then point the app at it:
+    OPENROUTER_BASE_URL=http://127.0.0.1:8765/v1 ELEVENLABS_BASE_URL=http://127.0.0.1:8765/v1
+
+Latency specs are seconds before the first byte, either a number or one of
+    {"dist": "fixed", "value": s}        {"dist": "uniform", "low": s, "high": s}
+    {"dist": "normal", "mean": s, "stddev": s}
+    {"dist": "lognormal", "median": s, "sigma": 0.5}
+    {"dist": "exponential", "mean": s}
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CHAT_PROFILE = {
+    'latency': 0.05,          # time to first byte
+    'error_rate': 0.0,        # share of requests answered with error_status
+    'error_status': 500,
+    'completion_chars': 400,  # size of the generated text
+    'stream_chunks': 20,      # SSE deltas per streamed completion
+    'chunk_interval': 0.01,   # seconds between streamed deltas
+}
+
+DEFAULT_TTS_PROFILE = {
+    'latency': 0.1,
+    'error_rate': 0.0,
+    'error_status': 500,
+    'audio_bytes': 48000,     # ~3 s of 128 kbit/s MP3
+    'chunk_size': 4096,       # bytes per streamed chunk
+    'chunk_interval': 0.01,
+}
+
+STUB_WORDS = ('hey', 'darling', 'tonight', 'show', 'tip', 'stream', 'smile', 'closer', 'yes', 'more')
+
+
+def sample_latency(spec):
+    """Draw one latency (seconds) from a number or a distribution spec"""
+    if isinstance(spec, (int, float)):
+        return float(spec)
+    dist = spec.get('dist', 'fixed')
+    if dist == 'fixed':
+        value = spec['value']
+    elif dist == 'uniform':
+        value = random.uniform(spec['low'], spec['high'])
+    elif dist == 'normal':
+        value = random.gauss(spec['mean'], spec['stddev'])
+    elif dist == 'lognormal':
+        value = spec['median'] * math.exp(random.gauss(0, spec.get('sigma', 0.5)))
+    elif dist == 'exponential':
+        value = random.expovariate(1 / spec['mean'])
+    else:
+        raise ValueError(f"Unknown latency distribution '{dist}'")
+    return max(0.0, value)
+
+
+def stub_text(chars):
+    """Deterministic-looking filler text of roughly the requested length, with line breaks"""
+    words, size = [], 0
+    while size < chars:
+        word = random.choice(STUB_WORDS)
+        words.append(word)
+        size += len(word) + 1
+        if len(words) % 12 == 0:
+            words.append('\n')
+    return ' '.join(words).replace(' \n ', '\n').strip()
+
+
+def stub_suggestion_lines(request):
+    """JSON lines for a chat_suggestions_batch prompt, one {"id", "suggestions"} per message.
+
+    That prompt asks for JSON lines in the system message and lists the
+    viewer messages as a JSON array after the first line of the user
+    message. Returns None for every other prompt.
+    """
+    messages = request.get('messages', [])
+    system = ' '.join(m.get('content', '') for m in messages if m.get('role') == 'system')
+    user = ' '.join(m.get('content', '') for m in messages if m.get('role') == 'user')
+    if 'JSON-Lines' not in system or '\n' not in user:
+        return None
+    try:
+        items = json.loads(user.split('\n', 1)[1])
+    except ValueError:
+        return None
+    return ''.join(
+        json.dumps({'id': item.get('id'),
+                    'suggestions': [' '.join(random.choices(STUB_WORDS, k=6)) for _ in range(5)]}) + '\n'
+        for item in items if isinstance(item, dict)
+    )
+
+
+def stub_audio(size):
+    """MP3-looking payload: an ID3 header followed by filler frames"""
+    header = b'ID3\x04\x00\x00\x00\x00\x00\x00'
+    frame = b'\xff\xfb\x90\x64' + bytes(413)
+    body = frame * (max(0, size - len(header)) // len(frame) + 1)
+    return (header + body)[:size]
+
+
+class ProviderStub(BaseHTTPRequestHandler):
+    """Routes /v1/models, /v1/chat/completions, /v1/voices/<id> and /v1/text-to-speech/<id>[/stream]"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f'{len(data):X}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+    def _fail(self, profile, what):
+        """Sleep the sampled latency, then maybe answer with an error; True if failed"""
+        time.sleep(sample_latency(profile['latency']))
+        if random.random() < profile['error_rate']:
+            self._send_json(profile['error_status'], {'error': {'message': f'stub failure for {what}'}})
+            return True
+        return False
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts == ['v1', 'models']:
+            self._send_json(200, {'data': [{'id': model} for model in self.server.chat_profiles]})
+        elif parts[:2] == ['v1', 'voices'] and len(parts) == 3:
+            self._send_json(200, {'voice_id': parts[2], 'name': 'Stub Voice'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+        parts = self.path.split('?')[0].strip('/').split('/')
+        try:
+            if parts == ['v1', 'chat', 'completions']:
+                self._chat_completion(request)
+            elif parts[:2] == ['v1', 'text-to-speech'] and len(parts) in (3, 4):
+                self._text_to_speech(request, stream=parts[-1] == 'stream')
+            else:
+                self._send_json(404, {'error': 'not found'})
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-stream (cancelled prefetch, hedge loser, ...)
+            self.close_connection = True
+
+    def _chat_completion(self, request):
+        model = request.get('model', 'stub/model')
+        profile = self.server.chat_profile(model)
+        self.server.count(f'chat:{model}')
+        if self._fail(profile, model):
+            return
+
+        prompt = ' '.join(m.get('content', '') for m in request.get('messages', []))
+        content = stub_suggestion_lines(request) or stub_text(profile['completion_chars'])
+        usage = {
+            'prompt_tokens': max(1, len(prompt) // 4),
+            'completion_tokens': max(1, len(content) // 4)
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        completion_id = f'stub-{time.time_ns()}'
+
+        if not request.get('stream'):
+            self._send_json(200, {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop'
+                }],
+                'usage': usage
+            })
+            return
+
+        self._start_chunked('text/event-stream')
+        step = max(1, math.ceil(len(content) / profile['stream_chunks']))
+        for start in range(0, len(content), step):
+            chunk = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': content[start:start + step]}, 'finish_reason': None}]
+            }
+            self._write_chunk(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+            time.sleep(profile['chunk_interval'])
+        # Like OpenRouter, usage arrives on a final chunk with no content
+        final = {'id': completion_id, 'object': 'chat.completion.chunk', 'model': model,
+                 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}], 'usage': usage}
+        self._write_chunk(f'data: {json.dumps(final)}\n\ndata: [DONE]\n\n'.encode('utf-8'))
+        self._end_chunked()
+
+    def _text_to_speech(self, request, stream):
+        profile = self.server.tts_profile
+        self.server.count('tts:stream' if stream else 'tts')
+        if self._fail(profile, 'text-to-speech'):
+            return
+
+        audio = stub_audio(profile['audio_bytes'])
+        if not stream:
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/mpeg')
+            self.send_header('Content-Length', str(len(audio)))
+            self.end_headers()
+            self.wfile.write(audio)
+            return
+
+        self._start_chunked('audio/mpeg')
+        for start in range(0, len(audio), profile['chunk_size']):
+            self._write_chunk(audio[start:start + profile['chunk_size']])
+            time.sleep(profile['chunk_interval'])
+        self._end_chunked()
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded stub server; profiles can be changed while it runs"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, chat_profiles=None, tts_profile=None):
+        super().__init__(address, ProviderStub)
+        self.chat_profiles = dict(chat_profiles or {})
+        self.tts_profile = dict(DEFAULT_TTS_PROFILE, **(tts_profile or {}))
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up on keep-alive connections are normal under load
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def chat_profile(self, model):
+        # '*' applies to every model without its own entry
+        return dict(DEFAULT_CHAT_PROFILE, **self.chat_profiles.get(model, self.chat_profiles.get('*', {})))
+
+    def count(self, key):
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    @property
+    def base_url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}/v1'
+
+
+def start_stub_server(chat_profiles=None, tts_profile=None, host='127.0.0.1', port=0):
+    """Run a StubServer on a background thread; port 0 picks a free port"""
+    server = StubServer((host, port), chat_profiles, tts_profile)
+    threading.Thread(target=server.serve_forever, name='stub-server', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--chat', default='{}',
+                        help='JSON {model or "*": profile}, see DEFAULT_CHAT_PROFILE')
+    parser.add_argument('--tts', default='{}', help='JSON profile, see DEFAULT_TTS_PROFILE')
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), json.loads(args.chat), json.loads(args.tts))
+    print(f"Provider stubs on {server.base_url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+"""
+Cohort Engine for Squirtvana Pro Enhanced
+Viewer cohorts by first-seen week, day-N return rates and session retention curves over roaring bitmaps
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src.routes.event_store import event_store, EVENT_CODES, DAY_SECONDS
+from src.routes.roaring import RoaringBitmap
+
+DEFAULT_DB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
+DB_FILENAME = 'cohorts.db'
+
+# Cohort Configuration
+COHORT_CONFIG = {
+    'return_days': (1, 7, 14, 30),
+    'curve_minutes': (1, 5, 10, 15, 30, 60, 120),
+    'max_session_minutes': 480,   # longer sessions are counted in the last bin
+    'open_session_hours': 12,     # joins without a leave are forgotten after this
+    'cached_bitmaps': 128,
+    'report_weeks': 8
+}
+
+ACTIVE, FIRST_SEEN = 0, 1
+SQL_CHUNK = 900  # stays under SQLite's bound-parameter limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS viewers (
+    hash INTEGER PRIMARY KEY,
+    id INTEGER NOT NULL UNIQUE,
+    first_day INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS viewer_days (
+    kind INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    bitmap BLOB NOT NULL,
+    PRIMARY KEY (kind, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS session_minutes (
+    week INTEGER PRIMARY KEY,
+    counts BLOB NOT NULL
+);
+"""
+
+
+def week_of(day):
+    """Monday-based week number of an epoch day (epoch day 0 was a Thursday)"""
+    return (day + 3) // 7
+
+
+def week_start(week):
+    return week * 7 - 3
+
+
+def _day_iso(day):
+    return datetime.fromtimestamp(day * DAY_SECONDS, timezone.utc).strftime('%Y-%m-%d')
+
+
+class CohortEngine:
+    """Viewer cohorts kept as roaring bitmaps of dense viewer ids.
+
+    Every viewer hash gets a dense 32-bit id on first sight, so a cohort is
+    a compact id range. Two bitmaps are kept per UTC day: viewers active
+    that day and viewers first seen that day (their cohort). Day-N return
+    for a cohort week is the intersection of each day's first-seen bitmap
+    with the active bitmap N days later. Session lengths (from the leave
+    event's duration, or leave minus join) go into per-minute histograms
+    per cohort week for retention curves.
+    """
+
+    def __init__(self, db_path, store=None, config=None):
+        self.db_path = db_path
+        self.store = store
+        self.config = dict(COHORT_CONFIG, **(config or {}))
+        self._lock = threading.Lock()
+        self._conn = None
+        self._next_id = 0
+        self._bitmaps = OrderedDict()
+        self._histograms = {}
+        self._open_sessions = {}
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._next_id = conn.execute('SELECT COALESCE(MAX(id) + 1, 0) FROM viewers').fetchone()[0]
+            if self.store is not None and self._next_id == 0:
+                for day in self.store.days():
+                    self._add(self.store.read_day(day))
+        return self._conn
+
+    def add(self, columns):
+        """Fold the identified viewers of one event batch into the cohorts"""
+        if not columns['viewer'].any():
+            return
+        with self._lock:
+            self._connection()
+            self._add(columns)
+
+    def _add(self, columns):
+        known = columns['viewer'] != 0
+        if not known.any():
+            return
+        hashes = columns['viewer'][known].view(np.int64)
+        ts = columns['ts'][known]
+        days = (ts // DAY_SECONDS).astype(np.int64)
+
+        unique, inverse = np.unique(hashes, return_inverse=True)
+        inverse = inverse.ravel()
+        batch_first = np.full(len(unique), np.iinfo(np.int64).max)
+        np.minimum.at(batch_first, inverse, days)
+        ids, first_days, dirty = self._resolve(unique, batch_first)
+
+        event_ids = ids[inverse]
+        pairs = np.unique(np.stack([days, event_ids], axis=1), axis=0)
+        for day in np.unique(pairs[:, 0]).tolist():
+            dirty[(ACTIVE, day)] = self._bitmap(ACTIVE, day).add_many(pairs[pairs[:, 0] == day, 1])
+
+        weeks = self._record_sessions(columns, known, hashes, ts, week_of(first_days[inverse]))
+        self._write(dirty, weeks)
+
+    def _resolve(self, hashes, batch_first):
+        """Dense ids and first-seen days for hashes; registers new viewers and earlier sightings"""
+        ids = np.empty(len(hashes), dtype=np.int64)
+        first_days = np.empty(len(hashes), dtype=np.int64)
+        known = {}
+        hash_list = hashes.tolist()
+        for start in range(0, len(hash_list), SQL_CHUNK):
+            chunk = hash_list[start:start + SQL_CHUNK]
+            known.update((h, (i, d)) for h, i, d in self._conn.execute(
+                f"SELECT hash, id, first_day FROM viewers WHERE hash IN ({', '.join('?' * len(chunk))})", chunk
+            ))
+
+        added, removed, inserts, moves = {}, {}, [], []
+        # New viewers get ids in first-seen order so cohorts stay contiguous
+        for position in np.argsort(batch_first, kind='stable').tolist():
+            h, day = hash_list[position], int(batch_first[position])
+            if h in known:
+                viewer_id, first_day = known[h]
+                if day < first_day:
+                    # An older event arrived late: the viewer belongs to an earlier cohort
+                    removed.setdefault(first_day, []).append(viewer_id)
+                    moves.append((day, h))
+                    first_day = day
+                else:
+                    ids[position], first_days[position] = viewer_id, first_day
+                    continue
+            else:
+                viewer_id, first_day = self._next_id, day
+                self._next_id += 1
+                inserts.append((h, viewer_id, day))
+            added.setdefault(first_day, []).append(viewer_id)
+            ids[position], first_days[position] = viewer_id, first_day
+
+        dirty = {}
+        for day, viewer_ids in removed.items():
+            dirty[(FIRST_SEEN, day)] = self._bitmap(FIRST_SEEN, day).discard_many(viewer_ids)
+        for day, viewer_ids in added.items():
+            dirty[(FIRST_SEEN, day)] = self._bitmap(FIRST_SEEN, day).add_many(viewer_ids)
+
+        with self._conn:
+            self._conn.executemany('INSERT INTO viewers (hash, id, first_day) VALUES (?, ?, ?)', inserts)
+            self._conn.executemany('UPDATE viewers SET first_day = ? WHERE hash = ?', moves)
+        return ids, first_days, dirty
+
+    def _record_sessions(self, columns, known, hashes, ts, weeks):
+        types = columns['type'][known]
+        durations = columns['duration'][known].astype(np.float64)
+        join, leave = EVENT_CODES['viewer_join'], EVENT_CODES['viewer_leave']
+        minutes, session_weeks = [], []
+        moves = np.flatnonzero((types == join) | (types == leave))
+        for i in moves[np.argsort(ts[moves], kind='stable')].tolist():
+            h = int(hashes[i])
+            if types[i] == join:
+                self._open_sessions[h] = ts[i]
+                continue
+            opened = self._open_sessions.pop(h, None)
+            if durations[i] > 0:
+                duration = durations[i]
+            elif opened is not None and ts[i] - opened <= self.config['open_session_hours'] * 3600:
+                duration = ts[i] - opened
+            else:
+                duration = 0
+            if duration > 0:
+                minutes.append(min(int(duration // 60), self.config['max_session_minutes']))
+                session_weeks.append(int(weeks[i]))
+
+        cutoff = time.time() - self.config['open_session_hours'] * 3600
+        if len(self._open_sessions) > 10000:
+            self._open_sessions = {h: t for h, t in self._open_sessions.items() if t >= cutoff}
+
+        minutes, session_weeks = np.array(minutes, dtype=np.int64), np.array(session_weeks, dtype=np.int64)
+        changed = set(session_weeks.tolist())
+        for week in changed:
+            np.add.at(self._histogram(week), minutes[session_weeks == week], 1)
+        return changed
+
+    def _bitmap(self, kind, day):
+        key = (kind, day)
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            row = self._connection().execute(
+                'SELECT bitmap FROM viewer_days WHERE kind = ? AND day = ?', key
+            ).fetchone()
+            bitmap = RoaringBitmap.from_bytes(row[0]) if row else RoaringBitmap()
+            self._bitmaps[key] = bitmap
+        else:
+            self._bitmaps.move_to_end(key)
+        return bitmap
+
+    def _evict(self):
+        # Only between operations, so a bitmap is never dropped while it has unwritten changes
+        while len(self._bitmaps) > self.config['cached_bitmaps']:
+            self._bitmaps.popitem(last=False)
+
+    def _histogram(self, week):
+        histogram = self._histograms.get(week)
+        if histogram is None:
+            row = self._connection().execute('SELECT counts FROM session_minutes WHERE week = ?', (week,)).fetchone()
+            if row:
+                histogram = np.frombuffer(row[0], dtype=np.int64).copy()
+            else:
+                histogram = np.zeros(self.config['max_session_minutes'] + 1, dtype=np.int64)
+            self._histograms[week] = histogram
+        return histogram
+
+    def _write(self, dirty, weeks):
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO viewer_days (kind, day, bitmap) VALUES (?, ?, ?)',
+                [(kind, day, bitmap.to_bytes()) for (kind, day), bitmap in dirty.items()]
+            )
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO session_minutes (week, counts) VALUES (?, ?)',
+                [(week, self._histograms[week].tobytes()) for week in weeks]
+            )
+        self._evict()
+
+    def viewers(self, kind, first_day, end_day):
+        """Union bitmap of a kind over epoch days [first_day, end_day)"""
+        result = RoaringBitmap()
+        with self._lock:
+            for day in range(first_day, end_day):
+                result.union_update(self._bitmap(kind, day))
+            self._evict()
+        return result
+
+    def return_rate(self, previous, current):
+        """Percentage of the viewers active in the previous day range who were active in the current one"""
+        before = self.viewers(ACTIVE, *previous)
+        if not len(before):
+            return 0.0
+        return round(before.intersection_len(self.viewers(ACTIVE, *current)) * 100.0 / len(before), 1)
+
+    def session_curve(self, weeks):
+        """Percentage of sessions still watching at each curve minute, over the given cohort weeks"""
+        total = np.zeros(self.config['max_session_minutes'] + 1, dtype=np.int64)
+        with self._lock:
+            for week in weeks:
+                total += self._histogram(week)
+        sessions = int(total.sum())
+        # Sessions lasting at least N minutes = those in bins N and above
+        surviving = total[::-1].cumsum()[::-1]
+        return {
+            'sessions': sessions,
+            'still_watching': {
+                f"minute_{n}": round(float(surviving[n]) * 100.0 / sessions, 1) if sessions else None
+                for n in self.config['curve_minutes'] if n < len(surviving)
+            }
+        }
+
+    def report(self, weeks=None, today=None):
+        """Per cohort week (newest first): size, day-N return rates and session retention curve.
+
+        A return rate only counts cohort days that are at least N days old,
+        so young cohorts are not penalised for days that have not happened.
+        """
+        weeks = weeks or self.config['report_weeks']
+        today = today if today is not None else int(time.time() // DAY_SECONDS)
+        current_week = week_of(today)
+        cohorts = []
+        for week in range(current_week, current_week - weeks, -1):
+            first = week_start(week)
+            with self._lock:
+                members = [(day, self._bitmap(FIRST_SEEN, day)) for day in range(first, min(first + 7, today + 1))]
+                size = sum(len(bitmap) for _, bitmap in members)
+                returns = {}
+                for n in self.config['return_days']:
+                    eligible = [(day, bitmap) for day, bitmap in members if day + n <= today and len(bitmap)]
+                    base = sum(len(bitmap) for _, bitmap in eligible)
+                    returned = sum(bitmap.intersection_len(self._bitmap(ACTIVE, day + n)) for day, bitmap in eligible)
+                    returns[f"day_{n}"] = round(returned * 100.0 / base, 1) if base else None
+                self._evict()
+            cohorts.append({
+                'week_start': _day_iso(first),
+                'size': size,
+                'return_rates': returns,
+                'session_retention': self.session_curve([week])
+            })
+        return cohorts
+
+
+cohort_engine = CohortEngine(os.path.join(DEFAULT_DB_DIR, DB_FILENAME), store=event_store)
+event_store.add_listener(cohort_engine.add)
@@ -3,15 +3,21 @@ Compliance Module for Squirtvana Pro Enhanced
 GDPR compliance, data protection, and content safety management
 """
 
+import os
 import json
 import logging
 import hashlib
 from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file, url_for
+from werkzeug.security import safe_join
 
 logger = logging.getLogger(__name__)
 compliance_bp = Blueprint('compliance', __name__)
 
+from src.routes.ai_jobs import job_queue, QueueFullError
+from src.routes.audit_log import get_audit_trail
+from src.routes.media_scrubber import SCRUB_CONFIG, FORMAT_EXTENSIONS, ScrubError, save_stream, scrub_file
+
 # Compliance Configuration
 COMPLIANCE_CONFIG = {
     'gdpr_enabled': True,
@@ -141,6 +147,10 @@ def export_user_data():
         
         # Generate data export
         export_result = generate_data_export(user_id, data_types)
+        get_audit_trail().record(
+            'data_export', f"Generated GDPR data export for user {user_id}",
+            ip_address=request.remote_addr, metadata={'export_id': export_result['export_id'], 'data_types': data_types}
+        )
         
         return jsonify({
             'success': True,
@@ -169,6 +179,10 @@ def delete_user_data():
         
         # Perform data deletion
         deletion_result = perform_data_deletion(user_id, data_types)
+        get_audit_trail().record(
+            'data_deletion', f"Deleted GDPR data for user {user_id}",
+            ip_address=request.remote_addr, metadata={'deletion_id': deletion_result['deletion_id'], 'data_types': data_types}
+        )
         
         return jsonify({
             'success': True,
@@ -256,6 +270,7 @@ def check_identity_separation_status():
     """Check identity separation status"""
     try:
         separation_status = {
+            'media_metadata': get_media_scrub_summary(),
             'personal_data_isolated': True,
             'professional_data_isolated': True,
             'cross_contamination_risk': 'low',
@@ -277,6 +292,85 @@ def check_identity_separation_status():
         logger.error(f"Identity separation check error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@compliance_bp.route('/media/scrub', methods=['POST'])
+def scrub_media():
+    """Queue GPS/device metadata removal for an uploaded JPEG, PNG or MP4/MOV.
+
+    Send the file as multipart field 'file', or as the raw request body
+    (?filename=...) for large recordings so it is streamed straight to disk.
+    """
+    try:
+        if request.content_length and request.content_length > SCRUB_CONFIG['max_upload_bytes']:
+            return jsonify({'success': False, 'error': 'Upload too large'}), 413
+        
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('file')
+            if upload is None:
+                return jsonify({'success': False, 'error': 'No file provided'}), 400
+            stream, filename = upload.stream, upload.filename
+        else:
+            stream, filename = request.stream, request.args.get('filename', '')
+        
+        try:
+            upload_path, source_digest, size = save_stream(stream)
+        except ScrubError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        try:
+            job = job_queue.submit('media', 'metadata_scrub', run_media_scrub,
+                                   upload_path, source_digest, filename, request.remote_addr,
+                                   on_cancel=lambda: os.remove(upload_path))
+        except QueueFullError as e:
+            os.remove(upload_path)
+            return jsonify({'success': False, 'error': str(e)}), 429, {'Retry-After': '5'}
+        
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'bytes': size,
+            'status_url': url_for('compliance.get_scrub_job', job_id=job.id),
+            'timestamp': datetime.utcnow().isoformat()
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Media scrub error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@compliance_bp.route('/media/scrub/<job_id>', methods=['GET'])
+def get_scrub_job(job_id):
+    """Status of a metadata scrub job; ?wait=N long-polls"""
+    try:
+        try:
+            wait = min(float(request.args.get('wait', 0)), 30)
+        except ValueError:
+            return jsonify({'success': False, 'error': "'wait' must be a number of seconds"}), 400
+        job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+        if job is None or job.kind != 'metadata_scrub':
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        
+        data = job.to_dict()
+        if job.status == 'succeeded':
+            data['download_url'] = url_for('compliance.get_scrubbed_media', filename=job.result['filename'])
+        return jsonify({'success': True, 'job': data})
+        
+    except Exception as e:
+        logger.error(f"Media scrub status error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@compliance_bp.route('/media/scrubbed/<filename>', methods=['GET'])
+def get_scrubbed_media(filename):
+    """Download a scrubbed file (supports Range requests)"""
+    try:
+        media_path = safe_join(SCRUB_CONFIG['media_dir'], filename)
+        if not media_path or not os.path.isfile(media_path):
+            return jsonify({'success': False, 'error': 'File not found'}), 404
+        return send_file(media_path, conditional=True, as_attachment=True, download_name=filename)
+        
+    except Exception as e:
+        logger.error(f"Scrubbed media download error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @compliance_bp.route('/age-verification', methods=['POST'])
 def verify_age():
     """Verify age compliance"""
@@ -460,35 +554,44 @@ def get_backup_list(backup_type):
 
 def get_audit_entries(start_date, end_date, action_type):
     """Get audit log entries"""
-    return [
-        {
-            'id': 1,
-            'timestamp': '2024-07-08 14:30:00',
-            'action': 'content_upload',
-            'user': 'model_user',
-            'details': 'Uploaded new photo set to OnlyFans',
-            'ip_address': '192.168.1.100',
-            'compliance_check': 'passed'
-        },
-        {
-            'id': 2,
-            'timestamp': '2024-07-08 16:45:00',
-            'action': 'data_export',
-            'user': 'admin_user',
-            'details': 'Generated GDPR data export for user',
-            'ip_address': '192.168.1.101',
-            'compliance_check': 'passed'
-        },
-        {
-            'id': 3,
-            'timestamp': '2024-07-09 09:15:00',
-            'action': 'backup_created',
-            'user': 'system',
-            'details': 'Daily backup completed successfully',
-            'ip_address': 'localhost',
-            'compliance_check': 'passed'
-        }
-    ]
+    return get_audit_trail().entries(start_date, end_date, action_type)
+
+def run_media_scrub(upload_path, source_digest, original_name, ip_address):
+    """Job body for /media/scrub; owns the upload and records the outcome in the audit log"""
+    audit = get_audit_trail()
+    label = original_name or 'upload'
+    try:
+        summary = scrub_file(upload_path)
+    except Exception as e:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+        audit.record('media_scrub', f"Metadata scrub failed for {label}: {e}", ip_address=ip_address,
+                     compliance_check='failed', metadata={'source_sha256': source_digest, 'name': original_name})
+        raise
+    
+    filename = f"scrubbed_{source_digest[:32]}.{FORMAT_EXTENSIONS[summary['format']]}"
+    os.makedirs(SCRUB_CONFIG['media_dir'], exist_ok=True)
+    os.replace(upload_path, os.path.join(SCRUB_CONFIG['media_dir'], filename))
+    
+    details = f"Removed {len(summary['removed'])} metadata segment(s) from {label}"
+    if summary['found']:
+        details += f" (contained {', '.join(summary['found'])} data)"
+    result = dict(summary, filename=filename, source_sha256=source_digest, name=original_name)
+    audit.record('media_scrub', details, ip_address=ip_address, metadata=result)
+    return result
+
+def get_media_scrub_summary():
+    """Counts over every media_scrub audit entry in the retention window"""
+    audit = get_audit_trail()
+    scrubbed = audit.count('media_scrub', 'passed')
+    last = audit.entries(action_type='media_scrub', compliance_check='passed', limit=1)
+    return {
+        'files_scrubbed': scrubbed,
+        'files_failed': audit.count('media_scrub') - scrubbed,
+        'gps_removed': audit.count('media_scrub', 'passed', listed=('found', 'gps')),
+        'device_info_removed': audit.count('media_scrub', 'passed', listed=('found', 'device')),
+        'last_scrub': last[0]['timestamp'] if last else None
+    }
 
 def perform_age_verification(platform, method):
     """Perform age verification"""
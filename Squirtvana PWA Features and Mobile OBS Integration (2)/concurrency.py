@@ -0,0 +1,645 @@
+"""
+Viewer Concurrency for Squirtvana Pro Enhanced
+Live viewers per platform from join/leave events, with a weekday x hour heatmap of average and peak concurrency
+"""
+
+import io
+import os
+import time
+import heapq
+import atexit
+import logging
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from src.routes.event_store import event_store, EVENT_CODES, PLATFORMS, DAY_SECONDS, day_key
+from src.routes.dashboard_push import dashboard_channel
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
+DB_FILENAME = 'concurrency.db'
+
+# Concurrency Configuration
+CONCURRENCY_CONFIG = {
+    'open_session_hours': 12,     # joins without a leave stop counting after this (as in the cohort engine)
+    'hour_retention_days': 400,
+    'checkpoint_hours': 48,       # late events within this window replay from a checkpoint, older ones rebuild
+    'reorder_seconds': 10,        # events this far behind the newest one are merged in order, not replayed
+    'save_seconds': 60
+}
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+CELLS = 7 * 24
+ALL = len(PLATFORMS)  # extra column of every per-platform array: all platforms together
+JOIN, LEAVE = EVENT_CODES['viewer_join'], EVENT_CODES['viewer_leave']
+MOVE_COLUMNS = ('ts', 'type', 'platform', 'viewer')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS concurrency_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    state BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS concurrency_hours (
+    hour INTEGER NOT NULL,
+    platform INTEGER NOT NULL,
+    peak INTEGER NOT NULL,
+    viewer_seconds REAL NOT NULL,
+    PRIMARY KEY (hour, platform)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS concurrency_checkpoints (
+    hour INTEGER PRIMARY KEY,
+    state BLOB NOT NULL
+);
+"""
+
+
+def heatmap_cell(hours):
+    """Weekday (Monday = 0) x hour-of-day cell index of epoch hours"""
+    return ((hours // 24 + 3) % 7) * 24 + hours % 24
+
+
+def _level_steps(levels, platforms, deltas):
+    """Levels before the first change and after each one: (changes + 1, platforms + 1)"""
+    changes = np.zeros((len(deltas), ALL + 1), dtype=np.int64)
+    changes[np.arange(len(deltas)), np.asarray(platforms, dtype=np.int64)] = deltas
+    changes[:, ALL] = deltas
+    return np.vstack([levels, levels + np.cumsum(changes, axis=0)])
+
+
+class ConcurrencyTracker:
+    """Current viewers per platform, integrated over time into fixed arrays.
+
+    Every join/leave changes a per-platform level; the time each level was
+    held is added to viewer-seconds per weekday x hour cell (and the cell's
+    observed seconds), and the highest level seen per cell is kept, so the
+    heatmap is a (168, platforms + 1) array whatever the history length.
+    Per-epoch-hour peaks go to SQLite so any period's peak is one indexed
+    MAX() instead of a replay of its events.
+
+    The event store listener only queues batches; a worker thread applies
+    them. Events are held for reorder_seconds behind the newest one seen
+    (or until arrivals pause that long), so clients whose batches interleave
+    with a little jitter are merged in timestamp order, and live counts
+    trail by at most that window. Anything older than the clock after that
+    rewinds to the last hourly checkpoint before it and replays the event
+    store from there (or rebuilds everything when it predates the oldest
+    checkpoint), so results do not depend on how events were batched.
+    Hour rows and the state are written together every save_seconds, and
+    a restart replays the stored events newer than the saved state.
+    """
+
+    def __init__(self, db_path, store=None, channel=None, config=None):
+        self.db_path = db_path
+        self.store = store
+        self.channel = channel
+        self.config = dict(CONCURRENCY_CONFIG, **(config or {}))
+        self._lock = threading.Lock()           # tracker state
+        self._queue_lock = threading.Lock()     # batches queued by the listener
+        self._process_lock = threading.Lock()   # one process() at a time
+        self._conn = None
+        self._incoming = []
+        self._last_arrival = 0.0
+        self._staged = []                       # on-time events waiting out the reorder window
+        self._watermark = None                  # newest event ts seen
+        self._hour_rows = {}                    # (hour, platform) -> (peak, viewer seconds) not saved yet
+        self._rewrite_from = None               # saved hour rows from this hour on are replaced at the next save
+        self._saved_at = 0.0
+        self._pruned_hour = None
+        self._worker = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._stats = {'late_events': 0, 'replays': 0, 'rebuilds': 0}
+        self._reset()
+
+    def _reset(self):
+        self._sessions = {}                                       # (platform, viewer hash) -> join ts
+        self._anonymous = [deque() for _ in PLATFORMS]            # join ts of viewers without an id
+        self._expiry = []                                         # heap of (expires at, platform, viewer, join ts)
+        self._levels = np.zeros(ALL + 1, dtype=np.int64)
+        self._clock = None                                        # ts up to which time is integrated
+        self._first = None                                        # earliest event applied
+        self._viewer_seconds = np.zeros((CELLS, ALL + 1))
+        self._observed = np.zeros(CELLS)
+        self._peak = np.zeros((CELLS, ALL + 1), dtype=np.int64)
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            row = conn.execute('SELECT state FROM concurrency_state WHERE id = 1').fetchone()
+            if row is not None:
+                self._load(row[0])
+            if self.store is not None:
+                self._catch_up()
+        return self._conn
+
+    def _catch_up(self):
+        """Stage the stored events newer than the saved state (all of them on a new database)"""
+        start = self._clock
+        with self.store.ingestion_paused():
+            self.store.flush()
+            for day in self.store.days():
+                if start is not None and day < day_key(start):
+                    continue
+                columns = self.store.read_day(day)
+                if start is not None:
+                    columns = {name: values[columns['ts'] >= start] for name, values in columns.items()}
+                self._stage(columns)
+                self._release()
+            # Queued batches are in the store already; only their events older than the saved state are new
+            with self._queue_lock:
+                batches, self._incoming = self._incoming, []
+        late = [float(batch['ts'].min()) for batch in batches if start is not None and batch['ts'].min() < start]
+        if late:
+            self._stats['late_events'] += sum(int(np.count_nonzero(batch['ts'] < start)) for batch in batches)
+            self._replay(min(late))
+
+    def add(self, columns):
+        """Queue the joins and leaves of one event batch; never waits for the tracker"""
+        moves = (columns['type'] == JOIN) | (columns['type'] == LEAVE)
+        if not moves.any():
+            return
+        with self._queue_lock:
+            self._incoming.append({name: columns[name][moves] for name in MOVE_COLUMNS})
+            self._last_arrival = time.time()
+        self._ensure_worker()
+        self._wake.set()
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._queue_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._work_loop, name='concurrency-tracker', daemon=True)
+                    self._worker.start()
+                    atexit.register(self.close)
+
+    def _work_loop(self):
+        while not self._stop.is_set():
+            # Also wakes without new batches, to release events once arrivals pause
+            self._wake.wait(self.config['reorder_seconds'])
+            self._wake.clear()
+            try:
+                self.process()
+            except Exception as e:
+                logger.error(f"Concurrency tracker error: {e}")
+
+    def process(self, release_all=False):
+        """Apply the queued batches: late events replay, on-time ones wait out the reorder window"""
+        with self._process_lock:
+            with self._lock:
+                self._connection()
+            with self._queue_lock:
+                batches, self._incoming = self._incoming, []
+                idle = time.time() - self._last_arrival >= self.config['reorder_seconds']
+            if batches and self.store is not None:
+                # Once no append is in flight every drained batch is in the store, where a replay reads it
+                with self.store.ingestion_paused():
+                    pass
+            with self._lock:
+                before = self._levels.copy()
+                late = [since for since in map(self._stage, batches) if since is not None]
+                if late:
+                    self._replay(min(late))
+                self._release(release_all or idle)
+                if time.time() - self._saved_at >= self.config['save_seconds']:
+                    self._save()
+                levels = self._levels.copy()
+        if self.channel is not None and not np.array_equal(before, levels):
+            self.channel.publish('live_viewers', self._live(levels))
+
+    def _stage(self, columns):
+        """Hold a batch's joins/leaves until they leave the reorder window; returns its earliest late ts"""
+        moves = (columns['type'] == JOIN) | (columns['type'] == LEAVE)
+        if not moves.any():
+            return None
+        events = {name: columns[name][moves] for name in MOVE_COLUMNS}
+        newest = float(events['ts'].max())
+        self._watermark = newest if self._watermark is None else max(self._watermark, newest)
+        since = None
+        if self._clock is not None:
+            late = events['ts'] < self._clock
+            if late.any():
+                self._stats['late_events'] += int(np.count_nonzero(late))
+                if self.store is None:
+                    # Nothing to replay from: count them at the clock
+                    events['ts'] = np.maximum(events['ts'], self._clock)
+                else:
+                    # They are in the store, where the replay picks them up
+                    since = float(events['ts'][late].min())
+                    events = {name: values[~late] for name, values in events.items()}
+        self._staged.append(events)
+        return since
+
+    def _release(self, release_all=False):
+        """Apply the staged events older than the reorder window (or all of them) and move the clock there"""
+        if self._watermark is None:
+            return
+        if release_all:
+            cut = float(np.nextafter(self._watermark, np.inf))
+        else:
+            cut = self._watermark - self.config['reorder_seconds']
+        if self._clock is not None and cut <= self._clock:
+            return
+        staged = {name: np.concatenate([events[name] for events in self._staged]) for name in MOVE_COLUMNS}
+        ready = staged['ts'] < cut
+        if self._clock is None and not ready.any():
+            return
+        self._apply({name: values[ready] for name, values in staged.items()}, cut)
+        self._staged = [{name: values[~ready] for name, values in staged.items()}] if not ready.all() else []
+
+    def _apply(self, columns, until):
+        """Apply events (all before until) in time order and integrate up to until"""
+        if len(columns['ts']):
+            order = np.argsort(columns['ts'], kind='stable')
+            ts = columns['ts'][order]
+            joins = columns['type'][order] == JOIN
+            platforms = columns['platform'][order].astype(np.int64)
+            viewers = columns['viewer'][order]
+            if self._clock is None:
+                self._clock = float(ts[0])
+            self._first = float(ts[0]) if self._first is None else min(self._first, float(ts[0]))
+
+            hours = (ts // 3600).astype(np.int64)
+            for group in np.split(np.arange(len(ts)), np.flatnonzero(np.diff(hours)) + 1):
+                self._advance_to(int(hours[group[0]]) * 3600.0)
+                self._run(ts[group], joins[group].tolist(), platforms[group].tolist(), viewers[group].tolist())
+        if self._clock is not None:
+            self._advance_to(until)
+
+    def _advance_to(self, until):
+        """Integrate up to until, checkpointing at each recent hour boundary on the way"""
+        if until <= self._clock:
+            return
+        hour = max(int(self._clock // 3600) + 1, self._oldest_checkpoint())
+        while hour * 3600.0 <= until:
+            self._advance(hour * 3600.0)
+            self._checkpoint(hour)
+            hour += 1
+        if until > self._clock:
+            self._advance(until)
+
+    def _run(self, ts, joins, platforms, viewers):
+        expires_after = self.config['open_session_hours'] * 3600
+        times, changed, deltas = [], [], []
+        for t, join, platform, viewer in zip(ts.tolist(), joins, platforms, viewers):
+            self._expire(t, times, changed, deltas)
+            delta = 0
+            if viewer == 0:
+                anonymous = self._anonymous[platform]
+                if join:
+                    anonymous.append(t)
+                    heapq.heappush(self._expiry, (t + expires_after, platform, 0, t))
+                    delta = 1
+                elif anonymous:
+                    anonymous.popleft()
+                    delta = -1
+            elif join:
+                delta = int((platform, viewer) not in self._sessions)
+                self._sessions[(platform, viewer)] = t
+                heapq.heappush(self._expiry, (t + expires_after, platform, viewer, t))
+            elif self._sessions.pop((platform, viewer), None) is not None:
+                delta = -1
+            times.append(t)
+            changed.append(platform)
+            deltas.append(delta)
+        self._settle(times, changed, deltas, float(ts[-1]))
+
+    def _advance(self, until):
+        """Integrate the held levels, and the expiries due, up to until"""
+        times, changed, deltas = [], [], []
+        self._expire(until, times, changed, deltas)
+        self._settle(times, changed, deltas, until)
+
+    def _expire(self, now, times, changed, deltas):
+        """Close sessions whose join is more than open_session_hours before now, at the moment they expire"""
+        while self._expiry and self._expiry[0][0] < now:
+            expires, platform, viewer, joined = heapq.heappop(self._expiry)
+            if viewer:
+                # Stale entry when the viewer left or joined again since
+                if self._sessions.get((platform, viewer)) != joined:
+                    continue
+                del self._sessions[(platform, viewer)]
+            else:
+                anonymous = self._anonymous[platform]
+                if not anonymous or anonymous[0] != joined:
+                    continue
+                anonymous.popleft()
+            times.append(expires)
+            changed.append(platform)
+            deltas.append(-1)
+
+    def _settle(self, times, changed, deltas, until):
+        held = _level_steps(self._levels, changed, deltas)
+        edges = np.concatenate([[self._clock], times, [until]])
+        self._integrate(edges[:-1], edges[1:], held, instants=(np.array(times, dtype=np.float64), held[1:]))
+        self._levels = held[-1]
+        self._clock = until
+
+    def _replay(self, since):
+        """Rewind to the last checkpoint at or before since and re-apply the stored events up to the clock"""
+        end = self._clock
+        row = self._conn.execute(
+            'SELECT hour, state FROM concurrency_checkpoints WHERE hour <= ? ORDER BY hour DESC LIMIT 1',
+            (int(since // 3600),)
+        ).fetchone()
+        first = self._first
+        self._reset()
+        if row is not None:
+            hour, state = row
+            self._load(state)
+            start = hour * 3600.0
+            self._hour_rows = {key: value for key, value in self._hour_rows.items() if key[0] < hour}
+            self._rewrite_from = hour if self._rewrite_from is None else min(self._rewrite_from, hour)
+            self._stats['replays'] += 1
+        else:
+            # Checkpoints are kept: the rebuild rewrites the ones it passes and later replays still use them
+            start = min(since, first if first is not None else since)
+            self._hour_rows, self._rewrite_from = {}, 0
+            self._stats['rebuilds'] += 1
+
+        # Staged events are all at or after the clock, so the store is read up to it only
+        day = int(start // DAY_SECONDS) * DAY_SECONDS
+        while day < end:
+            window_start, window_end = max(start, day), min(day + DAY_SECONDS, end)
+            self._apply(self.store.scan(window_start, window_end), window_end)
+            day += DAY_SECONDS
+
+    def _pieces(self, starts, ends, levels):
+        """Split held intervals at hour boundaries: (epoch hour, seconds, levels) arrays"""
+        first, last = (starts // 3600).astype(np.int64), (np.ceil(ends / 3600) - 1).astype(np.int64)
+        same = last <= first
+        hours, seconds, held = [first[same]], [(ends - starts)[same]], [levels[same]]
+        for k in np.flatnonzero(~same):
+            span = np.arange(first[k], last[k] + 1)
+            edges = np.clip(np.append(span, span[-1] + 1) * 3600.0, starts[k], ends[k])
+            hours.append(span)
+            seconds.append(np.diff(edges))
+            held.append(np.repeat(levels[k:k + 1], len(span), axis=0))
+        return np.concatenate(hours), np.concatenate(seconds), np.concatenate(held)
+
+    def _integrate(self, starts, ends, levels, instants=None):
+        hours, seconds, held = self._pieces(starts, ends, levels)
+        if instants is not None:
+            # A level reached at an instant counts towards the peak even if it was held for no time
+            hours = np.concatenate([hours, (instants[0] // 3600).astype(np.int64)])
+            seconds = np.concatenate([seconds, np.zeros(len(instants[0]))])
+            held = np.concatenate([held, instants[1]])
+        cells = heatmap_cell(hours)
+        np.add.at(self._observed, cells, seconds)
+        np.add.at(self._viewer_seconds, cells, held * seconds[:, None])
+        np.maximum.at(self._peak, cells, held)
+
+        unique, inverse = np.unique(hours, return_inverse=True)
+        inverse = inverse.ravel()
+        hour_peaks = np.zeros((len(unique), ALL + 1), dtype=np.int64)
+        hour_seconds = np.zeros((len(unique), ALL + 1))
+        np.maximum.at(hour_peaks, inverse, held)
+        np.add.at(hour_seconds, inverse, held * seconds[:, None])
+        for i, hour in enumerate(unique.tolist()):
+            for platform in np.flatnonzero(hour_peaks[i] | (hour_seconds[i] > 0)).tolist():
+                key = (hour, platform if platform < ALL else -1)
+                peak, viewer_seconds = self._hour_rows.get(key, (0, 0.0))
+                self._hour_rows[key] = (max(peak, int(hour_peaks[i, platform])),
+                                        viewer_seconds + float(hour_seconds[i, platform]))
+
+    def _dump(self):
+        sessions = list(self._sessions.items())
+        anonymous = [(platform, ts) for platform, joins in enumerate(self._anonymous) for ts in joins]
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            viewer_seconds=self._viewer_seconds, observed=self._observed, peak=self._peak, levels=self._levels,
+            clock=np.array([np.nan if self._clock is None else self._clock]),
+            first=np.array([np.nan if self._first is None else self._first]),
+            session_keys=np.array([key for key, _ in sessions], dtype=np.uint64).reshape(-1, 2),
+            session_joined=np.array([joined for _, joined in sessions], dtype=np.float64),
+            anonymous=np.array(anonymous, dtype=np.float64).reshape(-1, 2)
+        )
+        return buffer.getvalue()
+
+    def _save(self):
+        """Write the unsaved hour rows and the state in one transaction, so a restart resumes consistently"""
+        rows = [(hour, platform, peak, seconds) for (hour, platform), (peak, seconds) in self._hour_rows.items()]
+        with self._conn:
+            if self._rewrite_from is not None:
+                self._conn.execute('DELETE FROM concurrency_hours WHERE hour >= ?', (self._rewrite_from,))
+            self._conn.executemany(
+                '''INSERT INTO concurrency_hours (hour, platform, peak, viewer_seconds) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (hour, platform) DO UPDATE SET
+                       peak = MAX(peak, excluded.peak),
+                       viewer_seconds = viewer_seconds + excluded.viewer_seconds''',
+                rows
+            )
+            self._conn.execute('INSERT OR REPLACE INTO concurrency_state (id, state) VALUES (1, ?)', (self._dump(),))
+            self._prune()
+        self._hour_rows, self._rewrite_from = {}, None
+        self._saved_at = time.time()
+
+    def _oldest_checkpoint(self):
+        return int(time.time() // 3600) - self.config['checkpoint_hours']
+
+    def _checkpoint(self, hour):
+        """State at the start of an epoch hour; only recent hours are kept for replays"""
+        oldest = self._oldest_checkpoint()
+        if hour < oldest:
+            return
+        with self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO concurrency_checkpoints (hour, state) VALUES (?, ?)',
+                               (hour, self._dump()))
+            self._conn.execute('DELETE FROM concurrency_checkpoints WHERE hour < ?', (oldest,))
+
+    def _load(self, blob):
+        expires_after = self.config['open_session_hours'] * 3600
+        with np.load(io.BytesIO(blob)) as state:
+            self._viewer_seconds = state['viewer_seconds']
+            self._observed = state['observed']
+            self._peak = state['peak']
+            self._levels = state['levels']
+            clock = float(state['clock'][0])
+            self._clock = None if np.isnan(clock) else clock
+            first = float(state['first'][0]) if 'first' in state.files else np.nan
+            self._first = None if np.isnan(first) else first
+            self._sessions = {
+                (int(platform), int(viewer)): float(joined)
+                for (platform, viewer), joined in zip(state['session_keys'].tolist(), state['session_joined'].tolist())
+            }
+            for platform, joined in state['anonymous'].tolist():
+                self._anonymous[int(platform)].append(joined)
+        self._expiry = [(joined + expires_after, platform, viewer, joined)
+                        for (platform, viewer), joined in self._sessions.items()]
+        self._expiry += [(joined + expires_after, platform, 0, joined)
+                         for platform, anonymous in enumerate(self._anonymous) for joined in anonymous]
+        heapq.heapify(self._expiry)
+
+    def _prune(self):
+        hour = int(time.time() // 3600)
+        if hour == self._pruned_hour:
+            return
+        self._pruned_hour = hour
+        self._conn.execute('DELETE FROM concurrency_hours WHERE hour < ?',
+                           (hour - self.config['hour_retention_days'] * 24,))
+
+    def _live(self, levels):
+        return {
+            'total': int(levels[ALL]),
+            'platforms': {platform: int(levels[code]) for code, platform in enumerate(PLATFORMS)}
+        }
+
+    def _pending(self, until):
+        """Expiries due before until that no event has applied yet: (sorted times, platforms)"""
+        expires_after = self.config['open_session_hours'] * 3600
+        due = [(joined + expires_after, platform) for (platform, _), joined in self._sessions.items()
+               if joined + expires_after < until]
+        for platform, anonymous in enumerate(self._anonymous):
+            for joined in anonymous:
+                if joined + expires_after >= until:
+                    break
+                due.append((joined + expires_after, platform))
+        due.sort()
+        return [t for t, _ in due], [platform for _, platform in due]
+
+    def current(self, now=None):
+        """Viewers watching right now, per platform and in total"""
+        now = now or time.time()
+        with self._lock:
+            self._connection()
+            _, platforms = self._pending(now)
+            live = self._live(_level_steps(self._levels, platforms, [-1] * len(platforms))[-1])
+            live['as_of'] = datetime.utcfromtimestamp(self._clock).isoformat() if self._clock else None
+        return live
+
+    def stats(self):
+        """Late-event and replay counters"""
+        with self._queue_lock:
+            queued = len(self._incoming)
+        with self._lock:
+            return dict(self._stats, queued_batches=queued, staged_events=sum(len(e['ts']) for e in self._staged),
+                        open_sessions=len(self._sessions) + sum(map(len, self._anonymous)))
+
+    def _arrays(self, now=None):
+        """Heatmap arrays including the levels held since the last event, without mutating state"""
+        now = now or time.time()
+        with self._lock:
+            self._connection()
+            viewer_seconds, observed, peak = self._viewer_seconds.copy(), self._observed.copy(), self._peak.copy()
+            clock, levels = self._clock, self._levels.copy()
+            times, platforms = self._pending(now) if clock is not None else ([], [])
+        if clock is not None and now > clock:
+            held = _level_steps(levels, platforms, [-1] * len(platforms))
+            edges = np.concatenate([[clock], times, [now]])
+            hours, seconds, held = self._pieces(edges[:-1], edges[1:], held)
+            cells = heatmap_cell(hours)
+            np.add.at(observed, cells, seconds)
+            np.add.at(viewer_seconds, cells, held * seconds[:, None])
+            np.maximum.at(peak, cells, held)
+        average = np.divide(viewer_seconds, observed[:, None], out=np.zeros_like(viewer_seconds),
+                            where=observed[:, None] > 0)
+        return average, peak, observed
+
+    def heatmap(self, now=None):
+        """{platform or 'all': {'average': 7x24, 'peak': 7x24}}; rows are Monday..Sunday, columns UTC hours"""
+        average, peak, _ = self._arrays(now)
+        names = list(PLATFORMS) + ['all']
+        return {
+            name: {
+                'average': np.round(average[:, code], 1).reshape(7, 24).tolist(),
+                'peak': peak[:, code].reshape(7, 24).tolist()
+            }
+            for code, name in enumerate(names)
+            if code == ALL or peak[:, code].any()
+        }
+
+    def _unsaved(self, code, first_hour, end_hour):
+        """(hour, peak, viewer seconds) rows integrated since the last save"""
+        return [(hour, peak, seconds) for (hour, platform), (peak, seconds) in self._hour_rows.items()
+                if platform == code and first_hour <= hour < end_hour]
+
+    def _saved_end(self, end_hour):
+        """Saved hour rows from _rewrite_from on are stale until the next save"""
+        return end_hour if self._rewrite_from is None else min(end_hour, self._rewrite_from)
+
+    def peak(self, start, end, platform=None):
+        """Highest concurrency within [start, end), from the hourly table (whole hours)"""
+        code = -1 if platform is None else platform
+        first_hour, end_hour = int(start // 3600), int(-(-end // 3600))
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT MAX(peak) FROM concurrency_hours WHERE platform = ? AND hour >= ? AND hour < ?',
+                (code, first_hour, self._saved_end(end_hour))
+            ).fetchone()
+            unsaved = [peak for _, peak, _ in self._unsaved(code, first_hour, end_hour)]
+            current = int(self._levels[ALL if platform is None else platform])
+            clock = self._clock
+        peak = max([row[0] or 0] + unsaved)
+        # The level held since the clock has not reached the table yet
+        if clock is not None and start <= time.time() and end > clock:
+            peak = max(peak, current)
+        return int(peak)
+
+    def busiest_hours(self, start, end, platform=None, top=4):
+        """UTC hours of day with the most viewer-seconds within [start, end), busiest first"""
+        code = -1 if platform is None else platform
+        first_hour, end_hour = int(start // 3600), int(-(-end // 3600))
+        with self._lock:
+            totals = dict(self._connection().execute(
+                '''SELECT hour % 24 AS hour_of_day, SUM(viewer_seconds) FROM concurrency_hours
+                   WHERE platform = ? AND hour >= ? AND hour < ? AND viewer_seconds > 0
+                   GROUP BY hour_of_day''',
+                (code, first_hour, self._saved_end(end_hour))
+            ).fetchall())
+            for hour, _, seconds in self._unsaved(code, first_hour, end_hour):
+                if seconds > 0:
+                    totals[hour % 24] = totals.get(hour % 24, 0.0) + seconds
+        return [hour for hour, _ in sorted(totals.items(), key=lambda item: -item[1])[:top]]
+
+    def suggest_slots(self, platform=None, hours=2, count=3, now=None):
+        """Best non-overlapping weekly slots of `hours` hours by average concurrency"""
+        average, peak, observed = self._arrays(now)
+        code = ALL if platform is None else platform
+        hours = max(1, min(int(hours), 24))
+        # Rolling sum over the week, wrapping Sunday night into Monday
+        window = np.array([np.roll(average[:, code], -offset) for offset in range(hours)]).sum(axis=0)
+        taken = np.zeros(CELLS, dtype=bool)
+        slots = []
+        for start in np.argsort(-window, kind='stable'):
+            if len(slots) >= count or window[start] <= 0:
+                break
+            cells = (start + np.arange(hours)) % CELLS
+            if taken[cells].any():
+                continue
+            taken[cells] = True
+            end_hour = (start + hours) % 24
+            slots.append({
+                'weekday': WEEKDAYS[start // 24],
+                'start': f"{start % 24:02d}:00",
+                'end': f"{end_hour:02d}:00",
+                'hours': hours,
+                'average_viewers': round(float(window[start] / hours), 1),
+                'peak_viewers': int(peak[cells, code].max()),
+                'weeks_observed': round(float(observed[cells].sum() / (hours * 3600)), 1)
+            })
+        return slots
+
+    def close(self):
+        """Apply everything queued and save; runs at exit once the worker has started"""
+        self._stop.set()
+        self._wake.set()
+        try:
+            self.process(release_all=True)
+            with self._lock:
+                self._save()
+        except Exception as e:
+            logger.error(f"Concurrency tracker save on shutdown failed: {e}")
+
+
+concurrency_tracker = ConcurrencyTracker(os.path.join(DEFAULT_DB_DIR, DB_FILENAME), store=event_store,
+                                         channel=dashboard_channel)
+event_store.add_listener(concurrency_tracker.add)
@@ -0,0 +1,207 @@
+"""
+Content Analysis Engine for Squirtvana Pro Enhanced
+Local, batch-vectorized scoring of captions and posts: emojis, hashtags, platform limits,
+calls to action and German/English lexicon sentiment
+"""
+
+import re
+from collections import Counter
+
+import numpy as np
+
+# Platform rules: character limit, hashtag limit, recommended hashtag and emoji ranges
+PLATFORM_RULES = {
+    'twitter': {'max_chars': 280, 'max_hashtags': 10, 'hashtags': (1, 3), 'emojis_per_100': (0.5, 5.0)},
+    'instagram': {'max_chars': 2200, 'max_hashtags': 30, 'hashtags': (3, 15), 'emojis_per_100': (0.5, 4.0)},
+    'tiktok': {'max_chars': 2200, 'max_hashtags': 30, 'hashtags': (3, 6), 'emojis_per_100': (0.5, 5.0)},
+    'onlyfans': {'max_chars': 1000, 'max_hashtags': 10, 'hashtags': (0, 3), 'emojis_per_100': (0.5, 5.0)},
+    'fansly': {'max_chars': 3000, 'max_hashtags': 10, 'hashtags': (1, 5), 'emojis_per_100': (0.5, 5.0)},
+    'chaturbate': {'max_chars': 255, 'max_hashtags': 5, 'hashtags': (2, 5), 'emojis_per_100': (0.0, 6.0)},
+    'reddit': {'max_chars': 300, 'max_hashtags': 0, 'hashtags': (0, 0), 'emojis_per_100': (0.0, 2.0)},
+    'general': {'max_chars': 2200, 'max_hashtags': 30, 'hashtags': (1, 10), 'emojis_per_100': (0.5, 5.0)}
+}
+MIN_CHARS = 20  # shorter drafts read as unfinished on every platform
+
+# Lexicon weights in [-1, 1]; German and English share one vocabulary
+SENTIMENT_LEXICON = {
+    # German positive
+    'danke': 0.6, 'dankeschön': 0.7, 'liebe': 0.8, 'lieb': 0.6, 'liebling': 0.7, 'toll': 0.7,
+    'super': 0.7, 'schön': 0.6, 'wunderschön': 0.9, 'süß': 0.6, 'glücklich': 0.8, 'geil': 0.7,
+    'heiß': 0.6, 'gut': 0.4, 'perfekt': 0.8, 'spaß': 0.6, 'freude': 0.7, 'freue': 0.6,
+    'genial': 0.8, 'wow': 0.5, 'sexy': 0.6, 'besonders': 0.4, 'exklusiv': 0.4, 'verwöhnen': 0.5,
+    # German negative
+    'schlecht': -0.7, 'langweilig': -0.6, 'traurig': -0.6, 'blöd': -0.6, 'hass': -0.9, 'hasse': -0.9,
+    'nervig': -0.6, 'teuer': -0.4, 'schade': -0.4, 'müde': -0.3, 'enttäuscht': -0.7, 'schlimm': -0.7,
+    'leider': -0.3, 'ärgerlich': -0.6, 'mies': -0.7,
+    # English positive
+    'thanks': 0.6, 'thank': 0.6, 'love': 0.8, 'lovely': 0.7, 'great': 0.7, 'awesome': 0.8,
+    'nice': 0.5, 'beautiful': 0.8, 'gorgeous': 0.8, 'cute': 0.6, 'happy': 0.7, 'hot': 0.6,
+    'good': 0.4, 'perfect': 0.8, 'fun': 0.6, 'amazing': 0.8, 'excited': 0.7, 'sexy': 0.6,
+    'special': 0.4, 'exclusive': 0.4, 'enjoy': 0.6, 'treat': 0.4,
+    # English negative
+    'bad': -0.7, 'boring': -0.6, 'sad': -0.6, 'hate': -0.9, 'annoying': -0.6, 'expensive': -0.4,
+    'tired': -0.3, 'lame': -0.6, 'worst': -0.9, 'disappointed': -0.7, 'sorry': -0.3, 'awful': -0.8,
+    'unfortunately': -0.3
+}
+NEGATORS = {'nicht', 'kein', 'keine', 'keinen', 'nie', 'niemals', 'not', 'no', 'never', "don't", 'dont', "isn't", 'isnt'}
+
+STOPWORDS = {
+    'de': {'der', 'die', 'das', 'und', 'ist', 'ich', 'du', 'nicht', 'mit', 'für', 'auf', 'ein', 'eine',
+           'mein', 'meine', 'dich', 'mich', 'heute', 'jetzt', 'noch', 'auch', 'wie', 'was', 'bin', 'bist'},
+    'en': {'the', 'and', 'is', 'i', 'you', 'not', 'with', 'for', 'on', 'a', 'an', 'my', 'me', 'your',
+           'today', 'now', 'just', 'what', 'how', 'am', 'are', 'to', 'of', 'in', 'it', 'this'}
+}
+
+CTA_PATTERN = re.compile(
+    r"\b(?:link in (?:bio|profile)|tip|tips|tippe|trinkgeld|subscribe|abonnier\w*|follow|folg\w*|join|"
+    r"komm vorbei|schau vorbei|come (?:join|see|watch)|dm me|message me|schreib mir|click|klick\w*|"
+    r"check (?:out|it out)|don'?t miss|verpass\w* nicht|book|buch\w*|unlock|grab|hol dir|sichere? dir|"
+    r"jetzt live|live now|go live|private show|privatshow)\b",
+    re.IGNORECASE
+)
+HASHTAG_PATTERN = re.compile(r"#([\wäöüÄÖÜß]+)", re.UNICODE)
+WORD_PATTERN = re.compile(r"[\wäöüÄÖÜß']+", re.UNICODE)
+EMOJI_PATTERN = re.compile(
+    "[\U0001F000-\U0001FAFF☀-➿⌀-⏿⬀-⯿㊗㊙]"
+)
+
+# Token vocabulary -> index, built once; index 0 means "unknown"
+_VOCAB = {}
+for _word in set(SENTIMENT_LEXICON) | NEGATORS | STOPWORDS['de'] | STOPWORDS['en']:
+    _VOCAB[_word] = len(_VOCAB) + 1
+_WEIGHTS = np.zeros(len(_VOCAB) + 1)
+_IS_NEGATOR = np.zeros(len(_VOCAB) + 1, dtype=bool)
+_IS_DE = np.zeros(len(_VOCAB) + 1, dtype=bool)
+_IS_EN = np.zeros(len(_VOCAB) + 1, dtype=bool)
+for _word, _index in _VOCAB.items():
+    _WEIGHTS[_index] = SENTIMENT_LEXICON.get(_word, 0.0)
+    _IS_NEGATOR[_index] = _word in NEGATORS
+    _IS_DE[_index] = _word in STOPWORDS['de']
+    _IS_EN[_index] = _word in STOPWORDS['en']
+
+# Score weights; they sum to 100
+SCORE_WEIGHTS = {'length': 25, 'hashtags': 20, 'emojis': 15, 'cta': 20, 'sentiment': 20}
+
+
+def _band_score(values, low, high):
+    """1 inside [low, high], falling off linearly to 0 at half/double the band"""
+    values = np.asarray(values, dtype=float)
+    below = np.clip(values / max(low, 1e-9), 0, 1) if low > 0 else np.ones_like(values)
+    above = np.clip(2 - values / high, 0, 1) if high > 0 else (values == 0).astype(float)
+    return np.minimum(below, above)
+
+
+def analyze_batch(texts, platform='general'):
+    """Analyze a list of drafts for one platform; returns one dict per draft.
+
+    Regex extraction runs per text; everything after that (lexicon lookup,
+    negation, per-draft sums and scoring) is done on flat NumPy arrays for
+    the whole batch at once.
+    """
+    rules = PLATFORM_RULES.get(platform, PLATFORM_RULES['general'])
+    texts = [str(t or '') for t in texts]
+    n = len(texts)
+    if n == 0:
+        return []
+
+    tokens = [WORD_PATTERN.findall(t.lower()) for t in texts]
+    hashtags = [HASHTAG_PATTERN.findall(t) for t in texts]
+    cta_hits = [CTA_PATTERN.findall(t) for t in texts]
+
+    chars = np.fromiter((len(t) for t in texts), dtype=np.int64, count=n)
+    emoji_counts = np.fromiter((len(EMOJI_PATTERN.findall(t)) for t in texts), dtype=np.int64, count=n)
+    hashtag_counts = np.fromiter((len(h) for h in hashtags), dtype=np.int64, count=n)
+    cta_counts = np.fromiter((len(c) for c in cta_hits), dtype=np.int64, count=n)
+    token_counts = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=n)
+
+    # Flat token ids for the batch and the draft each token belongs to
+    ids = np.fromiter((_VOCAB.get(w, 0) for doc in tokens for w in doc), dtype=np.int64,
+                      count=int(token_counts.sum()))
+    doc_of = np.repeat(np.arange(n), token_counts)
+
+    weights = _WEIGHTS[ids]
+    # A negator directly before a lexicon word flips it ("nicht schön", "not bad")
+    negated = np.zeros(len(ids), dtype=bool)
+    if len(ids) > 1:
+        negated[1:] = _IS_NEGATOR[ids[:-1]] & (doc_of[1:] == doc_of[:-1])
+    weights = np.where(negated, -weights, weights)
+
+    hits = np.bincount(doc_of, weights=(weights != 0), minlength=n)
+    sentiment = np.bincount(doc_of, weights=weights, minlength=n) / np.maximum(hits, 1)
+    de_hits = np.bincount(doc_of, weights=_IS_DE[ids], minlength=n)
+    en_hits = np.bincount(doc_of, weights=_IS_EN[ids], minlength=n)
+
+    emojis_per_100 = emoji_counts * 100.0 / np.maximum(chars, 1)
+    over_limit = chars > rules['max_chars']
+    length_score = np.where(over_limit, 0.0, np.clip(chars / MIN_CHARS, 0, 1))
+    hashtag_score = np.where(hashtag_counts > rules['max_hashtags'], 0.0, _band_score(hashtag_counts, *rules['hashtags']))
+    emoji_score = _band_score(emojis_per_100, *rules['emojis_per_100'])
+    cta_score = (cta_counts > 0).astype(float)
+    sentiment_score = np.clip((sentiment + 1) / 2 + 0.25, 0, 1)
+
+    scores = (
+        SCORE_WEIGHTS['length'] * length_score
+        + SCORE_WEIGHTS['hashtags'] * hashtag_score
+        + SCORE_WEIGHTS['emojis'] * emoji_score
+        + SCORE_WEIGHTS['cta'] * cta_score
+        + SCORE_WEIGHTS['sentiment'] * sentiment_score
+    ).round().astype(int)
+
+    results = []
+    for i in range(n):
+        results.append({
+            'score': int(scores[i]),
+            'suggestions': _suggestions(i, rules, chars, over_limit, hashtag_counts, emojis_per_100,
+                                        cta_counts, sentiment),
+            'keywords': _keywords(tokens[i]),
+            'hashtags': hashtags[i],
+            'calls_to_action': sorted({c.lower() for c in cta_hits[i]}),
+            'emoji_count': int(emoji_counts[i]),
+            'emoji_density': round(float(emojis_per_100[i]) / 100, 4),
+            'length': int(chars[i]),
+            'length_limit': rules['max_chars'],
+            'within_limit': not bool(over_limit[i]),
+            'language': 'de' if de_hits[i] > en_hits[i] else ('en' if en_hits[i] > 0 else 'unknown'),
+            'sentiment': _sentiment_label(sentiment[i]),
+            'sentiment_score': round(float(sentiment[i]), 3),
+            'engagement_prediction': 'high' if scores[i] >= 75 else ('medium' if scores[i] >= 50 else 'low')
+        })
+    return results
+
+
+def _sentiment_label(value):
+    if value > 0.15:
+        return 'positive'
+    if value < -0.15:
+        return 'negative'
+    return 'neutral'
+
+
+def _keywords(tokens, limit=5):
+    words = [w for w in tokens if len(w) > 3 and w not in STOPWORDS['de'] and w not in STOPWORDS['en']]
+    return [w for w, _ in Counter(words).most_common(limit)]
+
+
+def _suggestions(i, rules, chars, over_limit, hashtag_counts, emojis_per_100, cta_counts, sentiment):
+    suggestions = []
+    if over_limit[i]:
+        suggestions.append(f"Shorten by {int(chars[i] - rules['max_chars'])} characters to fit the {rules['max_chars']} limit")
+    elif chars[i] < MIN_CHARS:
+        suggestions.append('Write a little more; very short posts read as unfinished')
+    low, high = rules['hashtags']
+    if hashtag_counts[i] > rules['max_hashtags']:
+        suggestions.append(f"Use at most {rules['max_hashtags']} hashtags on this platform")
+    elif hashtag_counts[i] < low:
+        suggestions.append(f"Add {low - int(hashtag_counts[i])} or more relevant hashtags")
+    elif hashtag_counts[i] > high:
+        suggestions.append(f"Trim hashtags to about {high}")
+    emoji_low, emoji_high = rules['emojis_per_100']
+    if emojis_per_100[i] < emoji_low:
+        suggestions.append('Add an emoji or two for better engagement')
+    elif emojis_per_100[i] > emoji_high:
+        suggestions.append('Use fewer emojis so the message stays readable')
+    if cta_counts[i] == 0:
+        suggestions.append('Include a call to action (e.g. "link in bio", "komm vorbei", "tip to unlock")')
+    if sentiment[i] < -0.15:
+        suggestions.append('Reword negative phrases; upbeat posts perform better')
+    return suggestions
@@ -0,0 +1,117 @@
+"""
+Content History Store for Squirtvana Pro Enhanced
+Append-only SQLite log of generated AI content with bounded retention
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+DEFAULT_DB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
+DB_FILENAME = 'content_history.db'
+DEFAULT_RETENTION = 1000  # entries kept per content type
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS content_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_content_history_type_time
+    ON content_history (type, created_at);
+CREATE INDEX IF NOT EXISTS idx_content_history_time
+    ON content_history (created_at);
+"""
+
+
+class SQLiteLog:
+    """SQLite database shared by the worker threads of one process.
+
+    WAL mode so readers never block the writer, and every thread gets its
+    own connection. Writes take _write_lock to avoid busy retries between
+    threads of the same process.
+    """
+
+    def __init__(self, db_path, schema):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._write_lock:
+            self._connection().executescript(schema)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+
+class ContentHistory(SQLiteLog):
+    """Append-only content log; each write is one INSERT plus an indexed prune
+    that keeps the newest `retention` entries per content type."""
+
+    def __init__(self, db_path, retention=DEFAULT_RETENTION):
+        super().__init__(db_path, SCHEMA)
+        self.retention = retention
+
+    def append(self, content_type, content, created_at=None):
+        """Record one generation and drop entries beyond the retention window"""
+        created_at = created_at or datetime.utcnow().isoformat()
+        conn = self._connection()
+        with self._write_lock, conn:
+            cursor = conn.execute(
+                'INSERT INTO content_history (type, content, created_at) VALUES (?, ?, ?)',
+                (content_type, content, created_at)
+            )
+            conn.execute(
+                '''DELETE FROM content_history WHERE id IN (
+                       SELECT id FROM content_history WHERE type = ?
+                       ORDER BY created_at DESC, id DESC LIMIT -1 OFFSET ?
+                   )''',
+                (content_type, self.retention)
+            )
+        return cursor.lastrowid
+
+    def recent(self, content_type=None, limit=20, since=None):
+        """Newest entries first, optionally filtered by type and ISO timestamp"""
+        clauses, params = [], []
+        if content_type:
+            clauses.append('type = ?')
+            params.append(content_type)
+        if since:
+            clauses.append('created_at >= ?')
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._connection().execute(
+            f'''SELECT id, type, content, created_at FROM content_history {where}
+                ORDER BY created_at DESC, id DESC LIMIT ?''',
+            (*params, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self):
+        """Number of stored entries per content type"""
+        rows = self._connection().execute(
+            'SELECT type, COUNT(*) AS total FROM content_history GROUP BY type'
+        ).fetchall()
+        return {row['type']: row['total'] for row in rows}
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_content_history(cache_dir=None):
+    """Shared ContentHistory for cache_dir (defaults to the database folder)"""
+    db_path = os.path.join(cache_dir or DEFAULT_DB_DIR, DB_FILENAME)
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = _stores[db_path] = ContentHistory(db_path)
+        return store
@@ -0,0 +1,88 @@
+"""
+Dashboard Push Channel for Squirtvana Pro Enhanced
+In-process fan-out of live dashboard events to Server-Sent Event subscribers
+"""
+
+import json
+import queue
+import threading
+from datetime import datetime
+
+# Push Channel Configuration
+PUSH_CONFIG = {
+    'subscriber_queue': 100,      # events buffered per client before the oldest are dropped
+    'heartbeat_seconds': 15,      # keeps proxies from closing idle streams
+    'recent_events': 50           # replayed to clients that reconnect with Last-Event-ID
+}
+
+
+class PushChannel:
+    """Publish/subscribe channel; every subscriber gets every event.
+
+    publish() never blocks: a subscriber that falls behind loses its
+    oldest buffered events instead of slowing the event store listeners
+    that publish. Events carry increasing ids so reconnecting clients can
+    resume from the short replay buffer.
+    """
+
+    def __init__(self, config=None):
+        self.config = dict(PUSH_CONFIG, **(config or {}))
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = []
+        self._next_id = 1
+
+    def publish(self, event, data):
+        with self._lock:
+            message = {'id': self._next_id, 'event': event,
+                       'data': dict(data, timestamp=datetime.utcnow().isoformat())}
+            self._next_id += 1
+            self._recent = (self._recent + [message])[-self.config['recent_events']:]
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def subscribe(self, last_event_id=None):
+        subscriber = queue.Queue(self.config['subscriber_queue'])
+        with self._lock:
+            if last_event_id is not None:
+                for message in self._recent:
+                    if message['id'] > last_event_id:
+                        subscriber.put_nowait(message)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self, last_event_id=None):
+        """SSE text for one client until it disconnects"""
+        subscriber = self.subscribe(last_event_id)
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    message = subscriber.get(timeout=self.config['heartbeat_seconds'])
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield (f"id: {message['id']}\nevent: {message['event']}\n"
+                       f"data: {json.dumps(message['data'], ensure_ascii=False)}\n\n")
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {'subscribers': len(self._subscribers), 'published': self._next_id - 1}
+
+
+dashboard_channel = PushChannel()
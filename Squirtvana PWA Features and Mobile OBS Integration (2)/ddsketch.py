@@ -0,0 +1,143 @@
+"""
+Quantile Sketches for Squirtvana Pro Enhanced
+Mergeable DDSketch distributions of tip amounts and session lengths per hour, day and platform
+"""
+
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from src.routes.event_store import event_store, EVENT_CODES
+from src.routes.sketch_store import SketchStore
+
+DEFAULT_DB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
+DB_FILENAME = 'quantile_sketches.db'
+
+# Every reported quantile is within 1% of the true value at that rank
+# (relative error, so it holds equally for a 1-token tip and a 5000-token whale)
+RELATIVE_ACCURACY = 0.01
+MAX_BINS = 2048  # lowest bins are collapsed beyond this; ~1e17 range at 1%
+
+# Metric name -> (event type, column, scale); values <= 0 are not recorded
+METRICS = OrderedDict([
+    ('tip_amount', ('tip', 'amount', 1.0)),
+    ('session_minutes', ('viewer_leave', 'duration', 1 / 60.0))
+])
+METRIC_CODES = {name: code for code, name in enumerate(METRICS)}
+
+# Sketch Configuration (None keeps sketches forever)
+QUANTILE_CONFIG = {
+    'retention_days': {'hour': 35, 'day': None},
+    'cached_sketches': 256
+}
+
+
+class DDSketch:
+    """DDSketch over positive values with a fixed relative accuracy.
+
+    A value x lands in bin ceil(log_gamma(x)) with gamma = (1 + a) / (1 - a);
+    bins hold counts, so merging two sketches is adding counts per bin.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.bins = {}
+
+    @property
+    def count(self):
+        return sum(self.bins.values())
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[values > 0]
+        if not len(values):
+            return
+        keys, counts = np.unique(np.ceil(np.log(values) / self._log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.bins[key] = self.bins.get(key, 0) + count
+        self._collapse()
+
+    def merge(self, other):
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self._collapse()
+        return self
+
+    def _collapse(self):
+        if len(self.bins) <= MAX_BINS:
+            return
+        keys = sorted(self.bins)
+        floor = keys[len(keys) - MAX_BINS]
+        folded = sum(self.bins.pop(key) for key in keys[:len(keys) - MAX_BINS])
+        self.bins[floor] += folded
+
+    def quantiles(self, qs):
+        """Values at each quantile in qs (0..1); None when the sketch is empty"""
+        if not self.bins:
+            return [None] * len(qs)
+        keys = np.array(sorted(self.bins), dtype=np.int64)
+        cumulative = np.cumsum([self.bins[key] for key in keys.tolist()])
+        ranks = np.asarray(qs, dtype=np.float64) * (cumulative[-1] - 1)
+        positions = np.searchsorted(cumulative, ranks, side='right')
+        values = 2 * np.power(self.gamma, keys[positions]) / (self.gamma + 1)
+        return [float(v) for v in values]
+
+    def to_bytes(self):
+        keys = np.array(list(self.bins), dtype=np.int32)
+        counts = np.array(list(self.bins.values()), dtype=np.uint64)
+        return np.uint32(len(keys)).tobytes() + keys.tobytes() + counts.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data, relative_accuracy=RELATIVE_ACCURACY):
+        sketch = cls(relative_accuracy)
+        size = int(np.frombuffer(data, dtype=np.uint32, count=1)[0])
+        keys = np.frombuffer(data, dtype=np.int32, count=size, offset=4)
+        counts = np.frombuffer(data, dtype=np.uint64, count=size, offset=4 + 4 * size)
+        sketch.bins = dict(zip(keys.tolist(), counts.tolist()))
+        return sketch
+
+
+class QuantileSketches(SketchStore):
+    """One DDSketch per (hour or day, platform, metric), fed by the event store.
+
+    Same storage layout and range handling as ViewerSketches; a query
+    merges bin counts without touching raw events.
+    """
+
+    TABLE = 'quantile_sketches'
+    KIND_COLUMN = 'metric'
+    DATA_COLUMN = 'bins'
+    sketch_class = DDSketch
+    default_config = QUANTILE_CONFIG
+
+    def _samples(self, columns):
+        for metric, (event_type, column, scale) in METRICS.items():
+            mask = (columns['type'] == EVENT_CODES[event_type]) & (columns[column] > 0)
+            if mask.any():
+                yield (columns['ts'][mask], columns['platform'][mask],
+                       np.full(int(mask.sum()), METRIC_CODES[metric]),
+                       (columns[column][mask].astype(np.float64) * scale,))
+
+    @staticmethod
+    def _fold(sketch, values):
+        sketch.add(values)
+
+    def merged(self, metric, start, end, platform=None):
+        """Merged sketch of metric over [start, end), edges widened to whole hours (or days past retention)"""
+        return self._merged(start, end, platform, [METRIC_CODES[metric]])
+
+    def summary(self, metric, start, end, platform=None, qs=(0.5, 0.9, 0.99)):
+        """{'count', 'p50', 'p90', 'p99'} for metric over [start, end)"""
+        sketch = self.merged(metric, start, end, platform)
+        values = sketch.quantiles(qs)
+        summary = {'count': int(sketch.count)}
+        for q, value in zip(qs, values):
+            summary[f"p{round(q * 100):g}"] = round(value, 2) if value is not None else None
+        return summary
+
+
+quantile_sketches = QuantileSketches(os.path.join(DEFAULT_DB_DIR, DB_FILENAME), store=event_store)
+event_store.add_listener(quantile_sketches.add)
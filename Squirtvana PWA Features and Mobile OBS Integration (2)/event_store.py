@@ -0,0 +1,401 @@
+"""
+Event Store for Squirtvana Pro Enhanced
+Buffered ingestion of stream events into append-only, per-day columnar NumPy segments
+"""
+
+import os
+import math
+import time
+import uuid
+import atexit
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src.routes.providers import env
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'events')
+
+# Event Store Configuration
+EVENT_CONFIG = {
+    'flush_rows': int(env('EVENT_FLUSH_ROWS', '10000')),
+    'flush_interval': float(env('EVENT_FLUSH_SECONDS', '2')),
+    'max_future_seconds': 300,   # reject clocks that are badly ahead
+    'max_age_days': 3650,        # and timestamps older than any backfill we accept
+    'cached_days': 62            # decoded day partitions kept in memory
+}
+MAX_BATCH_EVENTS = 10000
+
+EVENT_TYPES = ('tip', 'viewer_join', 'viewer_leave', 'subscription', 'private_show', 'content_post')
+PLATFORMS = ('chaturbate', 'onlyfans', 'fansly', 'other')
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+PLATFORM_CODES = {name: code for code, name in enumerate(PLATFORMS)}
+REVENUE_TYPES = ('tip', 'subscription', 'private_show')
+
+# Column name -> dtype; every segment stores exactly these arrays
+COLUMNS = OrderedDict([
+    ('ts', np.float64),        # UTC epoch seconds
+    ('type', np.uint8),        # index into EVENT_TYPES
+    ('platform', np.uint8),    # index into PLATFORMS
+    ('amount', np.float64),    # revenue for tip/subscription/private_show
+    ('viewer', np.uint64),     # 64-bit hash of the viewer id, 0 when anonymous
+    ('duration', np.float32)   # seconds (session length on viewer_leave, show length on private_show)
+])
+DAY_SECONDS = 86400
+
+
+class EventError(ValueError):
+    """Malformed event payload"""
+
+
+def viewer_hash(viewer_id):
+    """Stable 64-bit id for a viewer; the raw id is never stored"""
+    if viewer_id in (None, ''):
+        return 0
+    digest = hashlib.blake2b(str(viewer_id).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+def _parse_timestamp(value, now):
+    if value in (None, ''):
+        return now
+    if isinstance(value, (int, float)):
+        ts = float(value)
+        if not math.isfinite(ts):
+            raise EventError(f"Invalid timestamp '{value}'")
+        return ts / 1000 if ts > 1e11 else ts  # accept milliseconds
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise EventError(f"Invalid timestamp '{value}'")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def normalize_event(event, now=None):
+    """Validate one event dict and return its column tuple; raises EventError"""
+    if not isinstance(event, dict):
+        raise EventError('Event must be an object')
+    now = now or time.time()
+    event_type = event.get('type')
+    if event_type not in EVENT_CODES:
+        raise EventError(f"Unsupported event type '{event_type}' (use one of {', '.join(EVENT_TYPES)})")
+    platform = str(event.get('platform') or 'other').lower()
+
+    ts = _parse_timestamp(event.get('timestamp'), now)
+    if ts > now + EVENT_CONFIG['max_future_seconds']:
+        raise EventError('Timestamp is in the future')
+    if ts < max(0, now - EVENT_CONFIG['max_age_days'] * DAY_SECONDS):
+        raise EventError(f"Timestamp is more than {EVENT_CONFIG['max_age_days']} days old")
+    try:
+        amount = float(event.get('amount') or 0)
+        duration = float(event.get('duration') or 0)
+    except (TypeError, ValueError):
+        raise EventError("'amount' and 'duration' must be numbers")
+    # get_json() accepts NaN and Infinity, which would poison every sum downstream
+    if not (math.isfinite(amount) and math.isfinite(duration)):
+        raise EventError("'amount' and 'duration' must be finite numbers")
+    if amount < 0 or duration < 0:
+        raise EventError("'amount' and 'duration' must not be negative")
+    if amount and event_type not in REVENUE_TYPES:
+        raise EventError(f"'{event_type}' events carry no amount")
+
+    return (ts, EVENT_CODES[event_type], PLATFORM_CODES.get(platform, PLATFORM_CODES['other']),
+            amount, viewer_hash(event.get('viewer_id')), duration)
+
+
+def day_key(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d')
+
+
+def _empty_columns():
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+
+def _concat(parts):
+    if not parts:
+        return _empty_columns()
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+
+
+class EventStore:
+    """Append-only event log partitioned by UTC day.
+
+    Events are buffered in memory and flushed in bulk, either when the
+    buffer reaches flush_rows or every flush_interval seconds, as one
+    uncompressed .npz segment (one array per column) per day touched.
+    Segments are never rewritten except when a finished day is compacted
+    into a single segment. Queries read whole column arrays for the days
+    in range plus the unflushed buffer, so aggregations stay vectorized.
+    """
+
+    def __init__(self, data_dir, config=None):
+        self.data_dir = data_dir
+        self.config = dict(EVENT_CONFIG, **(config or {}))
+        self._lock = threading.Lock()            # buffer
+        self._append_lock = threading.Lock()     # listeners see batches in buffer order
+        self._segment_lock = threading.RLock()   # segment files and day cache
+        self._buffer = []
+        self._cache = OrderedDict()              # day -> (segment names, columns)
+        self._listeners = []
+        self._flusher = None
+        self._stop = threading.Event()
+        self._compacted_through = None
+        self._streaming = 0                      # iter_segments() readers; compaction waits for them
+        self._stats = {'ingested': 0, 'flushes': 0, 'flush_errors': 0, 'segments_written': 0, 'compactions': 0}
+
+    def add_listener(self, listener):
+        """Call listener(columns) with each accepted batch, before it is flushed.
+
+        Batches reach listeners one at a time, in the order they enter the
+        buffer, so a listener that scans the store sees exactly the batches
+        it was already given.
+        """
+        self._listeners.append(listener)
+
+    @contextmanager
+    def ingestion_paused(self):
+        """Hold off appends while the block runs.
+
+        Every batch already handed to the listeners is in the buffer by the
+        time the block starts, and no new batch reaches them until it ends.
+        """
+        with self._append_lock:
+            yield
+
+    def append(self, rows):
+        """Buffer normalized event tuples; flushes when the buffer is full"""
+        if not rows:
+            return 0
+        columns = self._to_columns(rows)
+        with self._append_lock:
+            for listener in self._listeners:
+                try:
+                    listener(columns)
+                except Exception as e:
+                    logger.error(f"Event listener error: {e}")
+            with self._lock:
+                self._buffer.extend(rows)
+                self._stats['ingested'] += len(rows)
+                full = len(self._buffer) >= self.config['flush_rows']
+        self._ensure_flusher()
+        if full:
+            self.flush()
+        return len(rows)
+
+    def _to_columns(self, rows):
+        return {name: np.fromiter((row[i] for row in rows), dtype=dtype, count=len(rows))
+                for i, (name, dtype) in enumerate(COLUMNS.items())}
+
+    def _ensure_flusher(self):
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name='event-flusher', daemon=True)
+                    self._flusher.start()
+                    atexit.register(self.close)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.config['flush_interval']):
+            try:
+                self.flush()
+                self._compact_finished_days()
+            except Exception as e:
+                logger.error(f"Event flush error: {e}")
+
+    def flush(self):
+        """Write the buffer as one segment per UTC day; returns rows written"""
+        # Held across the swap and the writes so a concurrent scan cannot
+        # miss rows that have left the buffer but are not on disk yet
+        with self._segment_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            columns = self._to_columns(rows)
+            order = np.argsort(columns['ts'], kind='stable')
+            columns = {name: values[order] for name, values in columns.items()}
+
+            days = (columns['ts'] // DAY_SECONDS).astype(np.int64)
+            boundaries = np.flatnonzero(np.diff(days)) + 1
+            starts = np.concatenate(([0], boundaries))
+            ends = np.concatenate((boundaries, [len(days)]))
+            for start, end in zip(starts, ends):
+                try:
+                    self._write_segment(day_key(columns['ts'][start]),
+                                        {name: values[start:end] for name, values in columns.items()})
+                except Exception:
+                    # Days already written stay written; the rest go back to the
+                    # front of the buffer so the next flush retries them
+                    unwritten = [rows[i] for i in order[start:].tolist()]
+                    with self._lock:
+                        self._buffer[:0] = unwritten
+                        self._stats['flush_errors'] += 1
+                    raise
+            self._stats['flushes'] += 1
+        return len(rows)
+
+    def _write_segment(self, day, columns):
+        day_dir = os.path.join(self.data_dir, day)
+        os.makedirs(day_dir, exist_ok=True)
+        name = f"seg_{int(time.time() * 1000):013d}_{uuid.uuid4().hex[:8]}.npz"
+        part_path = os.path.join(day_dir, f".{name}.part")
+        with open(part_path, 'wb') as f:
+            np.savez(f, **columns)
+        os.replace(part_path, os.path.join(day_dir, name))
+        self._stats['segments_written'] += 1
+
+    def _segment_names(self, day):
+        try:
+            return sorted(n for n in os.listdir(os.path.join(self.data_dir, day)) if n.endswith('.npz'))
+        except FileNotFoundError:
+            return []
+
+    def _load_segment(self, day, name):
+        with np.load(os.path.join(self.data_dir, day, name)) as data:
+            return {column: data[column] for column in COLUMNS}
+
+    def read_day(self, day):
+        """All flushed events of one UTC day (YYYY-MM-DD), sorted by segment order"""
+        with self._segment_lock:
+            names = self._segment_names(day)
+            cached = self._cache.get(day)
+            if cached is not None and cached[0] == names:
+                self._cache.move_to_end(day)
+                return cached[1]
+            if cached is not None and names[:len(cached[0])] == cached[0]:
+                # Only new segments were added: decode just those
+                columns = _concat([cached[1]] + [self._load_segment(day, n) for n in names[len(cached[0]):]])
+            else:
+                columns = _concat([self._load_segment(day, n) for n in names])
+            self._cache[day] = (names, columns)
+            self._cache.move_to_end(day)
+            while len(self._cache) > self.config['cached_days']:
+                self._cache.popitem(last=False)
+            return columns
+
+    def scan(self, start_ts, end_ts):
+        """Columns of every event with start_ts <= ts < end_ts, including unflushed ones"""
+        parts = []
+        first_day = int(start_ts // DAY_SECONDS)
+        last_day = int((end_ts - 1e-6) // DAY_SECONDS)
+        with self._segment_lock:
+            for day_index in range(first_day, last_day + 1):
+                columns = self.read_day(day_key(day_index * DAY_SECONDS))
+                if len(columns['ts']):
+                    parts.append(columns)
+            with self._lock:
+                pending = list(self._buffer)
+        if pending:
+            parts.append(self._to_columns(pending))
+
+        columns = _concat(parts)
+        mask = (columns['ts'] >= start_ts) & (columns['ts'] < end_ts)
+        if mask.all():
+            return columns
+        return {name: values[mask] for name, values in columns.items()}
+
+    def iter_segments(self, start_ts, end_ts):
+        """Events with start_ts <= ts < end_ts one segment at a time, then the unflushed ones.
+
+        Unlike scan() nothing goes through the day cache and only one segment
+        is decoded at a time, so a long export neither grows memory with its
+        range nor evicts the days the dashboard keeps hot. It reads the
+        segments and buffer as they were on the first next(); compaction
+        waits until the iteration ends.
+        """
+        first_day = int(start_ts // DAY_SECONDS)
+        last_day = int((end_ts - 1e-6) // DAY_SECONDS)
+        with self._segment_lock:
+            segments = [(day, name) for day in (day_key(i * DAY_SECONDS) for i in range(first_day, last_day + 1))
+                        for name in self._segment_names(day)]
+            with self._lock:
+                pending = [row for row in self._buffer if start_ts <= row[0] < end_ts]
+            self._streaming += 1
+        try:
+            for day, name in segments:
+                columns = self._load_segment(day, name)
+                mask = (columns['ts'] >= start_ts) & (columns['ts'] < end_ts)
+                if mask.all():
+                    yield columns
+                elif mask.any():
+                    yield {column: values[mask] for column, values in columns.items()}
+            if pending:
+                yield self._to_columns(pending)
+        finally:
+            with self._segment_lock:
+                self._streaming -= 1
+
+    def days(self):
+        """UTC days that have flushed segments, oldest first"""
+        try:
+            return sorted(d for d in os.listdir(self.data_dir) if len(d) == 10 and d[4] == '-')
+        except FileNotFoundError:
+            return []
+
+    def _compact_finished_days(self):
+        today = day_key(time.time())
+        if self._compacted_through == today:
+            return
+        for day in self.days():
+            if day < today and len(self._segment_names(day)) > 1 and not self.compact(day):
+                return  # a streaming read holds the segments; retried after the next flush
+        self._compacted_through = today
+
+    def compact(self, day):
+        """Merge a day's segments into one, ordered by timestamp; False when nothing was merged"""
+        with self._segment_lock:
+            names = self._segment_names(day)
+            if len(names) < 2 or self._streaming:
+                return False
+            columns = self.read_day(day)
+            order = np.argsort(columns['ts'], kind='stable')
+            self._write_segment(day, {name: values[order] for name, values in columns.items()})
+            for name in names:
+                os.remove(os.path.join(self.data_dir, day, name))
+            self._cache.pop(day, None)
+            self._stats['compactions'] += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            buffered = len(self._buffer)
+        return dict(self._stats, buffered=buffered, days=len(self.days()))
+
+    def close(self):
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Event flush on shutdown failed: {e}")
+
+
+event_store = EventStore(DEFAULT_DATA_DIR)
+
+
+def ingest_events(events, store=None):
+    """Validate and buffer a batch of event dicts.
+
+    Returns (accepted count, [{'index', 'error'}, ...]) so one bad event does
+    not drop the rest of the batch.
+    """
+    store = store or event_store
+    now = time.time()
+    rows, rejected = [], []
+    for index, event in enumerate(events):
+        try:
+            rows.append(normalize_event(event, now))
+        except EventError as e:
+            rejected.append({'index': index, 'error': str(e)})
+    store.append(rows)
+    return len(rows), rejected
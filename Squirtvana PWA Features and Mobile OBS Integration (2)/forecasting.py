@@ -0,0 +1,268 @@
+"""
+Revenue Forecasting for Squirtvana Pro Enhanced
+Holt-Winters (weekday x hour seasonality, damped trend) on hourly revenue rollups, refit in the background
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from src.routes.event_store import EVENT_CODES, REVENUE_TYPES
+from src.routes.providers import env
+from src.routes.rollups import rollups
+
+logger = logging.getLogger(__name__)
+
+SEASON_HOURS = 168  # one week of hours: weekday x hour-of-day
+
+# Forecast Configuration
+FORECAST_CONFIG = {
+    'history_days': int(env('FORECAST_HISTORY_DAYS', '56')),
+    'refresh_seconds': int(env('FORECAST_REFRESH_SECONDS', '3600')),
+    'full_refit_hours': 24,        # between refreshes the fitted state is only advanced
+    'interval_level': 0.9,
+    'simulation_paths': 2000,
+    'damping': 0.98
+}
+HORIZONS = {'next_week': 7 * 24, 'next_month': 30 * 24}
+
+# Smoothing parameter grid searched on every full refit
+ALPHAS = np.array([0.02, 0.05, 0.1, 0.2, 0.35, 0.5])
+BETAS = np.array([0.0, 0.001, 0.005, 0.02])
+GAMMAS = np.array([0.02, 0.05, 0.1, 0.2, 0.35])
+
+
+def hourly_revenue(first_hour, end_hour):
+    """Revenue per epoch hour in [first_hour, end_hour) from the rollups, zero-filled"""
+    series = np.zeros(end_hour - first_hour)
+    rows = rollups.query(first_hour * 3600, end_hour * 3600, by=('hour',),
+                         types=[EVENT_CODES[t] for t in REVENUE_TYPES])
+    for row in rows:
+        if first_hour <= row['hour'] < end_hour:
+            series[row['hour'] - first_hour] = row['amount']
+    return series
+
+
+def _smooth(y, level, trend, season, alpha, beta, gamma, phi, start_hour):
+    """Run the error-correction recursions over y; all state arrays carry a leading parameter axis.
+
+    season is indexed by epoch hour % SEASON_HOURS and updated in place.
+    Returns (level, trend, one-step errors with shape (len(y), candidates)).
+    """
+    errors = np.empty((len(y), len(level)))
+    for t, value in enumerate(y):
+        slot = (start_hour + t) % SEASON_HOURS
+        error = value - (level + phi * trend + season[:, slot])
+        errors[t] = error
+        level = level + phi * trend + alpha * error
+        trend = phi * trend + beta * error
+        season[:, slot] += gamma * error
+    return level, trend, errors
+
+
+class HoltWintersModel:
+    """Additive Holt-Winters with damped trend over an hourly series.
+
+    fit() grid-searches alpha/beta/gamma for every combination at once
+    (the parameter grid is a NumPy axis), keeps the best by squared
+    one-step error, and retains its state and residuals. advance() feeds
+    new hours through the fitted recursions without re-optimizing.
+    """
+
+    def __init__(self, phi=FORECAST_CONFIG['damping']):
+        self.phi = phi
+        self.params = None
+        self.level = self.trend = self.season = None
+        self.residuals = None
+        self.next_hour = None
+
+    def fit(self, y, start_hour):
+        if len(y) < 2 * SEASON_HOURS:
+            raise ValueError(f"Need at least {2 * SEASON_HOURS} hours of history, have {len(y)}")
+        grid = np.array(np.meshgrid(ALPHAS, BETAS, GAMMAS, indexing='ij')).reshape(3, -1)
+        grid = grid[:, grid[1] <= grid[0]]  # beta <= alpha keeps the trend from chasing noise
+        alpha, beta, gamma = grid
+        candidates = grid.shape[1]
+
+        first, second = y[:SEASON_HOURS], y[SEASON_HOURS:2 * SEASON_HOURS]
+        level = np.full(candidates, first.mean())
+        trend = np.full(candidates, (second.mean() - first.mean()) / SEASON_HOURS)
+        season = np.zeros((candidates, SEASON_HOURS))
+        slots = (start_hour + np.arange(SEASON_HOURS)) % SEASON_HOURS
+        season[:, slots] = first - first.mean()
+
+        level, trend, errors = _smooth(y, level, trend, season, alpha, beta, gamma, self.phi, start_hour)
+        # Score after the first season, which only served to initialise
+        best = int(np.argmin((errors[SEASON_HOURS:] ** 2).sum(axis=0)))
+
+        self.params = {'alpha': float(alpha[best]), 'beta': float(beta[best]), 'gamma': float(gamma[best])}
+        self.level, self.trend = level[best:best + 1], trend[best:best + 1]
+        self.season = season[best:best + 1].copy()
+        self.residuals = errors[SEASON_HOURS:, best]
+        self.next_hour = start_hour + len(y)
+        return self
+
+    def advance(self, y):
+        """Update the state with hours observed since the last fit or advance"""
+        if not len(y):
+            return self
+        p = self.params
+        self.level, self.trend, errors = _smooth(
+            y, self.level, self.trend, self.season, p['alpha'], p['beta'], p['gamma'], self.phi, self.next_hour
+        )
+        self.residuals = np.concatenate([self.residuals, errors[:, 0]])[-len(self.residuals):]
+        self.next_hour += len(y)
+        return self
+
+    def forecast(self, horizon, paths=0, rng=None):
+        """Point forecast for the next horizon hours, plus simulated sample paths (paths x horizon).
+
+        Paths re-run the recursions with residuals drawn from the fitted
+        one-step errors, so intervals widen with the horizon and reflect
+        the errors' actual shape rather than a normal assumption.
+        """
+        p = self.params
+        steps = np.arange(1, horizon + 1)
+        damped = np.cumsum(self.phi ** steps)
+        slots = (self.next_hour + steps - 1) % SEASON_HOURS
+        point = self.level[0] + damped * self.trend[0] + self.season[0, slots]
+        if not paths:
+            return point, None
+
+        rng = rng or np.random.default_rng()
+        level = np.repeat(self.level, paths)
+        trend = np.repeat(self.trend, paths)
+        season = np.repeat(self.season, paths, axis=0)
+        simulated = np.empty((paths, horizon))
+        for h in range(horizon):
+            slot = slots[h]
+            error = rng.choice(self.residuals, size=paths)
+            value = level + self.phi * trend + season[:, slot] + error
+            simulated[:, h] = value
+            level = level + self.phi * trend + p['alpha'] * error
+            trend = self.phi * trend + p['beta'] * error
+            season[:, slot] += p['gamma'] * error
+        return point, simulated
+
+
+class RevenueForecaster:
+    """Keeps a fitted model and its latest forecast; the API only reads the cache.
+
+    A background thread refreshes every refresh_seconds: a full refit when
+    the last one is older than full_refit_hours, otherwise the model is
+    advanced over the newly completed hours and re-forecast.
+    """
+
+    def __init__(self, config=None):
+        self.config = dict(FORECAST_CONFIG, **(config or {}))
+        self._lock = threading.Lock()
+        self._model = None
+        self._fitted_at = 0
+        self._forecast = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def latest(self):
+        """Cached forecast dict, or None while the first fit is still running"""
+        self._ensure_thread()
+        with self._lock:
+            return self._forecast
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name='revenue-forecaster', daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Revenue forecast refresh error: {e}")
+            if self._stop.wait(self.config['refresh_seconds']):
+                return
+
+    def refresh(self, now=None):
+        """Refit or advance the model and recompute the cached forecast"""
+        now = now or time.time()
+        current_hour = int(now // 3600)  # the running hour is incomplete and not used
+        model = self._model
+
+        if model is None or now - self._fitted_at >= self.config['full_refit_hours'] * 3600:
+            first_hour = current_hour - self.config['history_days'] * 24
+            history = hourly_revenue(first_hour, current_hour)
+            # Leading hours before the first revenue are not history, just an empty store
+            active = np.flatnonzero(history)
+            if not len(active) or current_hour - (first_hour + active[0]) < 2 * SEASON_HOURS:
+                self._publish(self._run_rate(history, now, 'insufficient_history'))
+                return
+            start = first_hour + int(active[0])
+            model = HoltWintersModel(self.config['damping']).fit(history[active[0]:], start)
+            self._fitted_at = now
+        elif model.next_hour < current_hour:
+            model.advance(hourly_revenue(model.next_hour, current_hour))
+
+        self._model = model
+        self._publish(self._summarize(model, now))
+
+    def _summarize(self, model, now):
+        level = self.config['interval_level']
+        longest = max(HORIZONS.values())
+        point, paths = model.forecast(longest, self.config['simulation_paths'])
+        point = np.clip(point, 0, None)
+        paths = np.clip(paths, 0, None)
+
+        projections, intervals = {}, {}
+        for name, hours in HORIZONS.items():
+            totals = paths[:, :hours].sum(axis=1)
+            low, high = np.quantile(totals, [(1 - level) / 2, (1 + level) / 2])
+            projections[name] = round(float(point[:hours].sum()), 2)
+            intervals[name] = {'low': round(float(low), 2), 'high': round(float(high), 2)}
+
+        week = projections['next_week']
+        half_width = (intervals['next_week']['high'] - intervals['next_week']['low']) / 2
+        return {
+            **projections,
+            'intervals': intervals,
+            'interval_level': level,
+            # Narrower intervals relative to the projection mean a more confident forecast
+            'confidence': max(0, round(100 - half_width * 100 / week)) if week else 0,
+            'next_7_days': [round(float(day), 2) for day in point[:7 * 24].reshape(7, 24).sum(axis=1)],
+            'model': {
+                'type': 'holt_winters_additive_damped',
+                'season_hours': SEASON_HOURS,
+                **{k: round(v, 4) for k, v in model.params.items()},
+                'damping': model.phi,
+                'residual_rmse': round(float(np.sqrt(np.mean(model.residuals ** 2))), 2),
+                'fitted_at': datetime.utcfromtimestamp(self._fitted_at).isoformat(),
+                'data_through': datetime.utcfromtimestamp(model.next_hour * 3600).isoformat()
+            },
+            'generated_at': datetime.utcfromtimestamp(now).isoformat()
+        }
+
+    def _run_rate(self, history, now, reason):
+        """Fallback while there are fewer than two weeks of revenue: daily run rate"""
+        whole_days = len(history) // 24
+        recent = history[len(history) - whole_days * 24:].reshape(-1, 24).sum(axis=1)[-7:]
+        mean = float(recent.mean()) if len(recent) else 0.0
+        return {
+            'next_week': round(mean * 7, 2),
+            'next_month': round(mean * 30, 2),
+            'intervals': None,
+            'interval_level': None,
+            'confidence': 0,
+            'model': {'type': 'run_rate', 'reason': reason},
+            'generated_at': datetime.utcfromtimestamp(now).isoformat()
+        }
+
+    def _publish(self, forecast):
+        with self._lock:
+            self._forecast = forecast
+
+
+forecaster = RevenueForecaster()
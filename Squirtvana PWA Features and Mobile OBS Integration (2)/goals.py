@@ -0,0 +1,347 @@
+"""
+Goal Tracking for Squirtvana Pro Enhanced
+Persisted goals whose progress is updated incrementally from the event stream
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src.routes.event_store import event_store, EVENT_CODES, PLATFORMS, PLATFORM_CODES, REVENUE_TYPES, DAY_SECONDS
+from src.routes.rollups import rollups
+from src.routes.hyperloglog import HyperLogLog, viewer_sketches
+from src.routes.dashboard_push import dashboard_channel
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
+DB_FILENAME = 'goals.db'
+
+# Goal kind -> calendar period (UTC; weeks start on Monday) and unit
+GOAL_KINDS = {
+    'revenue': {'period': 'month', 'unit': 'revenue'},
+    'viewer_growth': {'period': 'week', 'unit': 'unique_viewers'},
+    'posts': {'period': 'week', 'unit': 'posts_per_week'},
+    'engagement': {'period': 'week', 'unit': 'engagement_rate_percentage'}
+}
+
+# Goal Configuration
+GOAL_CONFIG = {
+    'milestones': (25, 50, 75, 100),   # progress crossings pushed to the dashboard
+    'default_goals': [
+        {'name': 'monthly_revenue_goal', 'kind': 'revenue', 'target': 50000},
+        {'name': 'viewer_growth_goal', 'kind': 'viewer_growth', 'target': 500},
+        {'name': 'content_creation_goal', 'kind': 'posts', 'target': 20},
+        {'name': 'engagement_goal', 'kind': 'engagement', 'target': 90}
+    ]
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS goals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    target REAL NOT NULL,
+    platform INTEGER,
+    created_at TEXT NOT NULL,
+    period_start INTEGER NOT NULL,
+    total REAL NOT NULL DEFAULT 0,
+    previous REAL,
+    notified INTEGER NOT NULL DEFAULT 0,
+    viewers BLOB,
+    tippers BLOB
+);
+"""
+
+
+class GoalError(ValueError):
+    """Invalid goal definition"""
+
+
+def period_bounds(period, ts):
+    """(start, end) epoch seconds of the UTC calendar week or month containing ts"""
+    day = int(ts // DAY_SECONDS)
+    if period == 'week':
+        monday = day - (day + 3) % 7  # epoch day 0 was a Thursday
+        return monday * DAY_SECONDS, (monday + 7) * DAY_SECONDS
+    first = datetime.fromtimestamp(ts, timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    following = first.replace(year=first.year + 1, month=1) if first.month == 12 else first.replace(month=first.month + 1)
+    return int(first.timestamp()), int(following.timestamp())
+
+
+class Goal:
+    """One goal and its running state for the current period.
+
+    revenue and posts keep a running sum; viewer_growth keeps a
+    HyperLogLog of the period's viewers; engagement keeps one of all
+    viewers and one of tipping viewers. Nothing is recomputed from events.
+    """
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.name = row['name']
+        self.kind = row['kind']
+        self.target = row['target']
+        self.platform = row['platform']
+        self.created_at = row['created_at']
+        self.period = GOAL_KINDS[self.kind]['period']
+        self.period_start = row['period_start']
+        self.period_end = period_bounds(self.period, self.period_start)[1]
+        self.total = row['total']
+        self.previous = row['previous']
+        self.notified = row['notified']
+        self.viewers = HyperLogLog.from_bytes(row['viewers']) if row['viewers'] else HyperLogLog()
+        self.tippers = HyperLogLog.from_bytes(row['tippers']) if row['tippers'] else HyperLogLog()
+
+    @property
+    def current(self):
+        if self.kind == 'viewer_growth':
+            return self.viewers.count()
+        if self.kind == 'engagement':
+            viewers = self.viewers.count()
+            return round(min(self.tippers.count(), viewers) * 100.0 / viewers, 1) if viewers else 0.0
+        return round(self.total, 2)
+
+    @property
+    def progress(self):
+        return min(100, round(self.current * 100.0 / self.target)) if self.target else 0
+
+    def accumulate(self, columns, mask):
+        if not mask.any():
+            return
+        if self.kind == 'revenue':
+            revenue = np.isin(columns['type'], [EVENT_CODES[t] for t in REVENUE_TYPES])
+            self.total += float(columns['amount'][mask & revenue].sum())
+        elif self.kind == 'posts':
+            self.total += int(np.count_nonzero(mask & (columns['type'] == EVENT_CODES['content_post'])))
+        else:
+            known = mask & (columns['viewer'] != 0)
+            self.viewers.add(columns['viewer'][known])
+            if self.kind == 'engagement':
+                self.tippers.add(columns['viewer'][known & (columns['type'] == EVENT_CODES['tip'])])
+
+    def roll_over(self, ts):
+        """Start the period containing ts; the finished period's value becomes previous"""
+        start, end = period_bounds(self.period, ts)
+        # A period without any events in between finished at zero
+        self.previous = self.current if start == self.period_end else 0
+        self.period_start, self.period_end = start, end
+        self.total = 0.0
+        self.notified = 0
+        self.viewers = HyperLogLog()
+        self.tippers = HyperLogLog()
+
+    def to_dict(self, now=None):
+        now = now or time.time()
+        elapsed = max(now - self.period_start, 3600) / (self.period_end - self.period_start)
+        current = self.current
+        data = {
+            'id': self.id,
+            'name': self.name,
+            'kind': self.kind,
+            'type': GOAL_KINDS[self.kind]['unit'],
+            'platform': None if self.platform is None else PLATFORMS[self.platform],
+            'target': self.target,
+            'current': current,
+            'progress': self.progress,
+            'period': self.period,
+            'period_start': datetime.fromtimestamp(self.period_start, timezone.utc).isoformat(),
+            'days_remaining': max(0, int((self.period_end - now) // DAY_SECONDS)),
+            # Run rate to the period end; a rate goal is projected to stay where it is
+            'projected': current if self.kind == 'engagement' else round(current / min(elapsed, 1.0), 2)
+        }
+        if self.previous:
+            data['previous'] = self.previous
+            data['growth'] = round((current - self.previous) * 100.0 / self.previous, 1)
+        return data
+
+
+class GoalTracker:
+    """SQLite-persisted goals kept current by an event store listener.
+
+    Each accepted batch is folded, before the store flushes it, into every
+    goal whose period and platform it touches, and a goal rolls over to the
+    next calendar period as soon as an event (or a read) passes its period
+    end. A new goal starts from the rollups and viewer sketches for the
+    elapsed part of its period; ingestion is paused while it is seeded and
+    registered, so no batch is both in the rollups and folded in again.
+    """
+
+    def __init__(self, db_path, store=None, channel=None, config=None):
+        self.db_path = db_path
+        self.store = store
+        self.channel = channel
+        self.config = dict(GOAL_CONFIG, **(config or {}))
+        self._lock = threading.Lock()
+        self._conn = None
+        self._goals = None
+
+    def _connection(self):
+        """Open the database on first use; True when the default goals were seeded by this call"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._goals = {row['id']: Goal(row) for row in conn.execute('SELECT * FROM goals')}
+            if not self._goals and conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'goals'").fetchone() is None:
+                for definition in self.config['default_goals']:
+                    self._create(**definition)
+                return True
+        return False
+
+    @contextmanager
+    def _locked(self, seeding=False):
+        """The tracker lock, taken with ingestion paused when goals may be seeded from the rollups"""
+        if self.store is not None and (seeding or self._conn is None):
+            with self.store.ingestion_paused(), self._lock:
+                yield
+        else:
+            with self._lock:
+                yield
+
+    def add(self, columns):
+        """Fold one accepted event batch into the goals; runs with ingestion paused already"""
+        with self._lock:
+            # Default goals seeded just now read the rollups, which already hold this batch
+            if self._connection():
+                return
+            for goal in self._goals.values():
+                self._apply(goal, columns)
+
+    def _apply(self, goal, columns):
+        ts = columns['ts']
+        mask = np.ones(len(ts), dtype=bool) if goal.platform is None else columns['platform'] == goal.platform
+        # Late events from an already finished period are not counted
+        if not (mask & (ts >= goal.period_start)).any():
+            return
+        while True:
+            goal.accumulate(columns, mask & (ts >= goal.period_start) & (ts < goal.period_end))
+            self._notify(goal)
+            later = mask & (ts >= goal.period_end)
+            if not later.any():
+                break
+            goal.roll_over(float(ts[later].min()))
+        self._save(goal)
+
+    def _notify(self, goal):
+        reached = max([m for m in self.config['milestones'] if goal.progress >= m], default=0)
+        if reached <= goal.notified:
+            return
+        goal.notified = reached
+        if self.channel is not None:
+            self.channel.publish('goal_progress', {
+                'goal_id': goal.id,
+                'name': goal.name,
+                'milestone': reached,
+                'progress': goal.progress,
+                'current': goal.current,
+                'target': goal.target
+            })
+
+    def _save(self, goal):
+        with self._conn:
+            self._conn.execute(
+                'UPDATE goals SET period_start = ?, total = ?, previous = ?, notified = ?, viewers = ?, tippers = ? '
+                'WHERE id = ?',
+                (goal.period_start, goal.total, goal.previous, goal.notified,
+                 goal.viewers.to_bytes(), goal.tippers.to_bytes(), goal.id)
+            )
+
+    def _create(self, name, kind, target, platform=None):
+        now = time.time()
+        period_start, _ = period_bounds(GOAL_KINDS[kind]['period'], now)
+        with self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO goals (name, kind, target, platform, created_at, period_start) VALUES (?, ?, ?, ?, ?, ?)',
+                (name, kind, target, platform, datetime.utcnow().isoformat(), period_start)
+            )
+        row = self._conn.execute('SELECT * FROM goals WHERE id = ?', (cursor.lastrowid,)).fetchone()
+        goal = Goal(row)
+        self._seed(goal, now)
+        goal.notified = max([m for m in self.config['milestones'] if goal.progress >= m], default=0)
+        self._save(goal)
+        self._goals[goal.id] = goal
+        return goal
+
+    def _seed(self, goal, now):
+        """Starting state for the elapsed part of the period from the rollups and sketches"""
+        start, end = goal.period_start, now
+        if goal.kind in ('revenue', 'posts'):
+            types = [EVENT_CODES[t] for t in REVENUE_TYPES] if goal.kind == 'revenue' else [EVENT_CODES['content_post']]
+            rows = rollups.query(start, end, platform=goal.platform, types=types)
+            goal.total = float(rows[0]['amount'] if goal.kind == 'revenue' else rows[0]['events']) if rows else 0.0
+        else:
+            goal.viewers = viewer_sketches.merged(start, end, goal.platform)
+            if goal.kind == 'engagement':
+                goal.tippers = viewer_sketches.merged(start, end, goal.platform, [EVENT_CODES['tip']])
+
+    def create(self, name, kind, target, platform=None):
+        if kind not in GOAL_KINDS:
+            raise GoalError(f"Unknown goal kind '{kind}'; use one of {', '.join(GOAL_KINDS)}")
+        try:
+            target = float(target)
+        except (TypeError, ValueError):
+            raise GoalError("'target' must be a number")
+        if target <= 0:
+            raise GoalError("'target' must be positive")
+        if platform not in (None, 'all') and platform not in PLATFORM_CODES:
+            raise GoalError(f"Unknown platform '{platform}'")
+        code = None if platform in (None, 'all') else PLATFORM_CODES[platform]
+        with self._locked(seeding=True):
+            self._connection()
+            name = name or f"{kind}_goal"
+            if any(goal.name == name for goal in self._goals.values()):
+                raise GoalError(f"A goal named '{name}' already exists")
+            return self._create(name, kind, target, code).to_dict()
+
+    def update_target(self, goal_id, target):
+        try:
+            target = float(target)
+        except (TypeError, ValueError):
+            raise GoalError("'target' must be a number")
+        if target <= 0:
+            raise GoalError("'target' must be positive")
+        with self._locked():
+            self._connection()
+            goal = self._goals.get(goal_id)
+            if goal is None:
+                return None
+            goal.target = target
+            goal.notified = max([m for m in self.config['milestones'] if goal.progress >= m], default=0)
+            with self._conn:
+                self._conn.execute('UPDATE goals SET target = ?, notified = ? WHERE id = ?',
+                                   (target, goal.notified, goal_id))
+            return goal.to_dict()
+
+    def delete(self, goal_id):
+        with self._locked():
+            self._connection()
+            if self._goals.pop(goal_id, None) is None:
+                return False
+            with self._conn:
+                self._conn.execute('DELETE FROM goals WHERE id = ?', (goal_id,))
+            return True
+
+    def snapshot(self, now=None):
+        """Every goal as a dict keyed by name, rolling over goals whose period has ended"""
+        now = now or time.time()
+        with self._locked():
+            self._connection()
+            for goal in self._goals.values():
+                if now >= goal.period_end:
+                    goal.roll_over(now)
+                    self._save(goal)
+            return {goal.name: goal.to_dict(now) for goal in self._goals.values()}
+
+
+goal_tracker = GoalTracker(os.path.join(DEFAULT_DB_DIR, DB_FILENAME), store=event_store, channel=dashboard_channel)
+event_store.add_listener(goal_tracker.add)
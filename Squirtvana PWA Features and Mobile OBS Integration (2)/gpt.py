@@ -1,27 +1,52 @@
-import os
+import time
+import hashlib
 from flask import Blueprint, request, jsonify
-from openai import OpenAI
-from dotenv import load_dotenv
-
-load_dotenv()
 
 gpt_bp = Blueprint('gpt', __name__)
 
-# Initialize OpenRouter client
-try:
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=os.getenv("OPENROUTER_KEY"),
+from src.routes.audio import start_audio_prefetch
+from src.routes.providers import get_openrouter_client, cached_status
+from src.routes.llm_accounting import choose_model, record_llm_call
+from src.routes.model_router import router
+from src.routes.singleflight import SingleFlight
+
+GPT_MODEL = "anthropic/claude-3.5-sonnet"
+gpt_flight = SingleFlight('gpt')
+
+def complete_chat(messages, max_tokens, temperature, template='dirtytalk'):
+    """Run one chat completion against OpenRouter and return its text"""
+    # Over the hourly token budget or latency SLO this drops to the cheaper model;
+    # the router then hedges/fails over to backups when that model is slow or down
+    preferred, _ = choose_model(GPT_MODEL)
+    text, _ = router.call(preferred, complete_chat_with_model, messages, max_tokens, temperature, template)
+    return text
+
+def complete_chat_with_model(model, messages, max_tokens, temperature, template):
+    """One chat completion against a specific model, recorded for accounting"""
+    started = time.monotonic()
+    try:
+        completion = get_openrouter_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+    except Exception:
+        record_llm_call(model, template, None, (time.monotonic() - started) * 1000, ok=False)
+        raise
+    
+    text = completion.choices[0].message.content
+    record_llm_call(
+        model, template, completion.usage, (time.monotonic() - started) * 1000,
+        prompt_text=''.join(m['content'] for m in messages), completion_text=text
     )
-except Exception as e:
-    print(f"Warning: OpenAI client initialization failed: {e}")
-    client = None
+    return text
 
 @gpt_bp.route('/gpt/generate', methods=['POST'])
 def generate_dirtytalk():
     """Generate DirtyTalk content using GPT"""
     try:
-        if not client:
+        if not get_openrouter_client():
             return jsonify({'error': 'GPT service not available'}), 500
             
         data = request.get_json()
@@ -35,53 +60,59 @@ def generate_dirtytalk():
         Create passionate, sensual responses that are direct and arousing. Use explicit language and be creative with scenarios.
         Keep responses between 50-200 words. Focus on creating immersive, first-person experiences."""
         
-        completion = client.chat.completions.create(
-            model="anthropic/claude-3.5-sonnet",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=300,
-            temperature=0.8
-        )
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
         
-        generated_text = completion.choices[0].message.content
+        # Double-taps and several phones sending the same prompt share one completion
+        flight_key = hashlib.sha256(f"{GPT_MODEL}|{system_prompt}|{user_prompt}".encode('utf-8')).hexdigest()
+        generated_text, shared = gpt_flight.do(flight_key, complete_chat, messages, 300, 0.8)
         
-        return jsonify({
+        result = {
             'success': True,
             'generated_text': generated_text,
-            'prompt': user_prompt
-        })
+            'prompt': user_prompt,
+            'deduplicated': shared
+        }
+        
+        # Speculatively synthesize the voice line so /audio/generate is a cache hit
+        if data.get('prefetch_audio'):
+            result['audio_prefetch_id'] = start_audio_prefetch(generated_text)
+        
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def check_openrouter():
+    """Health probe via the models list, which bills no tokens"""
+    client = get_openrouter_client()
+    if not client:
+        return {
+            'status': 'error',
+            'error': 'Client not initialized'
+        }, 500
+    
+    client.models.list()
+    
+    return {
+        'status': 'active',
+        'model': GPT_MODEL,
+        'connection': 'ok'
+    }, 200
+
 @gpt_bp.route('/gpt/status', methods=['GET'])
 def gpt_status():
-    """Check GPT service status"""
-    try:
-        if not client:
-            return jsonify({
-                'status': 'error',
-                'error': 'Client not initialized'
-            }), 500
-            
-        # Test API connection
-        test_completion = client.chat.completions.create(
-            model="anthropic/claude-3.5-sonnet",
-            messages=[{"role": "user", "content": "Test"}],
-            max_tokens=10
-        )
-        
-        return jsonify({
-            'status': 'active',
-            'model': 'anthropic/claude-3.5-sonnet',
-            'connection': 'ok'
-        })
-        
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    """Check GPT service status (cached, see providers.cached_status)"""
+    payload, http_status = cached_status('openrouter', check_openrouter)
+    return jsonify(payload), http_status
 
+@gpt_bp.route('/gpt/metrics', methods=['GET'])
+def gpt_metrics():
+    """Request deduplication and model routing counters for GPT calls"""
+    return jsonify({
+        'success': True,
+        'dedup': gpt_flight.stats(),
+        'router': router.stats()
+    })
@@ -0,0 +1,124 @@
+"""
+Unique Viewer Sketches for Squirtvana Pro Enhanced
+Mergeable HyperLogLog sketches per hour, day, platform and event type
+"""
+
+import os
+import zlib
+
+import numpy as np
+
+from src.routes.event_store import event_store
+from src.routes.sketch_store import SketchStore
+
+DEFAULT_DB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
+DB_FILENAME = 'viewer_sketches.db'
+
+# 2^14 one-byte registers (16 KB uncompressed per sketch).
+# Relative standard error is 1.04 / sqrt(2^14) = 0.81%: about 95% of
+# estimates fall within +-1.6% and 99% within +-2.4% of the true count.
+# Merging is lossless, so the same bound holds for any union of sketches
+# (a month across all platforms is as accurate as a single hour).
+HLL_PRECISION = 14
+HLL_STANDARD_ERROR = 1.04 / np.sqrt(2 ** HLL_PRECISION)
+
+# Sketch Configuration (None keeps sketches forever)
+SKETCH_CONFIG = {
+    'retention_days': {'hour': 35, 'day': None},
+    'cached_sketches': 256
+}
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter over 64-bit hashes.
+
+    The top `precision` bits of a hash pick a register; the register keeps
+    the highest rank (leading zeros + 1) seen in the remaining bits.
+    Updates are vectorized over arrays of hashes.
+    """
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    @staticmethod
+    def positions(hashes, precision=HLL_PRECISION):
+        """(register index, rank) arrays for uint64 hashes"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        width = 64 - precision
+        index = (hashes >> np.uint64(width)).astype(np.int64)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # frexp's exponent is the bit length; exact because width < 53
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        return index, (width - bit_length + 1).astype(np.uint8)
+
+    def add_positions(self, index, rank):
+        np.maximum.at(self.registers, index, rank)
+
+    def add(self, hashes):
+        self.add_positions(*self.positions(hashes, self.precision))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return zlib.compress(self.registers.tobytes(), 1)
+
+    @classmethod
+    def from_bytes(cls, data, precision=HLL_PRECISION):
+        return cls(precision, np.frombuffer(zlib.decompress(data), dtype=np.uint8).copy())
+
+
+class ViewerSketches(SketchStore):
+    """One HyperLogLog per (hour or day, platform, event type), fed by the event store.
+
+    Sketches are stored zlib-compressed in SQLite; sparse hours compress to
+    a few hundred bytes. A period query runs in one register array of
+    memory whatever the period or number of viewers.
+    """
+
+    TABLE = 'viewer_sketches'
+    KIND_COLUMN = 'type'
+    DATA_COLUMN = 'registers'
+    sketch_class = HyperLogLog
+    default_config = SKETCH_CONFIG
+
+    def add(self, columns):
+        """Fold the identified viewers of one event batch into the sketches"""
+        if not columns['viewer'].any():
+            return
+        super().add(columns)
+
+    def _samples(self, columns):
+        known = columns['viewer'] != 0
+        if known.any():
+            yield (columns['ts'][known], columns['platform'][known], columns['type'][known],
+                   HyperLogLog.positions(columns['viewer'][known]))
+
+    @staticmethod
+    def _fold(sketch, index, rank):
+        sketch.add_positions(index, rank)
+
+    def merged(self, start, end, platform=None, types=None):
+        """Union sketch of every viewer seen in [start, end), optionally by platform and event types"""
+        return self._merged(start, end, platform, types)
+
+    def count(self, start, end, platform=None, types=None):
+        """Estimated distinct viewers in [start, end); see HLL_STANDARD_ERROR"""
+        return self.merged(start, end, platform, types).count()
+
+
+viewer_sketches = ViewerSketches(os.path.join(DEFAULT_DB_DIR, DB_FILENAME), store=event_store)
+event_store.add_listener(viewer_sketches.add)
@@ -0,0 +1,276 @@
+"""
+Image Pipeline for Squirtvana Pro Enhanced
+Local enhance/resize/thumbnail/convert/EXIF-strip in a process pool, with content-addressed outputs
+"""
+
+import os
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.routes.singleflight import SingleFlight
+from src.routes.providers import env
+
+logger = logging.getLogger(__name__)
+
+# Image Pipeline Configuration
+IMAGE_CONFIG = {
+    'output_dir': os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'images'),
+    'workers': int(env('IMAGE_PROCESS_WORKERS', '2')),
+    'max_upload_bytes': int(env('IMAGE_MAX_UPLOAD_MB', '25')) * 1024 * 1024,
+    'max_pixels': 50_000_000,       # decompression-bomb guard
+    'resize_size': (1080, 1080),    # bounding box for 'resize' without width/height
+    'thumbnail_size': (320, 320),
+    'quality': 90
+}
+
+OPERATIONS = ('enhance', 'resize', 'thumbnail', 'convert', 'strip_exif')
+
+# format option -> (Pillow format, file extension)
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg'),
+    'png': ('PNG', 'png'),
+    'webp': ('WEBP', 'webp')
+}
+PILLOW_FORMATS = {pil: name for name, (pil, _) in FORMATS.items()}
+
+# Bump when an operation's output changes so old cache entries are not reused
+PIPELINE_VERSION = 2
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_DIMENSION = 8192
+EXIF_ORIENTATION = 0x0112
+# image.info entries that describe pixels rather than the photo (kept on save)
+KEPT_INFO = ('icc_profile', 'transparency', 'dpi')
+
+
+class ImagePipelineError(ValueError):
+    """Unsupported operation/options or an unreadable image"""
+
+
+def normalize_options(operation, options):
+    """Validate the operation and coerce its options; raises ImagePipelineError"""
+    if operation not in OPERATIONS:
+        raise ImagePipelineError(f"Unsupported processing type '{operation}' (use one of {', '.join(OPERATIONS)})")
+    options = options or {}
+    normalized = {}
+
+    for name in ('width', 'height'):
+        if options.get(name) not in (None, ''):
+            try:
+                value = int(options[name])
+            except (TypeError, ValueError):
+                raise ImagePipelineError(f"'{name}' must be an integer")
+            if not 16 <= value <= MAX_DIMENSION:
+                raise ImagePipelineError(f"'{name}' must be between 16 and {MAX_DIMENSION}")
+            normalized[name] = value
+
+    if options.get('format') not in (None, ''):
+        fmt = str(options['format']).lower().replace('jpg', 'jpeg')
+        if fmt not in FORMATS:
+            raise ImagePipelineError(f"Unsupported format '{options['format']}' (use one of {', '.join(FORMATS)})")
+        normalized['format'] = fmt
+    elif operation == 'convert':
+        normalized['format'] = 'webp'
+
+    if options.get('quality') not in (None, ''):
+        try:
+            quality = int(options['quality'])
+        except (TypeError, ValueError):
+            raise ImagePipelineError("'quality' must be an integer")
+        normalized['quality'] = min(100, max(1, quality))
+
+    return normalized
+
+
+def save_upload(stream, upload_dir=None, max_bytes=None):
+    """Copy an upload stream to a temp file in chunks, hashing it on the way.
+
+    Returns (path, sha256 hex, size). The file is never held in memory; an
+    upload over max_bytes is removed and rejected.
+    """
+    max_bytes = max_bytes or IMAGE_CONFIG['max_upload_bytes']
+    fd, path = tempfile.mkstemp(prefix='ai_upload_', dir=upload_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b''):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ImagePipelineError(f"Image exceeds {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                f.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    if size == 0:
+        os.remove(path)
+        raise ImagePipelineError('Empty image upload')
+    return path, digest.hexdigest(), size
+
+
+def output_key(source_digest, operation, options):
+    """Content address of an output: source bytes + operation + options"""
+    spec = f"{PIPELINE_VERSION}|{source_digest}|{operation}|{sorted(options.items())}"
+    return hashlib.sha256(spec.encode('utf-8')).hexdigest()
+
+
+def find_cached_output(key, output_dir=None):
+    """Filename of an existing output for key, if any"""
+    output_dir = output_dir or IMAGE_CONFIG['output_dir']
+    for _, extension in FORMATS.values():
+        filename = f"img_{key}.{extension}"
+        if os.path.exists(os.path.join(output_dir, filename)):
+            return filename
+    return None
+
+
+def is_pipeline_output(filename):
+    """Pipeline outputs are named after their content key and never change"""
+    return filename.startswith('img_') and filename.rsplit('.', 1)[-1] in {ext for _, ext in FORMATS.values()}
+
+
+def _apply_operation(image, operation, options):
+    from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+    if operation == 'enhance':
+        image = ImageOps.autocontrast(image.convert('RGB') if image.mode not in ('RGB', 'L') else image, cutoff=1)
+        image = ImageEnhance.Color(image).enhance(1.15)
+        return image.filter(ImageFilter.UnsharpMask(radius=2, percent=80, threshold=3))
+    if operation == 'resize':
+        box = (options.get('width', IMAGE_CONFIG['resize_size'][0]),
+               options.get('height', IMAGE_CONFIG['resize_size'][1]))
+        if image.width <= box[0] and image.height <= box[1]:
+            return image  # only ever shrink; upscaling adds bytes and blur
+        return ImageOps.contain(image, box, Image.Resampling.LANCZOS)
+    if operation == 'thumbnail':
+        size = (options.get('width', IMAGE_CONFIG['thumbnail_size'][0]),
+                options.get('height', IMAGE_CONFIG['thumbnail_size'][1]))
+        return ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+    # convert and strip_exif only re-encode; metadata is never carried over
+    return image
+
+
+def process_image_file(source_path, operation, options, key, output_dir=None):
+    """Run one operation and write the result; executed inside the process pool.
+
+    EXIF orientation is applied to the pixels first and the output is saved
+    without EXIF, XMP or comments, so every operation strips metadata.
+    Returns a dict describing the output.
+    """
+    from PIL import Image, ImageOps
+
+    output_dir = output_dir or IMAGE_CONFIG['output_dir']
+    Image.MAX_IMAGE_PIXELS = IMAGE_CONFIG['max_pixels']
+    try:
+        source = Image.open(source_path)
+        source_format = source.format
+        orientation = source.getexif().get(EXIF_ORIENTATION, 1)
+        if operation == 'thumbnail':
+            # Let the JPEG decoder downscale by 1/2..1/8 before any filtering
+            edge = 2 * max(options.get('width', IMAGE_CONFIG['thumbnail_size'][0]),
+                           options.get('height', IMAGE_CONFIG['thumbnail_size'][1]))
+            source.draft('RGB', (edge, edge))
+        oriented = ImageOps.exif_transpose(source) if orientation != 1 else source
+        image = _apply_operation(oriented, operation, options)
+        image.load()
+    except (Image.DecompressionBombError, Image.UnidentifiedImageError, OSError) as e:
+        raise ImagePipelineError(f"Cannot process image: {e}")
+    image.info = {k: v for k, v in image.info.items() if k in KEPT_INFO}
+
+    fmt = options.get('format') or PILLOW_FORMATS.get(source_format, 'png')
+    pil_format, extension = FORMATS[fmt]
+    save_args = {}
+    if pil_format == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        if image is source and source_format == 'JPEG' and 'quality' not in options:
+            # Same pixels, same quantisation tables: no generation loss
+            save_args = {'quality': 'keep', 'subsampling': 'keep'}
+        else:
+            save_args = {'quality': options.get('quality', IMAGE_CONFIG['quality']), 'optimize': True}
+    elif pil_format == 'WEBP':
+        save_args = {'quality': options.get('quality', IMAGE_CONFIG['quality']), 'method': 4}
+    elif pil_format == 'PNG':
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+            image = image.convert('RGBA')
+        save_args = {'optimize': False}
+
+    os.makedirs(output_dir, exist_ok=True)
+    filename = f"img_{key}.{extension}"
+    output_path = os.path.join(output_dir, filename)
+    part_path = f"{output_path}.{uuid.uuid4().hex}.part"
+    try:
+        image.save(part_path, pil_format, **save_args)
+        os.replace(part_path, output_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+    return {
+        'filename': filename,
+        'format': fmt,
+        'width': image.width,
+        'height': image.height,
+        'bytes': os.path.getsize(output_path)
+    }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+image_flight = SingleFlight('image')
+
+
+def get_process_pool():
+    """Shared process pool, started on first use.
+
+    Workers are spawned rather than forked: the API process runs threads
+    (job workers, SSE streams) and forking those is not safe.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=IMAGE_CONFIG['workers'],
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _pool
+
+
+def _reset_pool(broken):
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+
+
+def _run_in_pool(source_path, operation, options, key):
+    pool = get_process_pool()
+    try:
+        return pool.submit(process_image_file, source_path, operation, options, key).result()
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a huge image); start a fresh pool next time
+        logger.error("Image process pool broke; restarting on next use")
+        _reset_pool(pool)
+        raise
+
+
+def run_pipeline(source_path, source_digest, operation, options):
+    """Process an uploaded image, reusing an existing output for the same input.
+
+    Identical requests in flight at once share one pool task.
+    """
+    options = normalize_options(operation, options)
+    key = output_key(source_digest, operation, options)
+    cached = find_cached_output(key)
+    if cached is not None:
+        return {'filename': cached, 'cached': True}
+
+    result, shared = image_flight.do(key, _run_in_pool, source_path, operation, options, key)
+    return dict(result, cached=shared)
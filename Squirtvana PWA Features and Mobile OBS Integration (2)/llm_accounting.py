@@ -0,0 +1,206 @@
+"""
+LLM Accounting for Squirtvana PWA
+Token and latency accounting per model and template, with hourly budgets and model fallback
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from src.routes.providers import env
+
+DEFAULT_DB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
+DB_FILENAME = 'llm_usage.db'
+
+# Budget Configuration
+BUDGET_CONFIG = {
+    'hourly_token_budget': int(env('LLM_HOURLY_TOKEN_BUDGET', '200000')),
+    'latency_slo_ms': float(env('LLM_LATENCY_SLO_MS', '8000')),
+    'fallback_model': 'anthropic/claude-3-haiku',
+    'retention_days': 90
+}
+LATENCY_WINDOW = 100
+MIN_LATENCY_SAMPLES = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_usage_hourly (
+    hour TEXT NOT NULL,
+    model TEXT NOT NULL,
+    template TEXT NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_ms_sum REAL NOT NULL DEFAULT 0,
+    latency_ms_max REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, model, template)
+) WITHOUT ROWID;
+"""
+
+UPSERT = """
+INSERT INTO llm_usage_hourly
+    (hour, model, template, calls, errors, prompt_tokens, completion_tokens, latency_ms_sum, latency_ms_max)
+VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)
+ON CONFLICT (hour, model, template) DO UPDATE SET
+    calls = calls + 1,
+    errors = errors + excluded.errors,
+    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+    completion_tokens = completion_tokens + excluded.completion_tokens,
+    latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum,
+    latency_ms_max = MAX(latency_ms_max, excluded.latency_ms_max)
+"""
+
+
+def _hour_bucket(ts=None):
+    return datetime.utcfromtimestamp(ts or time.time()).strftime('%Y-%m-%dT%H:00')
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) when the API reports no usage"""
+    return max(1, len(text or '') // 4)
+
+
+class LLMAccounting:
+    """Hourly usage rollup in SQLite plus in-memory state for budget decisions.
+
+    One row per (hour, model, template) is upserted per call, so the table
+    stays small no matter how many calls a show makes. The current hour's
+    token total and recent latencies are kept in memory so choose_model()
+    only reads the database once per hour, to seed the total with the calls
+    recorded before a restart.
+    """
+
+    def __init__(self, db_path, config=None):
+        self.db_path = db_path
+        self.config = dict(BUDGET_CONFIG, **(config or {}))
+        self._lock = threading.Lock()
+        self._conn = None
+        self._current_hour = None
+        self._hour_tokens = 0
+        self._latencies = {}
+        self._fallbacks = 0
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def record(self, model, template, prompt_tokens, completion_tokens, latency_ms, ok=True):
+        """Add one call to the hourly rollup and the in-memory budget state"""
+        hour = _hour_bucket()
+        with self._lock:
+            self._roll_hour(hour)
+            self._hour_tokens += prompt_tokens + completion_tokens
+            self._latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append(latency_ms)
+
+            conn = self._connection()
+            with conn:
+                conn.execute(UPSERT, (
+                    hour, model, template or 'none', 0 if ok else 1,
+                    prompt_tokens, completion_tokens, latency_ms, latency_ms
+                ))
+
+    def _roll_hour(self, hour):
+        if hour == self._current_hour:
+            return
+        self._current_hour = hour
+        self._hour_tokens = self._connection().execute(
+            'SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM llm_usage_hourly WHERE hour = ?',
+            (hour,)
+        ).fetchone()[0]
+        self._prune()
+
+    def _prune(self):
+        cutoff = (datetime.utcnow() - timedelta(days=self.config['retention_days'])).strftime('%Y-%m-%dT%H:00')
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM llm_usage_hourly WHERE hour < ?', (cutoff,))
+
+    def latency_p95(self, model):
+        with self._lock:
+            samples = sorted(self._latencies.get(model, ()))
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+    def hour_tokens(self):
+        with self._lock:
+            self._roll_hour(_hour_bucket())
+            return self._hour_tokens
+
+    def choose_model(self, preferred):
+        """Return (model, reason); falls back when over budget or over the latency SLO"""
+        fallback = self.config['fallback_model']
+        if preferred == fallback:
+            return preferred, None
+
+        reason = None
+        if self.hour_tokens() >= self.config['hourly_token_budget']:
+            reason = 'hourly_token_budget'
+        else:
+            p95 = self.latency_p95(preferred)
+            if p95 is not None and p95 > self.config['latency_slo_ms']:
+                reason = 'latency_slo'
+
+        if reason is None:
+            return preferred, None
+        with self._lock:
+            self._fallbacks += 1
+        return fallback, reason
+
+    def summary(self, hours=24):
+        """Aggregates per model and template over the last N hours"""
+        cutoff = _hour_bucket(time.time() - hours * 3600)
+        with self._lock:
+            rows = self._connection().execute(
+                '''SELECT model, template, SUM(calls) AS calls, SUM(errors) AS errors,
+                          SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens,
+                          SUM(latency_ms_sum) / SUM(calls) AS avg_latency_ms, MAX(latency_ms_max) AS max_latency_ms
+                   FROM llm_usage_hourly WHERE hour >= ?
+                   GROUP BY model, template ORDER BY model, template''',
+                (cutoff,)
+            ).fetchall()
+        return {
+            'hours': hours,
+            'usage': [dict(row) for row in rows],
+            'budget': {
+                'hourly_token_budget': self.config['hourly_token_budget'],
+                'tokens_this_hour': self.hour_tokens(),
+                'latency_slo_ms': self.config['latency_slo_ms'],
+                'fallback_model': self.config['fallback_model'],
+                'fallbacks': self._fallbacks,
+                'latency_p95_ms': {model: self.latency_p95(model) for model in list(self._latencies)}
+            }
+        }
+
+
+accounting = LLMAccounting(os.path.join(DEFAULT_DB_DIR, DB_FILENAME))
+
+
+def choose_model(preferred):
+    return accounting.choose_model(preferred)
+
+
+def record_llm_call(model, template, usage, latency_ms, ok=True, prompt_text='', completion_text=''):
+    """Record a call from an OpenAI-style usage object/dict, estimating if absent"""
+    if usage is not None and not isinstance(usage, dict):
+        usage = {
+            'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+            'completion_tokens': getattr(usage, 'completion_tokens', None)
+        }
+    usage = usage or {}
+    accounting.record(
+        model,
+        template,
+        usage.get('prompt_tokens') or (estimate_tokens(prompt_text) if ok else 0),
+        usage.get('completion_tokens') or (estimate_tokens(completion_text) if ok else 0),
+        latency_ms,
+        ok
+    )
@@ -0,0 +1,425 @@
+"""
+Media Metadata Scrubber for Squirtvana Pro Enhanced
+Streaming removal of GPS, device and editing metadata from JPEG, PNG and MP4/MOV files.
+Only container segments are touched; compressed image and video data is copied verbatim.
+"""
+
+import os
+import uuid
+import struct
+import hashlib
+import tempfile
+
+from src.routes.providers import env
+
+# Scrubber Configuration
+MEDIA_ROOT = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'media')
+SCRUB_CONFIG = {
+    'media_dir': os.path.join(MEDIA_ROOT, 'scrubbed'),
+    # Same filesystem as media_dir so finished files are renamed, never copied
+    'upload_dir': os.path.join(MEDIA_ROOT, 'incoming'),
+    'max_upload_bytes': int(env('MEDIA_MAX_UPLOAD_GB', '8')) * 1024 ** 3,
+    'chunk_size': 1024 * 1024
+}
+
+FORMAT_EXTENSIONS = {'jpeg': 'jpg', 'png': 'png', 'mp4': 'mp4'}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Ancillary chunks that carry metadata rather than pixels
+PNG_METADATA_CHUNKS = {b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+
+# APPn segments that only describe how to decode the pixels
+JPEG_KEEP_APP = {
+    0xE0: (b'JFIF\x00',),
+    0xE2: (b'ICC_PROFILE\x00',),
+    0xEE: (b'Adobe',)
+}
+JPEG_STANDALONE = {0x01} | set(range(0xD0, 0xD8))
+
+MP4_CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts', b'dinf', b'moof', b'traf'}
+MP4_METADATA_BOXES = {b'udta', b'meta'}
+MP4_TIME_BOXES = {b'mvhd', b'tkhd', b'mdhd'}
+XMP_UUID = bytes.fromhex('BE7ACFCB97A942E89C71999491E3AFAC')
+# ISO-BMFF brands of HEIF/HEIC/AVIF still images: their top-level meta box holds the image items
+HEIF_BRANDS = {b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1', b'avif', b'avis'}
+# Only metadata payloads up to this size are inspected for what they contained
+INSPECT_LIMIT = 16 * 1024 * 1024
+
+EXIF_GPS_IFD = 0x8825
+EXIF_ORIENTATION = 0x0112
+EXIF_DEVICE_TAGS = {0x010F, 0x0110, 0xA431, 0xA434}  # make, model, body serial, lens model
+MP4_GPS_MARKERS = (b'\xa9xyz', b'location.ISO6709')
+MP4_DEVICE_MARKERS = (b'\xa9mak', b'\xa9mod', b'quicktime.make', b'quicktime.model')
+
+
+class ScrubError(ValueError):
+    """Unsupported or malformed media file"""
+
+
+def detect_format(path):
+    """'jpeg', 'png', 'mp4' or 'heif' from the file's magic bytes, else None"""
+    with open(path, 'rb') as f:
+        head = f.read(256)
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(PNG_SIGNATURE):
+        return 'png'
+    if head[4:8] == b'ftyp':
+        # Major brand, then the compatible brands after the minor version
+        size = struct.unpack('>I', head[:4])[0]
+        brands = {head[8:12]} | {head[i:i + 4] for i in range(16, min(size, len(head)) - 3, 4)}
+        return 'heif' if brands & HEIF_BRANDS else 'mp4'
+    if head[4:8] in (b'moov', b'mdat', b'free', b'wide', b'skip'):
+        return 'mp4'
+    return None
+
+
+def save_stream(stream, upload_dir=None, max_bytes=None, chunk_size=None):
+    """Copy an upload stream to disk chunk-wise; returns (path, sha256 hex, size)"""
+    max_bytes = max_bytes or SCRUB_CONFIG['max_upload_bytes']
+    chunk_size = chunk_size or SCRUB_CONFIG['chunk_size']
+    upload_dir = upload_dir or SCRUB_CONFIG['upload_dir']
+    os.makedirs(upload_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix='media_upload_', dir=upload_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ScrubError(f"Upload exceeds {max_bytes // 1024 ** 3} GB")
+                digest.update(chunk)
+                f.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    if size == 0:
+        os.remove(path)
+        raise ScrubError('Empty upload')
+    return path, digest.hexdigest(), size
+
+
+def _ifd0_entries(tiff):
+    """Byte order and (tag, type, count, value field) entries of a TIFF/Exif block's IFD0"""
+    if len(tiff) < 8 or tiff[:2] not in (b'II', b'MM'):
+        return None, []
+    order = '<' if tiff[:2] == b'II' else '>'
+    entries = []
+    try:
+        ifd = struct.unpack(order + 'I', tiff[4:8])[0]
+        count = struct.unpack(order + 'H', tiff[ifd:ifd + 2])[0]
+        for i in range(count):
+            entry = ifd + 2 + 12 * i
+            entries.append(struct.unpack(order + 'HHI', tiff[entry:entry + 8]) + (tiff[entry + 8:entry + 12],))
+    except struct.error:
+        pass
+    return order, entries
+
+
+def exif_findings(tiff):
+    """{'gps', 'device'} subset present in a TIFF/Exif block (IFD0 only)"""
+    found = set()
+    for tag, _, _, _ in _ifd0_entries(tiff)[1]:
+        if tag == EXIF_GPS_IFD:
+            found.add('gps')
+        elif tag in EXIF_DEVICE_TAGS:
+            found.add('device')
+    return found
+
+
+def exif_orientation(tiff):
+    """Orientation tag (1-8) of a TIFF/Exif block, or None"""
+    order, entries = _ifd0_entries(tiff)
+    for tag, value_type, count, value in entries:
+        if tag == EXIF_ORIENTATION and value_type == 3 and count == 1:
+            orientation = struct.unpack(order + 'H', value[:2])[0]
+            return orientation if 1 <= orientation <= 8 else None
+    return None
+
+
+def _orientation_app1(orientation):
+    """APP1 Exif segment holding nothing but the Orientation tag"""
+    tiff = b'MM\x00\x2a' + struct.pack('>IHHHIHHI', 8, 1, EXIF_ORIENTATION, 3, 1, orientation, 0, 0)
+    payload = b'Exif\x00\x00' + tiff
+    return b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+
+
+class _Reader:
+    """Buffered reader over a file with exact reads, skips and streaming copies"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = b''
+        self.pos = 0
+        self.offset = 0  # file offset of buffer[0]
+
+    def tell(self):
+        return self.offset + self.pos
+
+    def _fill(self, n):
+        """Make at least n unread bytes available; False at end of file"""
+        while len(self.buffer) - self.pos < n:
+            chunk = self.f.read(max(self.chunk_size, n))
+            if not chunk:
+                return False
+            self.offset += self.pos
+            self.buffer = self.buffer[self.pos:] + chunk
+            self.pos = 0
+        return True
+
+    def read(self, n):
+        if not self._fill(n):
+            raise ScrubError('Unexpected end of file')
+        data = self.buffer[self.pos:self.pos + n]
+        self.pos += n
+        return data
+
+    def peek(self, n):
+        self._fill(n)
+        return self.buffer[self.pos:self.pos + n]
+
+    def copy(self, n, dst):
+        """Stream n bytes to dst (None discards them) without holding them all"""
+        while n > 0:
+            if not self._fill(1):
+                raise ScrubError('Unexpected end of file')
+            take = min(n, len(self.buffer) - self.pos)
+            if dst is not None:
+                dst.write(self.buffer[self.pos:self.pos + take])
+            self.pos += take
+            n -= take
+
+    def copy_entropy(self, dst):
+        """Copy JPEG entropy-coded data up to the next real marker; returns that marker"""
+        while True:
+            if not self._fill(2):
+                raise ScrubError('Unexpected end of file in scan data')
+            ff = self.buffer.find(b'\xff', self.pos)
+            if ff == -1 or ff == len(self.buffer) - 1:
+                # Keep a trailing 0xFF in the buffer so its successor can be checked
+                end = len(self.buffer) if ff == -1 else ff
+                dst.write(self.buffer[self.pos:end])
+                self.pos = end
+                self._fill(len(self.buffer) - self.pos + 1)
+                continue
+            dst.write(self.buffer[self.pos:ff])
+            self.pos = ff
+            code = self.buffer[ff + 1]
+            if code == 0x00 or code in JPEG_STANDALONE:
+                # Stuffed byte or restart marker: part of the scan
+                dst.write(self.buffer[ff:ff + 2])
+                self.pos = ff + 2
+            elif code == 0xFF:
+                # Fill byte before a marker
+                self.pos = ff + 1
+            else:
+                self.pos = ff + 2
+                return code
+
+
+def _jpeg_segment_name(marker, payload_head):
+    if marker == 0xFE:
+        return 'COM'
+    label = payload_head.split(b'\x00', 1)[0][:20].decode('ascii', 'replace')
+    return f"APP{marker - 0xE0} {label}".strip()
+
+
+def scrub_jpeg(src_path, dst_path, chunk_size=None):
+    """Copy a JPEG dropping EXIF/XMP/IPTC/comment segments and trailing data.
+
+    The Exif Orientation tag is written back in a minimal APP1 segment:
+    phones store portraits sideways and rely on it to display them upright.
+    """
+    chunk_size = chunk_size or SCRUB_CONFIG['chunk_size']
+    removed, found = [], set()
+    orientation_kept = False
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        reader = _Reader(src, chunk_size)
+        if reader.read(2) != b'\xff\xd8':
+            raise ScrubError('Not a JPEG file')
+        dst.write(b'\xff\xd8')
+        marker = None
+        while True:
+            if marker is None:
+                if reader.read(1) != b'\xff':
+                    raise ScrubError(f"Expected marker at offset {reader.tell() - 1}")
+                marker = reader.read(1)[0]
+                while marker == 0xFF:
+                    marker = reader.read(1)[0]
+
+            if marker == 0xD9:
+                dst.write(b'\xff\xd9')
+                break
+            if marker in JPEG_STANDALONE:
+                dst.write(bytes((0xFF, marker)))
+                marker = None
+                continue
+
+            length = struct.unpack('>H', reader.read(2))[0]
+            if length < 2:
+                raise ScrubError('Malformed JPEG segment length')
+            payload_len = length - 2
+
+            if 0xE0 <= marker <= 0xEF or marker == 0xFE:
+                head = reader.peek(min(payload_len, 16))
+                keep = marker in JPEG_KEEP_APP and any(head.startswith(p) for p in JPEG_KEEP_APP[marker])
+                if not keep:
+                    if marker == 0xE1 and head.startswith(b'Exif\x00\x00'):
+                        tiff = reader.read(payload_len)[6:]
+                        found |= exif_findings(tiff)
+                        orientation = exif_orientation(tiff)
+                        if orientation not in (None, 1) and not orientation_kept:
+                            dst.write(_orientation_app1(orientation))
+                            orientation_kept = True
+                    else:
+                        reader.copy(payload_len, None)
+                    removed.append({'segment': _jpeg_segment_name(marker, head), 'bytes': length + 2})
+                    marker = None
+                    continue
+
+            dst.write(bytes((0xFF, marker)) + struct.pack('>H', length))
+            reader.copy(payload_len, dst)
+            # After a scan header the entropy-coded data runs until the next marker
+            marker = reader.copy_entropy(dst) if marker == 0xDA else None
+
+        trailer = os.path.getsize(src_path) - reader.tell()
+        if trailer > 0:
+            # Appended previews (MPF, vendor trailers) can carry their own EXIF
+            removed.append({'segment': 'trailer after EOI', 'bytes': trailer})
+    return removed, found
+
+
+def scrub_png(src_path, dst_path, chunk_size=None):
+    """Copy a PNG dropping eXIf/text/time chunks and anything after IEND"""
+    chunk_size = chunk_size or SCRUB_CONFIG['chunk_size']
+    removed, found = [], set()
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        reader = _Reader(src, chunk_size)
+        if reader.read(8) != PNG_SIGNATURE:
+            raise ScrubError('Not a PNG file')
+        dst.write(PNG_SIGNATURE)
+        while True:
+            header = reader.read(8)
+            length, chunk_type = struct.unpack('>I4s', header)
+            if chunk_type in PNG_METADATA_CHUNKS:
+                if chunk_type == b'eXIf':
+                    found |= exif_findings(reader.read(length))
+                    reader.copy(4, None)
+                else:
+                    reader.copy(length + 4, None)
+                removed.append({'segment': chunk_type.decode('ascii'), 'bytes': length + 12})
+                continue
+            dst.write(header)
+            reader.copy(length + 4, dst)  # data + CRC, unchanged
+            if chunk_type == b'IEND':
+                break
+
+        trailer = os.path.getsize(src_path) - reader.tell()
+        if trailer > 0:
+            removed.append({'segment': 'trailer after IEND', 'bytes': trailer})
+    return removed, found
+
+
+def _mp4_findings(payload):
+    found = set()
+    if any(m in payload for m in MP4_GPS_MARKERS):
+        found.add('gps')
+    if any(m in payload for m in MP4_DEVICE_MARKERS):
+        found.add('device')
+    return found
+
+
+def _blank_box(f, start, size, header_len, chunk_size):
+    """Turn a box into a same-sized 'free' box with a zeroed payload"""
+    f.seek(start + 4)
+    f.write(b'free')
+    f.seek(start + header_len)
+    remaining = size - header_len
+    zeros = bytes(min(chunk_size, remaining))
+    while remaining > 0:
+        f.write(zeros[:remaining])
+        remaining -= len(zeros)
+
+
+def _zero_box_times(f, payload_start):
+    """Clear creation/modification times in mvhd/tkhd/mdhd"""
+    f.seek(payload_start)
+    version = f.read(1)
+    f.seek(payload_start + 4)
+    f.write(bytes(16 if version == b'\x01' else 8))
+
+
+def _walk_mp4(f, start, end, chunk_size, removed, found, path=''):
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, box = struct.unpack('>I4s', f.read(8))
+        header_len = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_len = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_len or pos + size > end:
+            raise ScrubError(f"Malformed MP4 box '{box.decode('latin-1')}' at offset {pos}")
+
+        name = f"{path}/{box.decode('latin-1')}"
+        is_xmp = box == b'uuid' and f.read(16) == XMP_UUID
+        if box in MP4_METADATA_BOXES or is_xmp:
+            if size <= INSPECT_LIMIT:
+                f.seek(pos + header_len)
+                found |= _mp4_findings(f.read(size - header_len))
+            _blank_box(f, pos, size, header_len, chunk_size)
+            removed.append({'segment': 'XMP uuid' if is_xmp else name.lstrip('/'), 'bytes': size})
+        elif box in MP4_CONTAINERS:
+            _walk_mp4(f, pos + header_len, pos + size, chunk_size, removed, found, name)
+        elif box in MP4_TIME_BOXES:
+            _zero_box_times(f, pos + header_len)
+        pos += size
+
+
+def scrub_mp4_in_place(path, chunk_size=None):
+    """Neutralize udta/meta/XMP boxes in place by renaming them to 'free'.
+
+    Box sizes and positions never change, so sample offsets (stco/co64)
+    stay valid and the media data is never read or rewritten: the cost is
+    proportional to the metadata, not to the recording.
+    """
+    chunk_size = chunk_size or SCRUB_CONFIG['chunk_size']
+    removed, found = [], set()
+    with open(path, 'r+b') as f:
+        _walk_mp4(f, 0, os.path.getsize(path), chunk_size, removed, found)
+    return removed, found
+
+
+def scrub_file(path, fmt=None):
+    """Scrub a media file in place (JPEG/PNG via a rewritten copy); returns a summary"""
+    fmt = fmt or detect_format(path)
+    if fmt == 'heif':
+        # Blanking their meta box like an MP4's would destroy the image itself
+        raise ScrubError('HEIC/HEIF and AVIF images are not supported; export them as JPEG first')
+    if fmt not in FORMAT_EXTENSIONS:
+        raise ScrubError('Unsupported media type (JPEG, PNG and MP4/MOV are supported)')
+
+    bytes_before = os.path.getsize(path)
+    if fmt == 'mp4':
+        removed, found = scrub_mp4_in_place(path)
+    else:
+        part_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            scrub = scrub_jpeg if fmt == 'jpeg' else scrub_png
+            removed, found = scrub(path, part_path)
+            os.replace(part_path, path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    return {
+        'format': fmt,
+        'removed': removed,
+        'found': sorted(found),
+        'bytes_before': bytes_before,
+        'bytes_after': os.path.getsize(path)
+    }
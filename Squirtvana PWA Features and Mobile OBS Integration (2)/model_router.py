@@ -0,0 +1,217 @@
+"""
+Model Router for Squirtvana PWA
+Latency-aware routing across LLM models with hedged requests and circuit breakers
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# Router Configuration
+ROUTER_CONFIG = {
+    'backup_models': ['anthropic/claude-3-haiku', 'openai/gpt-4o-mini'],
+    'stats_window': 100,
+    'min_samples': 10,
+    'hedge_default_delay': 2.0,   # seconds, until a model has enough samples
+    'hedge_min_delay': 0.3,
+    'failure_threshold': 5,       # consecutive failures that open the breaker
+    'open_seconds': 30,
+    'max_workers': 8
+}
+
+
+class ModelUnavailableError(Exception):
+    """Every candidate model is failing or has an open circuit"""
+
+
+class ModelStats:
+    """Rolling latency and outcome window for one model"""
+
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+
+    def record(self, latency, ok):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+
+    def percentile(self, pct):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open trial after a cool-down"""
+
+    def __init__(self, failure_threshold, open_seconds):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def allow(self):
+        if self.state == 'closed':
+            return True
+        if self.state == 'open' and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = 'half_open'
+        if self.state == 'half_open' and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record(self, ok):
+        self.trial_in_flight = False
+        if ok:
+            self.state = 'closed'
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.state == 'half_open' or self.failures >= self.failure_threshold:
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+
+
+class ModelRouter:
+    """Route a call across a primary and backup models.
+
+    The primary is fired first. If it has not answered within its own p95
+    latency (the hedge delay) the first available backup is fired too and
+    whichever succeeds first wins; the loser keeps running in the pool only
+    so its latency and outcome still feed the stats. Failures fall through
+    to the next model immediately. Models whose breaker is open are skipped.
+    """
+
+    def __init__(self, config=None):
+        self.config = dict(ROUTER_CONFIG, **(config or {}))
+        self._stats = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._counters = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'failovers': 0}
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.config['max_workers'], thread_name_prefix='model-router'
+                    )
+        return self._executor
+
+    def _model_state(self, model):
+        if model not in self._stats:
+            self._stats[model] = ModelStats(self.config['stats_window'])
+            self._breakers[model] = CircuitBreaker(self.config['failure_threshold'], self.config['open_seconds'])
+        return self._stats[model], self._breakers[model]
+
+    def models_for(self, primary):
+        """Primary followed by the configured backups, in preference order"""
+        return [primary] + [m for m in self.config['backup_models'] if m != primary]
+
+    def hedge_delay(self, model):
+        with self._lock:
+            stats, _ = self._model_state(model)
+            if len(stats.latencies) < self.config['min_samples']:
+                return self.config['hedge_default_delay']
+            return max(self.config['hedge_min_delay'], stats.percentile(95))
+
+    def _timed(self, model, func, args, kwargs):
+        started = time.monotonic()
+        ok = False
+        try:
+            result = func(model, *args, **kwargs)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                stats, breaker = self._model_state(model)
+                stats.record(time.monotonic() - started, ok)
+                breaker.record(ok)
+                if not ok:
+                    logger.warning(f"Model {model} failed (breaker {breaker.state})")
+
+    def call(self, primary, func, *args, **kwargs):
+        """Run func(model, *args, **kwargs); returns (result, model_used)"""
+        queue = self.models_for(primary)
+        pool = self._pool()
+        running = {}
+        last_error = None
+
+        def launch_next():
+            # Skip models whose breaker is open; a half-open breaker admits one trial
+            while queue:
+                model = queue.pop(0)
+                with self._lock:
+                    allowed = self._model_state(model)[1].allow()
+                if allowed:
+                    running[pool.submit(self._timed, model, func, args, kwargs)] = model
+                    return model
+            return None
+
+        first_model = launch_next()
+        if first_model is None:
+            raise ModelUnavailableError(f"No model available for {primary}")
+        with self._lock:
+            self._counters['calls'] += 1
+        timeout = self.hedge_delay(first_model)
+
+        while running:
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+            timeout = None
+            if not done:
+                # The first model is slower than its usual p95: hedge with the next one
+                if launch_next() is not None:
+                    with self._lock:
+                        self._counters['hedged'] += 1
+                continue
+
+            for future in done:
+                model = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if model != first_model:
+                    with self._lock:
+                        self._counters['hedge_wins' if first_model in running.values() else 'failovers'] += 1
+                return result, model
+
+            # Everything that finished failed; fail over if nothing is still in flight
+            if not running:
+                launch_next()
+
+        raise ModelUnavailableError(f"All models failed for {primary}: {last_error}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'models': {
+                    model: {
+                        'samples': len(stats.latencies),
+                        'p50_seconds': stats.percentile(50),
+                        'p95_seconds': stats.percentile(95),
+                        'error_rate': round(stats.error_rate(), 4),
+                        'circuit': self._breakers[model].state
+                    }
+                    for model, stats in self._stats.items()
+                }
+            }
+
+
+router = ModelRouter()
@@ -0,0 +1,106 @@
+"""
+Prompt Templates for Squirtvana Pro Enhanced
+Templates are parsed and validated once; rendering yields model settings and a stable cache key
+"""
+
+import json
+import hashlib
+from string import Formatter
+from collections import namedtuple
+
+RenderedPrompt = namedtuple(
+    'RenderedPrompt',
+    ['template', 'system_prompt', 'user_prompt', 'model', 'temperature', 'max_tokens', 'cache_key']
+)
+
+
+class TemplateError(ValueError):
+    """Raised for malformed templates or missing/unknown variables"""
+
+
+def _compile_segments(name, text):
+    """Split a template string into (literal, field) pairs and validate fields"""
+    segments = []
+    for literal, field, format_spec, conversion in Formatter().parse(text):
+        if field is not None:
+            if not field.isidentifier():
+                raise TemplateError(f"Template '{name}': unsupported placeholder '{{{field}}}'")
+            if format_spec or conversion:
+                raise TemplateError(f"Template '{name}': placeholder '{field}' may not use format specs")
+        segments.append((literal, field))
+    return tuple(segments)
+
+
+def _render_segments(segments, variables):
+    return ''.join(literal + (str(variables[field]) if field else '') for literal, field in segments)
+
+
+class PromptTemplate:
+    """A compiled system/user prompt pair with its generation settings"""
+
+    def __init__(self, name, system_prompt, user_prompt, model, temperature=0.7, max_tokens=500, defaults=None):
+        self.name = name
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.defaults = dict(defaults or {})
+        self._system = _compile_segments(name, system_prompt)
+        self._user = _compile_segments(name, user_prompt)
+        self.variables = frozenset(
+            field for _, field in self._system + self._user if field
+        )
+        unknown_defaults = set(self.defaults) - self.variables
+        if unknown_defaults:
+            raise TemplateError(f"Template '{name}': defaults for unknown variables {sorted(unknown_defaults)}")
+
+    def render(self, **variables):
+        """Fill the template; every placeholder must be provided or defaulted"""
+        unknown = set(variables) - self.variables
+        if unknown:
+            raise TemplateError(f"Template '{self.name}': unknown variables {sorted(unknown)}")
+        values = {**self.defaults, **{k: v for k, v in variables.items() if v not in (None, '')}}
+        missing = self.variables - set(values)
+        if missing:
+            raise TemplateError(f"Template '{self.name}': missing variables {sorted(missing)}")
+
+        system_prompt = _render_segments(self._system, values)
+        user_prompt = _render_segments(self._user, values)
+        return RenderedPrompt(
+            template=self.name,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            model=self.model,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            cache_key=prompt_cache_key(self.model, self.temperature, self.max_tokens, system_prompt, user_prompt)
+        )
+
+    def describe(self):
+        return {
+            'variables': sorted(self.variables),
+            'model': self.model,
+            'temperature': self.temperature,
+            'max_tokens': self.max_tokens
+        }
+
+
+def prompt_cache_key(model, temperature, max_tokens, system_prompt, user_prompt):
+    """Stable key for a fully rendered prompt and its generation settings"""
+    payload = json.dumps([model, temperature, max_tokens, system_prompt, user_prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def compile_templates(definitions, default_model, default_max_tokens=500):
+    """Compile a {name: definition} mapping; raises TemplateError on the first bad template"""
+    return {
+        name: PromptTemplate(
+            name,
+            definition['system_prompt'],
+            definition['user_prompt'],
+            model=definition.get('model', default_model),
+            temperature=definition.get('temperature', 0.7),
+            max_tokens=definition.get('max_tokens', default_max_tokens),
+            defaults=definition.get('defaults')
+        )
+        for name, definition in definitions.items()
+    }
@@ -0,0 +1,103 @@
+"""
+Provider Clients for Squirtvana PWA
+Lazy, thread-safe API clients and cached health checks for the AI providers
+"""
+
+import os
+import time
+import threading
+
+OPENROUTER_DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+ELEVENLABS_DEFAULT_BASE_URL = "https://api.elevenlabs.io/v1"
+
+STATUS_TTL_SECONDS = 60
+STATUS_ERROR_TTL_SECONDS = 10
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
+_openrouter_client = None
+_client_lock = threading.Lock()
+
+# name -> (expires_at, payload, http_status)
+_status_cache = {}
+_status_locks = {}
+_status_locks_guard = threading.Lock()
+
+
+def load_env():
+    """Load .env once, on first use rather than when a blueprint is imported"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _env_loaded = True
+
+
+def env(name, default=None):
+    """Read a setting after making sure .env has been loaded"""
+    load_env()
+    return os.getenv(name, default)
+
+
+def openrouter_base_url():
+    return env("OPENROUTER_BASE_URL", OPENROUTER_DEFAULT_BASE_URL)
+
+
+def elevenlabs_base_url():
+    return env("ELEVENLABS_BASE_URL", ELEVENLABS_DEFAULT_BASE_URL)
+
+
+def get_openrouter_client():
+    """OpenAI SDK client for OpenRouter, created on first use.
+
+    The SDK import alone costs several hundred milliseconds, so it is
+    deferred until a request actually needs it. Returns None when the
+    client cannot be built (e.g. missing key); the next call retries.
+    """
+    global _openrouter_client
+    if _openrouter_client is not None:
+        return _openrouter_client
+    with _client_lock:
+        if _openrouter_client is None:
+            try:
+                from openai import OpenAI
+                _openrouter_client = OpenAI(
+                    base_url=openrouter_base_url(),
+                    api_key=env("OPENROUTER_KEY"),
+                )
+            except Exception as e:
+                print(f"Warning: OpenAI client initialization failed: {e}")
+                return None
+    return _openrouter_client
+
+
+def cached_status(name, check, ttl=STATUS_TTL_SECONDS):
+    """Run a provider health check at most once per TTL.
+
+    check() returns (payload, http_status). Concurrent callers for the same
+    provider wait for one probe instead of each hitting the API; failures
+    are cached for a shorter time so recovery shows up quickly.
+    """
+    entry = _status_cache.get(name)
+    if entry and entry[0] > time.monotonic():
+        return entry[1], entry[2]
+
+    with _status_locks_guard:
+        lock = _status_locks.setdefault(name, threading.Lock())
+
+    with lock:
+        entry = _status_cache.get(name)
+        if entry and entry[0] > time.monotonic():
+            return entry[1], entry[2]
+        try:
+            payload, http_status = check()
+        except Exception as e:
+            payload, http_status = {'status': 'error', 'error': str(e)}, 500
+        payload['checked_at'] = time.time()
+        expires_in = ttl if http_status < 400 else STATUS_ERROR_TTL_SECONDS
+        _status_cache[name] = (time.monotonic() + expires_in, payload, http_status)
+        return payload, http_status
@@ -0,0 +1,234 @@
+"""
+Report Jobs for Squirtvana Pro Enhanced
+Background analytics report generation, cached by type and period end, with per-section reuse and HTML artefacts
+"""
+
+import os
+import json
+import html
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Report Configuration
+REPORT_CONFIG = {
+    'report_dir': os.path.join(os.path.dirname(os.path.dirname(__file__)), 'reports'),
+    'period_seconds': 3600,   # trailing reports requested within the same hour share a period end
+    'retention': 200          # reports kept in memory; older ones are reloaded from disk
+}
+
+REPORT_TYPES = ('daily', 'weekly', 'monthly')
+
+
+class ReportError(ValueError):
+    """Unknown report type or section"""
+
+
+def period_end(now=None, granularity=REPORT_CONFIG['period_seconds']):
+    """End of the report period: now, rounded down to the period granularity"""
+    now = now or time.time()
+    return int(now // granularity) * granularity
+
+
+class ReportStore:
+    """Registry of report sections and the reports built from them.
+
+    A report is identified by (type, period end, sections). Requesting one
+    returns the cached report while every section's signature (a cheap
+    fingerprint of the data it reads) is unchanged; otherwise a job
+    regenerates it, rebuilding only sections whose signature changed.
+    Finished reports are written to report_dir as JSON plus a standalone
+    HTML rendering.
+    """
+
+    def __init__(self, report_dir, config=None):
+        self.report_dir = report_dir
+        self.config = dict(REPORT_CONFIG, **(config or {}))
+        self._lock = threading.Lock()
+        self._sections = OrderedDict()   # name -> (builder(report_type), signature(report_type))
+        self._finisher = None
+        self._reports = OrderedDict()    # report_id -> entry
+        self._latest = {}                # (type, period end, sections) -> report_id
+        self._section_cache = {}         # (type, period end, section) -> (signature, data)
+
+    def register_section(self, name, builder, signature):
+        self._sections[name] = (builder, signature)
+
+    def set_finisher(self, finisher):
+        """finisher(report) fills in summary and recommendations once the sections are built"""
+        self._finisher = finisher
+
+    def resolve_sections(self, names):
+        unknown = [name for name in names if name not in self._sections]
+        if unknown:
+            raise ReportError(f"Unknown report section(s): {', '.join(unknown)}; use {', '.join(self._sections)}")
+        return tuple(name for name in self._sections if name in names)
+
+    def signatures(self, report_type, sections):
+        return {name: self._sections[name][1](report_type) for name in sections}
+
+    def request(self, report_type, sections, submit, refresh=False):
+        """Cached or pending entry for a report; submit(func, *args) queues a build and returns its job"""
+        if report_type not in REPORT_TYPES:
+            raise ReportError(f"Unknown report type '{report_type}'; use one of {', '.join(REPORT_TYPES)}")
+        sections = self.resolve_sections(sections)
+        end = period_end(granularity=self.config['period_seconds'])
+        key = (report_type, end, sections)
+        signatures = self.signatures(report_type, sections)
+
+        with self._lock:
+            entry = self._reports.get(self._latest.get(key))
+            if entry is not None and not refresh:
+                if entry['status'] in ('queued', 'running'):
+                    return entry
+                if entry['status'] == 'ready' and entry['signatures'] == signatures:
+                    return entry
+            report_id = f"{report_type}-{datetime.fromtimestamp(end, timezone.utc):%Y%m%d%H}-{uuid.uuid4().hex[:8]}"
+            entry = {
+                'report_id': report_id,
+                'type': report_type,
+                'period_end': end,
+                'sections': sections,
+                'signatures': signatures,
+                'status': 'queued',
+                'job': None,
+                'error': None,
+                'reused_sections': []
+            }
+            self._reports[report_id] = entry
+            self._latest[key] = report_id
+            while len(self._reports) > self.config['retention']:
+                self._reports.popitem(last=False)
+        try:
+            entry['job'] = submit(self._build, report_id)
+        except Exception:
+            with self._lock:
+                self._reports.pop(report_id, None)
+                self._latest.pop(key, None)
+            raise
+        return entry
+
+    def get(self, report_id):
+        """Entry for a report id, reloading finished reports from disk after a restart"""
+        with self._lock:
+            entry = self._reports.get(report_id)
+        if entry is not None:
+            return entry
+        path = self.path(report_id, 'json')
+        if not path or not os.path.isfile(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            report = json.load(f)
+        return {'report_id': report_id, 'type': report['type'], 'status': 'ready', 'report': report,
+                'job': None, 'error': None, 'reused_sections': report.get('reused_sections', [])}
+
+    def path(self, report_id, extension):
+        if not report_id.replace('-', '').isalnum():
+            return None
+        return os.path.join(self.report_dir, f"{report_id}.{extension}")
+
+    def _build(self, report_id):
+        """Job body: build or reuse each section, finish, and write the artefacts"""
+        entry = self._reports[report_id]
+        entry['status'] = 'running'
+        report_type, end = entry['type'], entry['period_end']
+        try:
+            sections, reused = {}, []
+            for name in entry['sections']:
+                cache_key = (report_type, end, name)
+                signature = entry['signatures'][name]
+                cached = self._section_cache.get(cache_key)
+                if cached is not None and cached[0] == signature:
+                    sections[name] = cached[1]
+                    reused.append(name)
+                    continue
+                sections[name] = self._sections[name][0](report_type)
+                self._section_cache[cache_key] = (signature, sections[name])
+            self._drop_stale_sections(end)
+
+            report = {
+                'report_id': report_id,
+                'type': report_type,
+                'period_end': datetime.fromtimestamp(end, timezone.utc).isoformat(),
+                'sections': sections,
+                'summary': {},
+                'recommendations': [],
+                'reused_sections': reused,
+                'generated_at': datetime.utcnow().isoformat()
+            }
+            if self._finisher:
+                self._finisher(report)
+            self._write(report)
+            entry.update(report=report, reused_sections=reused, status='ready')
+            return {'report_id': report_id, 'reused_sections': reused}
+        except Exception as e:
+            logger.error(f"Report build error for {report_id}: {e}")
+            entry.update(status='failed', error=str(e))
+            raise
+
+    def _drop_stale_sections(self, end):
+        with self._lock:
+            for key in [key for key in self._section_cache if key[1] < end]:
+                del self._section_cache[key]
+
+    def _write(self, report):
+        os.makedirs(self.report_dir, exist_ok=True)
+        for extension, content in (('json', json.dumps(report, default=str)), ('html', render_html(report))):
+            path = self.path(report['report_id'], extension)
+            with open(f"{path}.partial", 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(f"{path}.partial", path)
+
+
+def section_signature(*parts):
+    """Short stable digest of the values a section depends on"""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def _render_value(value):
+    if isinstance(value, dict):
+        rows = ''.join(f"<tr><th>{html.escape(str(k).replace('_', ' '))}</th><td>{_render_value(v)}</td></tr>"
+                       for k, v in value.items())
+        return f"<table>{rows}</table>"
+    if isinstance(value, list):
+        if value and all(isinstance(item, dict) for item in value):
+            columns = list(OrderedDict.fromkeys(k for item in value for k in item))
+            head = ''.join(f"<th>{html.escape(c.replace('_', ' '))}</th>" for c in columns)
+            body = ''.join('<tr>' + ''.join(f"<td>{_render_value(item.get(c, ''))}</td>" for c in columns) + '</tr>'
+                           for item in value)
+            return f"<table><tr>{head}</tr>{body}</table>"
+        return html.escape(', '.join(str(item) for item in value))
+    return html.escape('' if value is None else str(value))
+
+
+def render_html(report):
+    """Standalone HTML document for a report (inline styles, no external assets)"""
+    title = f"{report['type'].capitalize()} report - {report['period_end'][:16].replace('T', ' ')} UTC"
+    highlights = ''.join(f"<li>{html.escape(h)}</li>" for h in report['summary'].get('key_highlights', []))
+    recommendations = ''.join(f"<li>{html.escape(r)}</li>" for r in report['recommendations'])
+    sections = ''.join(f"<h2>{html.escape(name.capitalize())}</h2>{_render_value(data)}"
+                       for name, data in report['sections'].items())
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>
+body {{ font-family: system-ui, sans-serif; margin: 2rem; color: #1f2937; }}
+table {{ border-collapse: collapse; margin: .25rem 0; }}
+th, td {{ border: 1px solid #d1d5db; padding: .2rem .5rem; text-align: left; vertical-align: top; font-size: .9rem; }}
+th {{ background: #f3f4f6; }}
+</style></head><body>
+<h1>{html.escape(title)}</h1>
+<p>Generated {html.escape(report['generated_at'])} UTC</p>
+<h2>Highlights</h2><ul>{highlights}</ul>
+<h2>Recommendations</h2><ul>{recommendations}</ul>
+{sections}
+</body></html>
+"""
+
+
+reports = ReportStore(REPORT_CONFIG['report_dir'])
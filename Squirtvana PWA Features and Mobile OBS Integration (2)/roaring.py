@@ -0,0 +1,180 @@
+"""
+Roaring Bitmaps for Squirtvana Pro Enhanced
+Compressed sets of 32-bit viewer ids with fast vectorized unions and intersections
+"""
+
+import struct
+
+import numpy as np
+
+ARRAY_LIMIT = 4096        # containers above this many values switch to a bitmap
+BITMAP_WORDS = 1024       # 65536 bits as uint64 words
+
+_HEADER = struct.Struct('<I')
+_CONTAINER = struct.Struct('<HBI')  # key, kind (0 array, 1 bitmap), value count
+
+
+def _to_bitmap(values):
+    words = np.zeros(BITMAP_WORDS, dtype=np.uint64)
+    np.bitwise_or.at(words, values >> 6, np.left_shift(np.uint64(1), (values & 63).astype(np.uint64)))
+    return words
+
+
+def _to_array(words):
+    return np.flatnonzero(np.unpackbits(words.view(np.uint8), bitorder='little')).astype(np.uint16)
+
+
+def _cardinality(container):
+    if container.dtype == np.uint16:
+        return len(container)
+    return int(np.bitwise_count(container).sum())
+
+
+def _contains(words, values):
+    return ((words[values >> 6] >> (values & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+
+def _normalize(container):
+    """Pick the smaller representation for a container"""
+    if container.dtype == np.uint16:
+        return _to_bitmap(container) if len(container) > ARRAY_LIMIT else container
+    return _to_array(container) if _cardinality(container) <= ARRAY_LIMIT else container
+
+
+class RoaringBitmap:
+    """Set of uint32 ids split into 65536-wide containers by their high 16 bits.
+
+    Sparse containers are sorted uint16 arrays, dense ones 1024 uint64
+    words, as in the Roaring format. Dense viewer ids assigned in order of
+    first appearance keep each cohort inside a few containers, so set
+    operations touch little memory.
+    """
+
+    def __init__(self, containers=None):
+        self.containers = containers or {}
+
+    @classmethod
+    def from_ids(cls, ids):
+        bitmap = cls()
+        bitmap.add_many(ids)
+        return bitmap
+
+    def _split(self, ids):
+        ids = np.unique(np.asarray(ids, dtype=np.uint32))
+        high = (ids >> 16).astype(np.int64)
+        bounds = np.flatnonzero(np.diff(high)) + 1
+        for chunk in np.split(ids, bounds) if len(ids) else []:
+            yield int(chunk[0] >> 16), (chunk & 0xFFFF).astype(np.uint16)
+
+    def add_many(self, ids):
+        for key, values in self._split(ids):
+            current = self.containers.get(key)
+            if current is None:
+                self.containers[key] = _normalize(values)
+            elif current.dtype == np.uint16:
+                self.containers[key] = _normalize(np.union1d(current, values).astype(np.uint16))
+            else:
+                np.bitwise_or(current, _to_bitmap(values), out=current)
+        return self
+
+    def discard_many(self, ids):
+        for key, values in self._split(ids):
+            current = self.containers.get(key)
+            if current is None:
+                continue
+            if current.dtype == np.uint16:
+                remaining = np.setdiff1d(current, values, assume_unique=True).astype(np.uint16)
+            else:
+                remaining = _normalize(current & ~_to_bitmap(values))
+            if _cardinality(remaining):
+                self.containers[key] = remaining
+            else:
+                del self.containers[key]
+        return self
+
+    def __len__(self):
+        return sum(_cardinality(c) for c in self.containers.values())
+
+    def __contains__(self, value):
+        container = self.containers.get(int(value) >> 16)
+        if container is None:
+            return False
+        low = np.array([int(value) & 0xFFFF], dtype=np.uint16)
+        if container.dtype == np.uint16:
+            return bool(np.isin(low, container)[0])
+        return bool(_contains(container, low)[0])
+
+    def copy(self):
+        return RoaringBitmap({key: c.copy() for key, c in self.containers.items()})
+
+    def union_update(self, other):
+        for key, theirs in other.containers.items():
+            mine = self.containers.get(key)
+            if mine is None:
+                self.containers[key] = theirs.copy()
+            elif mine.dtype == np.uint16 and theirs.dtype == np.uint16:
+                self.containers[key] = _normalize(np.union1d(mine, theirs).astype(np.uint16))
+            else:
+                words = mine if mine.dtype == np.uint64 else _to_bitmap(mine)
+                np.bitwise_or(words, theirs if theirs.dtype == np.uint64 else _to_bitmap(theirs), out=words)
+                self.containers[key] = words
+        return self
+
+    def __or__(self, other):
+        return self.copy().union_update(other)
+
+    def _intersect_container(self, mine, theirs):
+        if mine.dtype == np.uint16 and theirs.dtype == np.uint16:
+            return np.intersect1d(mine, theirs, assume_unique=True).astype(np.uint16)
+        if mine.dtype == np.uint16:
+            return mine[_contains(theirs, mine)]
+        if theirs.dtype == np.uint16:
+            return theirs[_contains(mine, theirs)]
+        return _normalize(mine & theirs)
+
+    def __and__(self, other):
+        result = {}
+        for key in self.containers.keys() & other.containers.keys():
+            container = self._intersect_container(self.containers[key], other.containers[key])
+            if _cardinality(container):
+                result[key] = container
+        return RoaringBitmap(result)
+
+    def intersection_len(self, other):
+        """|self & other| without materializing the result"""
+        total = 0
+        for key in self.containers.keys() & other.containers.keys():
+            mine, theirs = self.containers[key], other.containers[key]
+            if mine.dtype == np.uint64 and theirs.dtype == np.uint64:
+                total += int(np.bitwise_count(mine & theirs).sum())
+            else:
+                total += len(self._intersect_container(mine, theirs))
+        return total
+
+    def to_array(self):
+        parts = [
+            (np.uint32(key) << np.uint32(16)) | (c if c.dtype == np.uint16 else _to_array(c)).astype(np.uint32)
+            for key, c in sorted(self.containers.items())
+        ]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.uint32)
+
+    def to_bytes(self):
+        chunks = [_HEADER.pack(len(self.containers))]
+        for key, container in sorted(self.containers.items()):
+            is_bitmap = container.dtype == np.uint64
+            chunks.append(_CONTAINER.pack(key, int(is_bitmap), BITMAP_WORDS if is_bitmap else len(container)))
+            chunks.append(container.tobytes())
+        return b''.join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data):
+        (count,) = _HEADER.unpack_from(data, 0)
+        offset = _HEADER.size
+        containers = {}
+        for _ in range(count):
+            key, kind, size = _CONTAINER.unpack_from(data, offset)
+            offset += _CONTAINER.size
+            dtype = np.uint64 if kind else np.uint16
+            containers[key] = np.frombuffer(data, dtype=dtype, count=size, offset=offset).copy()
+            offset += size * np.dtype(dtype).itemsize
+        return cls(containers)
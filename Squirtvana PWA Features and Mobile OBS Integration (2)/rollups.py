@@ -0,0 +1,216 @@
+"""
+Event Rollups for Squirtvana Pro Enhanced
+Incremental per-minute, per-hour and per-day sums and counts per platform and event type
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+import numpy as np
+
+from src.routes.event_store import event_store, DAY_SECONDS
+
+DEFAULT_DB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
+DB_FILENAME = 'event_rollups.db'
+
+# Bucket width in seconds, finest first
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': DAY_SECONDS}
+
+# Rollup Configuration (None keeps buckets forever)
+ROLLUP_CONFIG = {
+    'retention_days': {'minute': 3, 'hour': 400, 'day': None}
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS event_rollups (
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    platform INTEGER NOT NULL,
+    type INTEGER NOT NULL,
+    events INTEGER NOT NULL DEFAULT 0,
+    amount REAL NOT NULL DEFAULT 0,
+    duration REAL NOT NULL DEFAULT 0,
+    timed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (resolution, bucket, platform, type)
+) WITHOUT ROWID;
+"""
+
+UPSERT = """
+INSERT INTO event_rollups (resolution, bucket, platform, type, events, amount, duration, timed)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (resolution, bucket, platform, type) DO UPDATE SET
+    events = events + excluded.events,
+    amount = amount + excluded.amount,
+    duration = duration + excluded.duration,
+    timed = timed + excluded.timed
+"""
+
+# Grouping name -> SQL expression over a bucket row
+GROUPINGS = {
+    'platform': 'platform',
+    'type': 'type',
+    'day': f'bucket / {DAY_SECONDS}',
+    'hour': 'bucket / 3600',
+    'hour_of_day': f'(bucket % {DAY_SECONDS}) / 3600',
+    # Epoch day 0 was a Thursday; 0 = Monday
+    'weekday': f'(bucket / {DAY_SECONDS} + 3) % 7'
+}
+# Groupings that need buckets no coarser than an hour
+HOURLY_GROUPINGS = {'hour', 'hour_of_day'}
+
+
+def split_range(start, end, resolutions):
+    """Cover [start, end) with the coarsest whole buckets available.
+
+    Returns [(resolution seconds, first bucket, end bucket)], e.g. minutes up
+    to the first full hour, hours up to the first full day, then days, and
+    back down again at the other edge. start/end are widened to the finest
+    resolution, so the current partial minute is included.
+    """
+    finest = resolutions[0]
+    start = int(start // finest) * finest
+    end = int(-(-end // finest)) * finest
+    ranges = []
+    low, high = start, end
+    for i, width in enumerate(resolutions):
+        if i + 1 < len(resolutions):
+            coarser = resolutions[i + 1]
+            inner_low = -(-low // coarser) * coarser
+            inner_high = (high // coarser) * coarser
+            if inner_low < inner_high:
+                if low < inner_low:
+                    ranges.append((width, low, inner_low))
+                if inner_high < high:
+                    ranges.append((width, inner_high, high))
+                low, high = inner_low, inner_high
+                continue
+        if low < high:
+            ranges.append((width, low, high))
+        break
+    return ranges
+
+
+class EventRollups:
+    """Materialized bucket sums fed by the event store as events arrive.
+
+    Each accepted batch is reduced with NumPy to one row per (bucket,
+    platform, type) at every resolution and upserted, the same way
+    LLMAccounting keeps its hourly table. A query over any window reads
+    days for the whole days inside it, hours for the whole hours around
+    those and minutes only at the edges, so its cost depends on the
+    window's length in buckets, not on the number of events.
+    """
+
+    def __init__(self, db_path, store=None, config=None):
+        self.db_path = db_path
+        self.store = store
+        self.config = dict(ROLLUP_CONFIG, **(config or {}))
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pruned_hour = None
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            if self.store is not None and conn.execute('SELECT 1 FROM event_rollups LIMIT 1').fetchone() is None:
+                self._backfill()
+        return self._conn
+
+    def _backfill(self):
+        """Build the rollups from flushed segments (first start or a deleted rollup database)"""
+        for day in self.store.days():
+            self._add(self.store.read_day(day))
+
+    def add(self, columns):
+        """Fold one batch of event columns into every resolution"""
+        if not len(columns['ts']):
+            return
+        with self._lock:
+            self._connection()
+            self._add(columns)
+            self._prune()
+
+    def _add(self, columns):
+        rows = []
+        for width in RESOLUTIONS.values():
+            keys = np.stack([
+                (columns['ts'] // width).astype(np.int64) * width,
+                columns['platform'].astype(np.int64),
+                columns['type'].astype(np.int64)
+            ], axis=1)
+            unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            counts = np.bincount(inverse)
+            amounts = np.bincount(inverse, weights=columns['amount'])
+            durations = np.bincount(inverse, weights=columns['duration'].astype(np.float64))
+            timed = np.bincount(inverse, weights=columns['duration'] > 0).astype(np.int64)
+            rows.extend(zip([width] * len(unique), *(unique[:, i].tolist() for i in range(3)),
+                            counts.tolist(), amounts.tolist(), durations.tolist(), timed.tolist()))
+        with self._conn:
+            self._conn.executemany(UPSERT, rows)
+
+    def _prune(self):
+        hour = int(time.time() // 3600)
+        if hour == self._pruned_hour:
+            return
+        self._pruned_hour = hour
+        with self._conn:
+            for name, days in self.config['retention_days'].items():
+                if days is not None:
+                    self._conn.execute(
+                        'DELETE FROM event_rollups WHERE resolution = ? AND bucket < ?',
+                        (RESOLUTIONS[name], int(time.time()) - days * DAY_SECONDS)
+                    )
+
+    def query(self, start, end, by=(), platform=None, types=None):
+        """Summed events/amount/duration over [start, end), grouped by names in GROUPINGS.
+
+        Returns a list of dicts with the grouping keys plus 'events',
+        'amount', 'duration' and 'timed' (events that carried a duration).
+        Hour-of-day groupings never use day buckets.
+        """
+        widths = [RESOLUTIONS['minute'], RESOLUTIONS['hour']]
+        if not HOURLY_GROUPINGS & set(by):
+            widths.append(RESOLUTIONS['day'])
+        # A start older than a resolution's retention is rounded down to the
+        # next coarser kept bucket (e.g. a 30-day window starts on the hour)
+        now = time.time()
+        for name in ('minute', 'hour'):
+            days = self.config['retention_days'][name]
+            if days is not None and start < now - days * DAY_SECONDS:
+                width = RESOLUTIONS['hour' if name == 'minute' else 'day']
+                start = (start // width) * width
+        ranges = split_range(start, end, widths)
+        if not ranges:
+            return []
+
+        clauses = [' OR '.join('(resolution = ? AND bucket >= ? AND bucket < ?)' for _ in ranges)]
+        params = [value for r in ranges for value in r]
+        if platform is not None:
+            clauses.append('platform = ?')
+            params.append(platform)
+        if types is not None:
+            clauses.append(f"type IN ({', '.join('?' * len(types))})")
+            params.extend(types)
+        select = [f'{GROUPINGS[name]} AS {name}' for name in by]
+        group = f"GROUP BY {', '.join(by)}" if by else ''
+        with self._lock:
+            rows = self._connection().execute(
+                f'''SELECT {', '.join(select + ['SUM(events) AS events', 'SUM(amount) AS amount',
+                                                'SUM(duration) AS duration', 'SUM(timed) AS timed'])}
+                    FROM event_rollups WHERE ({clauses[0]}) {''.join(' AND ' + c for c in clauses[1:])}
+                    {group}''',
+                params
+            ).fetchall()
+        return [dict(row) for row in rows if row['events'] is not None]
+
+
+rollups = EventRollups(os.path.join(DEFAULT_DB_DIR, DB_FILENAME), store=event_store)
+event_store.add_listener(rollups.add)
@@ -0,0 +1,73 @@
+"""
+Single-flight request deduplication for Squirtvana PWA
+Concurrent identical upstream calls share one in-flight request
+"""
+
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one upstream call.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait and receive the same result (or the same exception).
+    Nothing is cached once the call returns.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._upstream = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """Run func once per in-flight key; returns (result, shared)"""
+        with self._lock:
+            self._requests += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._upstream += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        """Request counters; saved_calls is how many upstream calls were avoided"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'requests': self._requests,
+                'upstream_calls': self._upstream,
+                'saved_calls': self._requests - self._upstream,
+                'in_flight': len(self._calls)
+            }
@@ -0,0 +1,201 @@
+"""
+Sketch Store for Squirtvana Pro Enhanced
+Mergeable sketches per hour, day, platform and kind in SQLite, fed by the event store
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.routes.event_store import DAY_SECONDS
+from src.routes.rollups import split_range
+
+SKETCH_RESOLUTIONS = {'hour': 3600, 'day': DAY_SECONDS}
+
+META_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sketch_meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SketchStore:
+    """One sketch per (hour or day, platform, kind), stored serialized in SQLite.
+
+    Subclasses set the table and column names, the sketch class (with
+    to_bytes/from_bytes/merge) and the default config, and implement
+    _samples() and _fold(). Day sketches cover the whole days of a range and
+    hour sketches its edges, so a query merges a few dozen sketches
+    whatever the period and never touches raw events.
+    """
+
+    TABLE = None
+    KIND_COLUMN = None
+    DATA_COLUMN = None
+    sketch_class = None
+    default_config = None
+
+    def __init__(self, db_path, store=None, config=None):
+        self.db_path = db_path
+        self.store = store
+        self.config = dict(self.default_config, **(config or {}))
+        self._lock = threading.Lock()
+        self._conn = None
+        self._cache = OrderedDict()
+        self._pruned_hour = None
+
+    def _schema(self):
+        return META_SCHEMA + f"""
+CREATE TABLE IF NOT EXISTS {self.TABLE} (
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    platform INTEGER NOT NULL,
+    {self.KIND_COLUMN} INTEGER NOT NULL,
+    {self.DATA_COLUMN} BLOB NOT NULL,
+    PRIMARY KEY (resolution, bucket, platform, {self.KIND_COLUMN})
+) WITHOUT ROWID;
+"""
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(self._schema())
+            self._conn = conn
+            if self.store is not None:
+                self._backfill()
+        return self._conn
+
+    def _backfill(self):
+        """Fold every stored day into the sketches, once per database.
+
+        The 'backfill' meta row records completion, so a store whose events
+        produce no sketches is not rescanned on every start; a backfill cut
+        short is started over.
+        """
+        row = self._conn.execute("SELECT value FROM sketch_meta WHERE name = 'backfill'").fetchone()
+        if row is not None and row[0] == 'done':
+            return
+        if row is None and self._conn.execute(f'SELECT 1 FROM {self.TABLE} LIMIT 1').fetchone() is not None:
+            # Filled by a version that did not record the backfill
+            self._set_meta('backfill', 'done')
+            return
+        with self._conn:
+            self._conn.execute(f'DELETE FROM {self.TABLE}')
+        self._cache.clear()
+        self._set_meta('backfill', 'running')
+        for day in self.store.days():
+            self._add(self.store.read_day(day))
+        self._set_meta('backfill', 'done')
+
+    def _set_meta(self, name, value):
+        with self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO sketch_meta (name, value) VALUES (?, ?)', (name, value))
+
+    def add(self, columns):
+        """Fold one event batch into the sketches"""
+        with self._lock:
+            self._connection()
+            self._add(columns)
+            self._prune()
+
+    def _samples(self, columns):
+        """Yield (ts, platform, kind, values) arrays per sample set; values is a tuple of per-row arrays"""
+        raise NotImplementedError
+
+    @staticmethod
+    def _fold(sketch, *values):
+        """Add the rows of one (bucket, platform, kind) group to its sketch"""
+        raise NotImplementedError
+
+    def _add(self, columns):
+        rows = []
+        for ts, platform, kind, values in self._samples(columns):
+            for width in SKETCH_RESOLUTIONS.values():
+                keys = np.stack([
+                    (ts // width).astype(np.int64) * width,
+                    platform.astype(np.int64),
+                    kind.astype(np.int64)
+                ], axis=1)
+                unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+                order = np.argsort(inverse.ravel(), kind='stable')
+                bounds = np.searchsorted(inverse.ravel()[order], np.arange(len(unique) + 1))
+                for i, key in enumerate(map(tuple, unique.tolist())):
+                    sketch = self._load((width,) + key)
+                    group = order[bounds[i]:bounds[i + 1]]
+                    self._fold(sketch, *(value[group] for value in values))
+                    rows.append((width,) + key + (sketch.to_bytes(),))
+        if rows:
+            with self._conn:
+                self._conn.executemany(
+                    f'INSERT OR REPLACE INTO {self.TABLE} '
+                    f'(resolution, bucket, platform, {self.KIND_COLUMN}, {self.DATA_COLUMN}) VALUES (?, ?, ?, ?, ?)',
+                    rows
+                )
+
+    def _load(self, key):
+        sketch = self._cache.get(key)
+        if sketch is None:
+            row = self._conn.execute(
+                f'SELECT {self.DATA_COLUMN} FROM {self.TABLE} '
+                f'WHERE resolution = ? AND bucket = ? AND platform = ? AND {self.KIND_COLUMN} = ?',
+                key
+            ).fetchone()
+            sketch = self.sketch_class.from_bytes(row[0]) if row else self.sketch_class()
+            self._cache[key] = sketch
+            while len(self._cache) > self.config['cached_sketches']:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return sketch
+
+    def _prune(self):
+        hour = int(time.time() // 3600)
+        if hour == self._pruned_hour:
+            return
+        self._pruned_hour = hour
+        with self._conn:
+            for name, days in self.config['retention_days'].items():
+                if days is not None:
+                    self._conn.execute(
+                        f'DELETE FROM {self.TABLE} WHERE resolution = ? AND bucket < ?',
+                        (SKETCH_RESOLUTIONS[name], int(time.time()) - days * DAY_SECONDS)
+                    )
+
+    def _merged(self, start, end, platform=None, kinds=None):
+        """Merge of the sketches over [start, end), optionally by platform and kind codes.
+
+        Edges are widened to whole hours; a start older than the hour
+        retention is widened to the whole day.
+        """
+        days = self.config['retention_days']['hour']
+        if days is not None and start < time.time() - days * DAY_SECONDS:
+            start = (start // DAY_SECONDS) * DAY_SECONDS
+        ranges = split_range(start, end, list(SKETCH_RESOLUTIONS.values()))
+        result = self.sketch_class()
+        if not ranges:
+            return result
+
+        clauses = [' OR '.join('(resolution = ? AND bucket >= ? AND bucket < ?)' for _ in ranges)]
+        params = [value for r in ranges for value in r]
+        if platform is not None:
+            clauses.append('platform = ?')
+            params.append(platform)
+        if kinds is not None:
+            clauses.append(f"{self.KIND_COLUMN} IN ({', '.join('?' * len(kinds))})")
+            params.extend(kinds)
+        with self._lock:
+            cursor = self._connection().execute(
+                f"SELECT {self.DATA_COLUMN} FROM {self.TABLE} WHERE ({clauses[0]})"
+                f"{''.join(' AND ' + c for c in clauses[1:])}",
+                params
+            )
+            for (data,) in cursor:
+                result.merge(self.sketch_class.from_bytes(data))
+        return result
@@ -33,6 +33,7 @@ function App() {
   const [isGenerating, setIsGenerating] = useState(false)
   const [isGeneratingAudio, setIsGeneratingAudio] = useState(false)
   const [currentAudioUrl, setCurrentAudioUrl] = useState('')
+  const [audioPrefetchId, setAudioPrefetchId] = useState('')
   
   // OBS State
   const [scenes, setScenes] = useState([])
@@ -81,11 +82,12 @@ function App() {
     setIsGenerating(true)
     const result = await apiCall('/gpt/generate', {
       method: 'POST',
-      body: JSON.stringify({ prompt })
+      body: JSON.stringify({ prompt, prefetch_audio: true })
     })
     
     if (result.success) {
       setGeneratedText(result.generated_text)
+      setAudioPrefetchId(result.audio_prefetch_id || '')
       // Auto-update OBS text source
       await apiCall('/obs/text/update', {
         method: 'POST',
@@ -98,13 +100,25 @@ function App() {
     setIsGenerating(false)
   }
 
+  const editGeneratedText = (text) => {
+    // The speculative TTS no longer matches the text, stop paying for it
+    if (audioPrefetchId) {
+      apiCall('/audio/prefetch/cancel', {
+        method: 'POST',
+        body: JSON.stringify({ prefetch_id: audioPrefetchId })
+      })
+      setAudioPrefetchId('')
+    }
+    setGeneratedText(text)
+  }
+
   const generateAudio = async (text = generatedText) => {
     if (!text.trim()) return
     
     setIsGeneratingAudio(true)
     const result = await apiCall('/audio/generate', {
       method: 'POST',
-      body: JSON.stringify({ text })
+      body: JSON.stringify({ text, prefetch_id: audioPrefetchId })
     })
     
     if (result.success) {
@@ -113,6 +127,16 @@ function App() {
     setIsGeneratingAudio(false)
   }
 
+  const streamAudio = (text = generatedText) => {
+    if (!text.trim()) return
+    
+    // Playback starts with the first chunk; the server tees the clip into its cache
+    const streamUrl = `${API_BASE}/audio/stream?text=${encodeURIComponent(text)}`
+    setCurrentAudioUrl(streamUrl)
+    const audio = new Audio(`${window.location.origin}${streamUrl}`)
+    audio.play()
+  }
+
   const playAudio = () => {
     if (currentAudioUrl) {
       const audio = new Audio(`${window.location.origin}${currentAudioUrl}`)
@@ -306,9 +330,12 @@ function App() {
             </Button>
 
             {generatedText && (
-              <div className="p-3 bg-gray-800 rounded-lg border border-gray-600">
-                <p className="text-sm text-gray-100">{generatedText}</p>
-              </div>
+              <Textarea
+                value={generatedText}
+                onChange={(e) => editGeneratedText(e.target.value)}
+                className="bg-gray-800 border-gray-600 text-sm text-gray-100 focus:border-purple-400 focus:ring-purple-400"
+                rows={4}
+              />
             )}
           </CardContent>
         </Card>
@@ -344,6 +371,15 @@ function App() {
               </Button>
             </div>
             
+            <Button 
+              onClick={() => streamAudio()}
+              disabled={!generatedText}
+              className="w-full bg-pink-700 hover:bg-pink-800"
+            >
+              <Volume2 className="w-4 h-4 mr-2" />
+              Speak Now
+            </Button>
+            
             <Button 
               onClick={testVoice}
               disabled={isGeneratingAudio}
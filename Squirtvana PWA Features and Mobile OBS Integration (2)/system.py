@@ -2,14 +2,14 @@ import os
 import psutil
 import requests
 from flask import Blueprint, jsonify
-from dotenv import load_dotenv
-
-load_dotenv()
 
 system_bp = Blueprint('system', __name__)
 
-TELEGRAM_API_KEY = os.getenv("TELEGRAM_API_KEY")
-TELEGRAM_BASE_URL = f"https://api.telegram.org/bot{TELEGRAM_API_KEY}"
+from src.routes.providers import env, cached_status
+
+def telegram_base_url():
+    """Bot API URL, built lazily so .env is read on first use"""
+    return f"https://api.telegram.org/bot{env('TELEGRAM_API_KEY')}"
 
 @system_bp.route('/system/stats', methods=['GET'])
 def get_system_stats():
@@ -90,41 +90,38 @@ def get_top_processes():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def check_telegram():
+    """Health probe via getMe"""
+    response = requests.get(f"{telegram_base_url()}/getMe", timeout=10)
+    
+    if response.status_code == 200:
+        bot_info = response.json()
+        if bot_info.get('ok'):
+            bot_data = bot_info['result']
+            return {
+                'status': 'active',
+                'bot_name': bot_data.get('first_name', 'Unknown'),
+                'username': bot_data.get('username', 'Unknown'),
+                'bot_id': bot_data.get('id', 'Unknown'),
+                'connection': 'ok'
+            }, 200
+    
+    return {
+        'status': 'error',
+        'error': 'Failed to connect to Telegram API'
+    }, 500
+
 @system_bp.route('/telegram/status', methods=['GET'])
 def telegram_status():
-    """Check Telegram bot status"""
-    try:
-        # Test bot connection
-        response = requests.get(f"{TELEGRAM_BASE_URL}/getMe", timeout=10)
-        
-        if response.status_code == 200:
-            bot_info = response.json()
-            if bot_info.get('ok'):
-                bot_data = bot_info['result']
-                return jsonify({
-                    'status': 'active',
-                    'bot_name': bot_data.get('first_name', 'Unknown'),
-                    'username': bot_data.get('username', 'Unknown'),
-                    'bot_id': bot_data.get('id', 'Unknown'),
-                    'connection': 'ok'
-                })
-        
-        return jsonify({
-            'status': 'error',
-            'error': 'Failed to connect to Telegram API'
-        }), 500
-        
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    """Check Telegram bot status (cached, see providers.cached_status)"""
+    payload, http_status = cached_status('telegram', check_telegram)
+    return jsonify(payload), http_status
 
 @system_bp.route('/telegram/updates', methods=['GET'])
 def telegram_updates():
     """Get recent Telegram bot updates"""
     try:
-        response = requests.get(f"{TELEGRAM_BASE_URL}/getUpdates?limit=5", timeout=10)
+        response = requests.get(f"{telegram_base_url()}/getUpdates?limit=5", timeout=10)
         
         if response.status_code == 200:
             updates_data = response.json()
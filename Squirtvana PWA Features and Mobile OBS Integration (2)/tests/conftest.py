@@ -0,0 +1,38 @@
+"""
+Shared pytest setup for the Squirtvana route modules
+"""
+
+import os
+import sys
+import random
+
+import pytest
+
+# tests/ lives next to the route modules (src/routes); imports are rooted above src/
+ROUTES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(ROUTES_DIR))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(ROUTES_DIR, 'benchmarks'))
+
+
+@pytest.fixture
+def make_events():
+    """Factory for random raw event dicts between start and end, as clients post them"""
+    def make(count, start, end, seed=0):
+        rng = random.Random(seed)
+        events = []
+        for _ in range(count):
+            event_type = rng.choice(['tip', 'viewer_join', 'viewer_leave', 'subscription', 'private_show'])
+            event = {
+                'type': event_type,
+                'platform': rng.choice(['chaturbate', 'onlyfans', 'fansly']),
+                'viewer_id': f"v{rng.randint(1, 500)}",
+                'timestamp': rng.uniform(start, end)
+            }
+            if event_type in ('tip', 'subscription', 'private_show'):
+                event['amount'] = round(rng.uniform(1, 200), 2)
+            if event_type == 'viewer_leave':
+                event['duration'] = rng.uniform(30, 7200)
+            events.append(event)
+        return events
+    return make
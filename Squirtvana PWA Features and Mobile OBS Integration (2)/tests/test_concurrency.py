@@ -0,0 +1,112 @@
+"""
+Viewer concurrency: batches from several clients give the same results as one ordered feed
+"""
+
+import random
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+
+from src.routes.event_store import EventStore, normalize_event
+from src.routes.concurrency import ConcurrencyTracker
+
+NOW = time.time()
+START = NOW - 6 * 3600
+CHECK = NOW + 3600   # heatmaps integrated up to the same instant
+
+
+def session_events(count, seed=0):
+    """Joins and leaves of count sessions, every tenth viewer anonymous, in timestamp order"""
+    rng = random.Random(seed)
+    events = []
+    for viewer in range(count):
+        joined = rng.uniform(START, NOW - 3600)
+        left = min(joined + rng.expovariate(1 / 900), NOW - 3600)
+        session = {'platform': rng.choice(['chaturbate', 'fansly'])}
+        if viewer % 10:
+            session['viewer_id'] = f"v{viewer}"
+        events.append(dict(session, type='viewer_join', timestamp=joined))
+        events.append(dict(session, type='viewer_leave', timestamp=left))
+    return sorted(events, key=lambda e: e['timestamp'])
+
+
+def client_batches(events, flush_seconds=5, jitter=3, seed=1):
+    """Two clients splitting the events, each posting what it saw every flush_seconds up to jitter seconds late"""
+    rng = random.Random(seed)
+    batches = []
+    for client in (0, 1):
+        windows = {}
+        for event in events[client::2]:
+            windows.setdefault(int(event['timestamp'] // flush_seconds), []).append(event)
+        for window, batch in windows.items():
+            batches.append(((window + 1) * flush_seconds + rng.uniform(0, jitter), batch))
+    return [batch for _, batch in sorted(batches, key=lambda item: item[0])]
+
+
+@pytest.fixture
+def feed(tmp_path):
+    def make(name):
+        store = EventStore(str(tmp_path / name / 'events'), config={'flush_rows': 10 ** 9, 'flush_interval': 3600})
+        tracker = ConcurrencyTracker(str(tmp_path / name / 'concurrency.db'), store=store)
+        store.add_listener(tracker.add)
+        return store, tracker
+    return make
+
+
+def ingest(store, tracker, batches):
+    for batch in batches:
+        store.append([normalize_event(event, NOW) for event in batch])
+    tracker.process(release_all=True)
+    tracker.close()
+
+
+def hour_rows(tracker):
+    with sqlite3.connect(tracker.db_path) as conn:
+        return conn.execute('SELECT hour, platform, peak, viewer_seconds FROM concurrency_hours '
+                            'ORDER BY hour, platform').fetchall()
+
+
+def assert_same_results(actual, expected):
+    for got, want in zip(actual._arrays(CHECK), expected._arrays(CHECK)):
+        np.testing.assert_allclose(got, want)
+    assert actual.current(CHECK) == expected.current(CHECK)
+    got, want = hour_rows(actual), hour_rows(expected)
+    assert [row[:3] for row in got] == [row[:3] for row in want]
+    assert [row[3] for row in got] == pytest.approx([row[3] for row in want])
+
+
+@pytest.fixture
+def ordered(feed):
+    events = session_events(3000)
+    store, tracker = feed('ordered')
+    ingest(store, tracker, [events])
+    return events, tracker
+
+
+def test_interleaved_clients_need_no_replay(feed, ordered):
+    events, expected = ordered
+    store, tracker = feed('clients')
+    ingest(store, tracker, client_batches(events))
+    stats = tracker.stats()
+    assert (stats['late_events'], stats['replays'], stats['rebuilds']) == (0, 0, 0)
+    assert_same_results(tracker, expected)
+
+    # A restart resumes from the saved state and the store
+    reopened = ConcurrencyTracker(tracker.db_path, store=store)
+    for got, want in zip(reopened._arrays(CHECK), expected._arrays(CHECK)):
+        np.testing.assert_allclose(got, want)
+
+
+def test_late_batch_replays_from_a_checkpoint(feed, ordered):
+    events, expected = ordered
+    batches = client_batches(events)
+    # One post held back for hours, delivered after everything else
+    late = batches.pop(len(batches) // 2)
+    store, tracker = feed('late')
+    ingest(store, tracker, batches + [late])
+    stats = tracker.stats()
+    assert stats['late_events'] == len(late)
+    assert (stats['replays'], stats['rebuilds']) == (1, 0)
+    assert_same_results(tracker, expected)
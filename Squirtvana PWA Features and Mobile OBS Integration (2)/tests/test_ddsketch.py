@@ -0,0 +1,89 @@
+"""
+DDSketch quantiles: every quantile within the relative accuracy of the exact value at its rank
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from src.routes.event_store import EVENT_CODES, PLATFORM_CODES
+from src.routes.ddsketch import DDSketch, QuantileSketches, RELATIVE_ACCURACY
+
+QUANTILES = (0.01, 0.25, 0.5, 0.9, 0.99, 0.999)
+
+
+def exact_quantiles(values, qs):
+    """Value at rank q * (n - 1), the rank DDSketch.quantiles() reports"""
+    ordered = np.sort(values)
+    return [ordered[int(q * (len(ordered) - 1))] for q in qs]
+
+
+def assert_within_accuracy(estimates, exact):
+    for estimate, value in zip(estimates, exact):
+        assert abs(estimate - value) <= RELATIVE_ACCURACY * value * (1 + 1e-9)
+
+
+@pytest.mark.parametrize('distribution', ['lognormal', 'pareto', 'uniform'])
+def test_quantiles_within_relative_accuracy(distribution):
+    rng = np.random.default_rng(0)
+    values = {
+        'lognormal': lambda: rng.lognormal(3, 1.5, 100000),      # tip amounts: many small, a few whales
+        'pareto': lambda: (rng.pareto(1.2, 100000) + 1) * 5,
+        'uniform': lambda: rng.uniform(1, 5000, 100000)
+    }[distribution]()
+    sketch = DDSketch()
+    sketch.add(values)
+    assert sketch.count == len(values)
+    assert_within_accuracy(sketch.quantiles(QUANTILES), exact_quantiles(values, QUANTILES))
+
+
+def test_non_positive_values_are_ignored():
+    sketch = DDSketch()
+    sketch.add([0.0, -3.0, 12.5])
+    assert sketch.count == 1
+    assert DDSketch().quantiles([0.5]) == [None]
+
+
+def test_merge_equals_sketch_of_all_values():
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(2, 1, 30000)
+    parts = [DDSketch() for _ in range(3)]
+    for part, chunk in zip(parts, np.array_split(values, 3)):
+        part.add(chunk)
+    whole = DDSketch()
+    whole.add(values)
+    merged = parts[0].merge(parts[1]).merge(parts[2])
+    assert merged.bins == whole.bins
+    assert_within_accuracy(merged.quantiles(QUANTILES), exact_quantiles(values, QUANTILES))
+
+
+def test_serialization_round_trip():
+    sketch = DDSketch()
+    sketch.add(np.random.default_rng(2).lognormal(1, 2, 5000))
+    assert DDSketch.from_bytes(sketch.to_bytes()).bins == sketch.bins
+
+
+def test_period_summary_matches_raw_tips(tmp_path):
+    rng = np.random.default_rng(3)
+    now = (time.time() // 3600) * 3600
+    start = now - 5 * 86400
+    count = 40000
+    columns = {
+        'ts': rng.uniform(start, now, count),
+        'type': np.full(count, EVENT_CODES['tip'], dtype=np.uint8),
+        'platform': np.full(count, PLATFORM_CODES['fansly'], dtype=np.uint8),
+        'amount': np.round(rng.lognormal(3, 1.2, count), 2),
+        'viewer': np.zeros(count, dtype=np.uint64),
+        'duration': np.zeros(count, dtype=np.float32)
+    }
+    sketches = QuantileSketches(str(tmp_path / 'quantiles.db'))
+    for offset in range(0, count, 5000):
+        sketches.add({name: values[offset:offset + 5000] for name, values in columns.items()})
+
+    window_start, window_end = start + 36 * 3600, now - 7 * 3600
+    inside = (columns['ts'] >= window_start) & (columns['ts'] < window_end)
+    sketch = sketches.merged('tip_amount', window_start, window_end)
+    assert sketch.count == int(inside.sum())
+    assert_within_accuracy(sketch.quantiles((0.5, 0.9, 0.99)),
+                           exact_quantiles(columns['amount'][inside], (0.5, 0.9, 0.99)))
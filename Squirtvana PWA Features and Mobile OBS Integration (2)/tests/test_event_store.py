@@ -0,0 +1,142 @@
+"""
+Event store: validation, flush/compact/scan round-trips and failed flushes
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from src.routes.event_store import EventStore, EventError, COLUMNS, DAY_SECONDS, day_key, ingest_events, normalize_event
+
+NOW = (time.time() // DAY_SECONDS) * DAY_SECONDS + 12 * 3600
+START, END = NOW - 3 * DAY_SECONDS, NOW
+
+
+@pytest.fixture
+def store(tmp_path):
+    # Flushes only when a test asks for one
+    return EventStore(str(tmp_path / 'events'), config={'flush_rows': 10 ** 9, 'flush_interval': 3600})
+
+
+def canonical(columns):
+    order = np.lexsort((columns['viewer'], columns['type'], columns['ts']))
+    return {name: columns[name][order] for name in COLUMNS}
+
+
+def assert_same_events(actual, expected):
+    actual, expected = canonical(actual), canonical(expected)
+    for name in COLUMNS:
+        np.testing.assert_array_equal(actual[name], expected[name], err_msg=name)
+
+
+def rows_to_columns(rows):
+    return {name: np.array([row[i] for row in rows], dtype=dtype) for i, (name, dtype) in enumerate(COLUMNS.items())}
+
+
+def test_scan_flush_and_compact_round_trip(store, make_events):
+    rows = [normalize_event(e, NOW) for e in make_events(3000, START, END)]
+    store.append(rows[:2000])
+    assert_same_events(store.scan(START, END), rows_to_columns(rows[:2000]))
+
+    assert store.flush() == 2000
+    assert store.stats()['buffered'] == 0
+    assert_same_events(store.scan(START, END), rows_to_columns(rows[:2000]))
+
+    # A second flush adds one more segment to every day it touches
+    store.append(rows[2000:])
+    store.flush()
+    day = day_key(START + DAY_SECONDS)
+    assert len(store._segment_names(day)) == 2
+    assert_same_events(store.scan(START, END), rows_to_columns(rows))
+
+    assert store.compact(day)
+    assert len(store._segment_names(day)) == 1
+    assert np.all(np.diff(store.read_day(day)['ts']) >= 0)
+    assert_same_events(store.scan(START, END), rows_to_columns(rows))
+
+    # Partial windows only return events inside them
+    middle = store.scan(START + DAY_SECONDS / 2, START + DAY_SECONDS * 1.5)
+    expected = [row for row in rows if START + DAY_SECONDS / 2 <= row[0] < START + DAY_SECONDS * 1.5]
+    assert_same_events(middle, rows_to_columns(expected))
+
+
+def test_reopened_store_reads_flushed_segments(store, make_events, tmp_path):
+    rows = [normalize_event(e, NOW) for e in make_events(500, START, END, seed=1)]
+    store.append(rows)
+    store.flush()
+    reopened = EventStore(str(tmp_path / 'events'))
+    assert_same_events(reopened.scan(START, END), rows_to_columns(rows))
+
+
+@pytest.mark.parametrize('event', [
+    {'type': 'tip', 'amount': float('nan')},
+    {'type': 'tip', 'amount': float('inf')},
+    {'type': 'viewer_leave', 'duration': float('-inf')},
+    {'type': 'tip', 'amount': 5, 'timestamp': float('nan')},
+    {'type': 'tip', 'amount': 5, 'timestamp': -1e13},
+    {'type': 'tip', 'amount': 5, 'timestamp': '0001-01-01T00:00:00'},
+    {'type': 'tip', 'amount': 5, 'timestamp': NOW + 3600},
+    {'type': 'viewer_join', 'amount': 3},
+    {'type': 'bogus'}
+])
+def test_invalid_events_are_rejected(event):
+    with pytest.raises(EventError):
+        normalize_event(event, NOW)
+
+
+def test_one_bad_event_does_not_drop_the_batch(store):
+    accepted, rejected = ingest_events([{'type': 'tip', 'amount': 5}, {'type': 'tip', 'amount': float('nan')}], store)
+    assert accepted == 1
+    assert [r['index'] for r in rejected] == [1]
+
+
+def test_failed_flush_keeps_unwritten_rows(store, make_events, monkeypatch):
+    rows = [normalize_event(e, NOW) for e in make_events(900, START, END, seed=2)]
+    store.append(rows)
+    write_segment = store._write_segment
+    calls = []
+
+    def failing_second_write(day, columns):
+        calls.append(day)
+        if len(calls) == 2:
+            raise OSError('disk full')
+        write_segment(day, columns)
+
+    monkeypatch.setattr(store, '_write_segment', failing_second_write)
+    with pytest.raises(OSError):
+        store.flush()
+    stats = store.stats()
+    assert stats['flush_errors'] == 1
+    assert 0 < stats['buffered'] < len(rows)
+    # Nothing is lost or duplicated: written days plus the re-buffered rows are the batch
+    assert_same_events(store.scan(START, END), rows_to_columns(rows))
+
+    monkeypatch.setattr(store, '_write_segment', write_segment)
+    store.flush()
+    assert store.stats()['buffered'] == 0
+    assert_same_events(store.scan(START, END), rows_to_columns(rows))
+
+
+def test_iter_segments_streams_without_the_day_cache(store, make_events):
+    rows = [normalize_event(e, NOW) for e in make_events(2000, START, END, seed=3)]
+    store.append(rows[:1500])
+    store.flush()
+    store.append(rows[1500:])
+    window = (START + DAY_SECONDS / 3, END - DAY_SECONDS / 4)
+    expected = store.scan(*window)
+    store._cache.clear()
+
+    batches = store.iter_segments(*window)
+    parts = [next(batches)]
+    # Segments read by a running iteration are not compacted under it
+    day = day_key(START + DAY_SECONDS)
+    store.append([row for row in rows if day_key(row[0]) == day][:10])
+    store.flush()
+    assert not store.compact(day)
+    parts.extend(batches)
+    assert store.compact(day)
+
+    assert not store._cache
+    assert all(len(part['ts']) for part in parts)
+    assert_same_events({name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}, expected)
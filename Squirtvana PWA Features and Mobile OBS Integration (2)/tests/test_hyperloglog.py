@@ -0,0 +1,96 @@
+"""
+HyperLogLog unique-viewer sketches: estimates stay within the documented error bound
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from src.routes.event_store import EventStore, viewer_hash, normalize_event
+from src.routes.hyperloglog import HyperLogLog, ViewerSketches, HLL_STANDARD_ERROR
+
+# Seeded, so the checks are deterministic; 3 standard errors is the ~99.7% bound
+BOUND = 3 * HLL_STANDARD_ERROR
+
+
+def hashes(count, seed=0):
+    return np.random.default_rng(seed).integers(1, 2 ** 64, size=count, dtype=np.uint64)
+
+
+@pytest.mark.parametrize('count', [1000, 20000, 300000])
+def test_count_within_error_bound(count):
+    sketch = HyperLogLog()
+    sketch.add(hashes(count))
+    assert abs(sketch.count() - count) <= BOUND * count
+
+
+def test_small_counts_are_nearly_exact():
+    sketch = HyperLogLog()
+    sketch.add(np.array([viewer_hash(f"viewer-{i}") for i in range(100)], dtype=np.uint64))
+    assert abs(sketch.count() - 100) <= 1
+
+
+def test_duplicates_do_not_count_twice():
+    values = hashes(5000)
+    once, thrice = HyperLogLog(), HyperLogLog()
+    once.add(values)
+    thrice.add(np.concatenate([values, values, values]))
+    assert once.count() == thrice.count()
+
+
+def test_merge_is_the_union():
+    values = hashes(60000, seed=1)
+    left, right, whole = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    left.add(values[:40000])
+    right.add(values[20000:])
+    whole.add(values)
+    merged = left.merge(right)
+    np.testing.assert_array_equal(merged.registers, whole.registers)
+    assert abs(merged.count() - 60000) <= BOUND * 60000
+
+
+def test_serialization_round_trip():
+    sketch = HyperLogLog()
+    sketch.add(hashes(10000, seed=2))
+    np.testing.assert_array_equal(HyperLogLog.from_bytes(sketch.to_bytes()).registers, sketch.registers)
+
+
+def test_period_counts_match_distinct_viewers(tmp_path):
+    rng = np.random.default_rng(3)
+    now = (time.time() // 3600) * 3600
+    start = now - 10 * 86400
+    viewers = rng.integers(0, 40000, size=120000)
+    timestamps = rng.uniform(start, now, size=len(viewers))
+    rows = [normalize_event({'type': 'viewer_join', 'platform': 'onlyfans', 'viewer_id': f"v{v}", 'timestamp': t}, now)
+            for v, t in zip(viewers.tolist(), timestamps.tolist())]
+    columns = {name: np.array([row[i] for row in rows]) for i, name in
+               enumerate(('ts', 'type', 'platform', 'amount', 'viewer', 'duration'))}
+    columns['viewer'] = columns['viewer'].astype(np.uint64)
+
+    sketches = ViewerSketches(str(tmp_path / 'sketches.db'))
+    for offset in range(0, len(rows), 10000):
+        sketches.add({name: values[offset:offset + 10000] for name, values in columns.items()})
+
+    for window_start, window_end in [(start, now), (start + 3 * 86400 + 5 * 3600, start + 6 * 86400)]:
+        inside = (timestamps >= window_start) & (timestamps < window_end)
+        exact = len(np.unique(viewers[inside]))
+        assert abs(sketches.count(window_start, window_end) - exact) <= BOUND * exact
+
+
+def test_backfill_runs_once_per_database(tmp_path, monkeypatch):
+    now = time.time()
+    store = EventStore(str(tmp_path / 'events'))
+    # Anonymous viewers only: the backfill leaves the sketch table empty
+    store.append([normalize_event({'type': 'viewer_join', 'platform': 'onlyfans', 'timestamp': now - 60 * i}, now)
+                  for i in range(100)])
+    store.flush()
+    reads = []
+    read_day = store.read_day
+    monkeypatch.setattr(store, 'read_day', lambda day: reads.append(day) or read_day(day))
+
+    assert ViewerSketches(str(tmp_path / 'sketches.db'), store=store).count(now - 86400, now + 3600) == 0
+    assert reads
+    del reads[:]
+    ViewerSketches(str(tmp_path / 'sketches.db'), store=store).count(now - 86400, now + 3600)
+    assert reads == []
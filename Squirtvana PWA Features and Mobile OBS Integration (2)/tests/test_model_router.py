@@ -0,0 +1,133 @@
+"""
+Model router against the local OpenRouter stub: hedging, failover and circuit breakers
+"""
+
+import time
+
+import pytest
+import requests
+
+from stub_servers import start_stub_server
+from src.routes import model_router
+from src.routes.model_router import ModelRouter, ModelUnavailableError, ROUTER_CONFIG
+
+PRIMARY = 'stub/primary'
+BACKUP = 'stub/backup'
+
+
+@pytest.fixture
+def stub():
+    server = start_stub_server({PRIMARY: {'latency': 0.02}, BACKUP: {'latency': 0.02}})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def router():
+    return ModelRouter({'backup_models': [BACKUP], 'hedge_min_delay': 0.1})
+
+
+def complete(model, base_url):
+    response = requests.post(f"{base_url}/chat/completions", timeout=10, json={
+        'model': model,
+        'messages': [{'role': 'user', 'content': 'hi'}],
+        'max_tokens': 10
+    })
+    response.raise_for_status()
+    return response.json()['choices'][0]['message']['content']
+
+
+def fail_primary(stub):
+    stub.chat_profiles[PRIMARY] = {'latency': 0.01, 'error_rate': 1.0}
+
+
+def test_fast_primary_is_not_hedged(stub, router):
+    for _ in range(ROUTER_CONFIG['min_samples']):
+        _, model = router.call(PRIMARY, complete, stub.base_url)
+        assert model == PRIMARY
+    assert router.stats()['counters']['hedged'] == 0
+    assert BACKUP not in stub.requests
+
+
+def test_hedge_fires_after_primary_p95(stub, router):
+    for _ in range(ROUTER_CONFIG['min_samples']):
+        router.call(PRIMARY, complete, stub.base_url)
+    delay = router.hedge_delay(PRIMARY)
+    assert 0.1 <= delay < 0.5
+
+    stub.chat_profiles[PRIMARY] = {'latency': 2.0}
+    started = time.monotonic()
+    _, model = router.call(PRIMARY, complete, stub.base_url)
+    elapsed = time.monotonic() - started
+
+    assert model == BACKUP
+    assert delay <= elapsed < 1.5
+    counters = router.stats()['counters']
+    assert counters['hedged'] == 1
+    assert counters['hedge_wins'] == 1
+
+
+def test_backup_answers_when_primary_fails(stub, router):
+    fail_primary(stub)
+    _, model = router.call(PRIMARY, complete, stub.base_url)
+    assert model == BACKUP
+    assert router.stats()['counters']['failovers'] == 1
+
+
+def test_all_models_failing_raises(stub, router):
+    fail_primary(stub)
+    stub.chat_profiles[BACKUP] = {'latency': 0.01, 'error_rate': 1.0}
+    with pytest.raises(ModelUnavailableError):
+        router.call(PRIMARY, complete, stub.base_url)
+
+
+class FakeClock:
+    """Stands in for the time module inside model_router"""
+
+    def __init__(self):
+        self.offset = 0.0
+
+    def monotonic(self):
+        return time.monotonic() + self.offset
+
+
+def test_breaker_opens_after_failures_and_half_opens(stub, router, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(model_router, 'time', clock)
+    fail_primary(stub)
+
+    threshold = ROUTER_CONFIG['failure_threshold']
+    for _ in range(threshold):
+        _, model = router.call(PRIMARY, complete, stub.base_url)
+        assert model == BACKUP
+    assert router.stats()['models'][PRIMARY]['circuit'] == 'open'
+
+    # While open, calls go straight to the backup without touching the primary
+    router.call(PRIMARY, complete, stub.base_url)
+    assert stub.requests[f'chat:{PRIMARY}'] == threshold
+
+    clock.offset = ROUTER_CONFIG['open_seconds'] - 1
+    router.call(PRIMARY, complete, stub.base_url)
+    assert stub.requests[f'chat:{PRIMARY}'] == threshold
+
+    # After the cool-down one trial call is let through; its success closes the breaker
+    clock.offset = ROUTER_CONFIG['open_seconds'] + 1
+    stub.chat_profiles[PRIMARY] = {'latency': 0.01}
+    _, model = router.call(PRIMARY, complete, stub.base_url)
+    assert model == PRIMARY
+    assert stub.requests[f'chat:{PRIMARY}'] == threshold + 1
+    assert router.stats()['models'][PRIMARY]['circuit'] == 'closed'
+
+
+def test_failed_half_open_trial_reopens_breaker(stub, router, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(model_router, 'time', clock)
+    fail_primary(stub)
+    for _ in range(ROUTER_CONFIG['failure_threshold']):
+        router.call(PRIMARY, complete, stub.base_url)
+
+    clock.offset = ROUTER_CONFIG['open_seconds'] + 1
+    _, model = router.call(PRIMARY, complete, stub.base_url)
+    assert model == BACKUP
+    assert router.stats()['models'][PRIMARY]['circuit'] == 'open'
@@ -0,0 +1,81 @@
+"""
+Roaring bitmaps against Python sets, across array and bitmap containers
+"""
+
+import numpy as np
+import pytest
+
+from src.routes.roaring import RoaringBitmap, ARRAY_LIMIT
+
+
+def random_ids(seed):
+    """Sparse ids over several containers plus one dense container above ARRAY_LIMIT"""
+    rng = np.random.default_rng(seed)
+    sparse = rng.integers(0, 6 * 65536, size=3000)
+    dense = 3 * 65536 + rng.choice(65536, size=ARRAY_LIMIT + 2000 + seed * 500, replace=False)
+    return set(sparse.tolist()) | set(dense.tolist())
+
+
+@pytest.fixture
+def sets():
+    return random_ids(0), random_ids(1)
+
+
+def as_set(bitmap):
+    return set(bitmap.to_array().tolist())
+
+
+def test_from_ids_matches_set(sets):
+    ids, _ = sets
+    bitmap = RoaringBitmap.from_ids(list(ids) + list(ids)[:100])
+    assert len(bitmap) == len(ids)
+    assert as_set(bitmap) == ids
+    assert np.all(np.diff(bitmap.to_array().astype(np.int64)) > 0)
+    assert any(c.dtype == np.uint64 for c in bitmap.containers.values())
+
+
+def test_set_algebra_matches_python_sets(sets):
+    a, b = sets
+    left, right = RoaringBitmap.from_ids(list(a)), RoaringBitmap.from_ids(list(b))
+    assert as_set(left | right) == a | b
+    assert as_set(left & right) == a & b
+    assert left.intersection_len(right) == len(a & b)
+    # The operands are untouched
+    assert as_set(left) == a and as_set(right) == b
+
+
+def test_union_update_and_discard(sets):
+    a, b = sets
+    bitmap = RoaringBitmap.from_ids(list(a))
+    bitmap.union_update(RoaringBitmap.from_ids(list(b)))
+    assert as_set(bitmap) == a | b
+
+    removed = list(b)[: len(b) // 2]
+    bitmap.discard_many(removed)
+    assert as_set(bitmap) == (a | b) - set(removed)
+    assert len(bitmap) == len((a | b) - set(removed))
+
+
+def test_dense_container_shrinks_back_to_an_array():
+    bitmap = RoaringBitmap.from_ids(range(ARRAY_LIMIT + 10))
+    assert bitmap.containers[0].dtype == np.uint64
+    bitmap.discard_many(range(20))
+    assert bitmap.containers[0].dtype == np.uint16
+    assert as_set(bitmap) == set(range(20, ARRAY_LIMIT + 10))
+    bitmap.discard_many(range(ARRAY_LIMIT + 10))
+    assert len(bitmap) == 0 and not bitmap.containers
+
+
+def test_membership(sets):
+    a, _ = sets
+    bitmap = RoaringBitmap.from_ids(list(a))
+    probes = np.random.default_rng(2).integers(0, 7 * 65536, size=2000).tolist()
+    assert [p in bitmap for p in probes] == [p in a for p in probes]
+
+
+def test_serialization_round_trip(sets):
+    a, _ = sets
+    bitmap = RoaringBitmap.from_ids(list(a))
+    restored = RoaringBitmap.from_bytes(bitmap.to_bytes())
+    assert as_set(restored) == a
+    assert {k: c.dtype for k, c in restored.containers.items()} == {k: c.dtype for k, c in bitmap.containers.items()}
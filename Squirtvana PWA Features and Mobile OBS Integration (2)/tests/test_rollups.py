@@ -0,0 +1,85 @@
+"""
+Event rollups against totals computed from the raw events
+"""
+
+import random
+import time
+
+import numpy as np
+import pytest
+
+from src.routes.event_store import EVENT_CODES, REVENUE_TYPES, normalize_event
+from src.routes.rollups import EventRollups, split_range
+
+NOW = (time.time() // 60) * 60
+START, END = NOW - 2 * 86400, NOW
+
+
+@pytest.fixture
+def loaded(tmp_path, make_events):
+    rows = [normalize_event(e, NOW) for e in make_events(5000, START, END)]
+    columns = {name: np.array([row[i] for row in rows]) for i, name in
+               enumerate(('ts', 'type', 'platform', 'amount', 'viewer', 'duration'))}
+    rollups = EventRollups(str(tmp_path / 'rollups.db'))
+    # Several batches, like separate ingestion requests
+    for start in range(0, len(rows), 700):
+        rollups.add({name: values[start:start + 700] for name, values in columns.items()})
+    return rollups, columns
+
+
+def raw_totals(columns, start, end, by):
+    mask = (columns['ts'] >= start) & (columns['ts'] < end)
+    totals = {}
+    for i in np.flatnonzero(mask):
+        key = tuple(int(columns[name][i]) if name != 'hour' else int(columns['ts'][i] // 3600) for name in by)
+        events, amount, duration = totals.get(key, (0, 0.0, 0.0))
+        totals[key] = (events + 1, amount + columns['amount'][i], duration + columns['duration'][i])
+    return totals
+
+
+def rollup_totals(rows, by):
+    return {tuple(row[name] for name in by): (row['events'], row['amount'], row['duration']) for row in rows}
+
+
+def assert_totals_match(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, (events, amount, duration) in expected.items():
+        assert actual[key][0] == events
+        assert actual[key][1] == pytest.approx(amount)
+        assert actual[key][2] == pytest.approx(duration, rel=1e-5)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_windows_match_raw_scan(loaded, seed):
+    rollups, columns = loaded
+    rng = random.Random(seed)
+    # Minute-aligned windows mixing minute, hour and day buckets
+    start = START + rng.randrange(0, 1440) * 60
+    end = min(END, start + rng.randrange(1, 2880) * 60)
+    by = ('platform', 'type')
+    assert_totals_match(rollup_totals(rollups.query(start, end, by=by), by), raw_totals(columns, start, end, by))
+
+
+def test_hour_grouping_matches_raw_scan(loaded):
+    rollups, columns = loaded
+    start, end = START + 90 * 60, END - 45 * 60
+    assert_totals_match(rollup_totals(rollups.query(start, end, by=('hour',)), ('hour',)),
+                        raw_totals(columns, start, end, ('hour',)))
+
+
+def test_type_and_platform_filters(loaded):
+    rollups, columns = loaded
+    revenue = [EVENT_CODES[t] for t in REVENUE_TYPES]
+    rows = rollups.query(START, END, platform=1, types=revenue)
+    mask = (columns['platform'] == 1) & np.isin(columns['type'], revenue)
+    assert rows[0]['events'] == int(mask.sum())
+    assert rows[0]['amount'] == pytest.approx(float(columns['amount'][mask].sum()))
+
+
+def test_split_range_covers_window_exactly():
+    start, end = 86400 * 10 + 61 * 60, 86400 * 13 + 5 * 60
+    ranges = split_range(start, end, [60, 3600, 86400])
+    covered = sorted((low, high) for _, low, high in ranges)
+    assert covered[0][0] == start and covered[-1][1] == end
+    assert all(a[1] == b[0] for a, b in zip(covered, covered[1:]))
+    assert {width for width, _, _ in ranges} == {60, 3600, 86400}
@@ -11,6 +11,9 @@ from flask import Blueprint, request, jsonify
 logger = logging.getLogger(__name__)
 workflow_bp = Blueprint('workflow', __name__)
 
+from src.routes.event_store import PLATFORM_CODES
+from src.routes.concurrency import concurrency_tracker
+
 # Sample workflow data (replace with database)
 TASKS = [
     {
@@ -226,6 +229,29 @@ def get_content_calendar():
         logger.error(f"Get calendar error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@workflow_bp.route('/calendar/suggestions', methods=['GET'])
+def get_stream_slot_suggestions():
+    """Suggest weekly stream slots (UTC) from the viewer concurrency heatmap"""
+    try:
+        platform = (request.args.get('platform') or '').lower()
+        if platform and platform not in PLATFORM_CODES:
+            return jsonify({'success': False, 'error': f"Unknown platform '{platform}'"}), 400
+        hours = request.args.get('hours', 2, type=int)
+        count = request.args.get('count', 3, type=int)
+        
+        slots = concurrency_tracker.suggest_slots(PLATFORM_CODES.get(platform), hours, count)
+        
+        return jsonify({
+            'success': True,
+            'suggestions': slots,
+            'platform': platform or 'all',
+            'timezone': 'UTC'
+        })
+        
+    except Exception as e:
+        logger.error(f"Stream slot suggestion error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @workflow_bp.route('/calendar', methods=['POST'])
 def create_calendar_event():
     """Create a new calendar event"""